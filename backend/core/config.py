@@ -19,7 +19,122 @@ class Settings(BaseSettings):
     # Rate limiting
     RATE_LIMIT_WINDOW: int = 60  # seconds
     RATE_LIMIT_MAX: int = 5  # max shares per window
-    
+
+    # Execution scheduling (JVM launches per API process)
+    EXEC_MAX_CONCURRENCY: int = 8  # compile/run slots shared by all lanes
+    EXEC_RESERVED_INTERACTIVE: int = 2  # slots only terminal runs may use
+    EXEC_RESERVED_REST: int = 1  # slots only /api/compile may use
+    EXEC_RESERVED_BATCH: int = 1  # slots only queued jobs may use
+    EXEC_AGING_SECONDS: float = 5.0  # waiting this long promotes work one lane
+    EXEC_TIMEOUT_SECONDS: float = 10.0  # wall-clock limit for a /api/compile or job run
+    EXEC_MAX_OUTPUT_CHARS: int = 1_000_000  # stdout/stderr kept per run; the rest is cut
+    EXEC_BUFFERED_OUTPUT: bool = True  # /api/compile runs buffer System.out/err (services/buffered_output.py)
+
+    # Per-client fairness (clients are identified by IP)
+    FAIR_CLIENT_MAX_CONCURRENCY: int = 2  # slots one client may hold at once (0 = no cap)
+    FAIR_CLIENT_RATE: float = 1.0  # sustained runs per second per client
+    FAIR_CLIENT_BURST: int = 10  # runs a client may submit back-to-back
+    FAIR_MAX_THROTTLE_SECONDS: float = 10.0  # reject instead of delaying longer than this
+    FAIR_CLIENT_WEIGHTS: Dict[str, float] = {}  # e.g. {"10.0.0.5": 4.0} for a grading host
+    CHECK_CLIENT_RATE: float = 2.0  # sustained /api/check type-checks per second per client
+    CHECK_CLIENT_BURST: int = 5  # type-checks a client may run back-to-back
+    TRUSTED_PROXIES: List[str] = ["127.0.0.1", "::1"]  # IPs/CIDRs whose X-Forwarded-For is believed
+
+    # Memory-aware admission of JVM launches
+    MEMORY_ADMISSION_ENABLED: bool = True
+    MEMORY_MIN_FREE_MB: int = 512  # hold launches that would leave less than this free
+    MEMORY_ADMISSION_TIMEOUT: float = 30.0  # seconds a launch may be held before failing
+    MEMORY_DEFAULT_JAVAC_MB: int = 250  # predicted javac footprint until history exists
+    MEMORY_DEFAULT_JAVA_MB: int = 200  # predicted java footprint until history exists
+    MEMORY_DEFAULT_JFR_MB: int = 200  # predicted `jfr print` footprint until history exists
+    MEMORY_LEDGER_SYNC_SECONDS: float = 1.0  # how often workers share reservations and recheck held launches
+
+    # Terminal sessions run under a pseudo-terminal (POSIX only; pipes elsewhere)
+    TERMINAL_PTY: bool = True
+
+    # Terminal output streaming (see services/output_batcher.py)
+    TERMINAL_FLUSH_INTERVAL_MS: int = 16  # max delay before pending output is sent
+    TERMINAL_FLUSH_CHARS: int = 32 * 1024  # send right away once this much is pending
+    TERMINAL_MAX_QUEUED_MESSAGES: int = 32  # client this far behind → stop reading the program
+    TERMINAL_OUTPUT_RATE_BYTES: int = 256 * 1024  # sustained output per session; the rest is summarized
+    TERMINAL_OUTPUT_BURST_BYTES: int = 1024 * 1024
+    TERMINAL_OUTPUT_MAX_BYTES: int = 10 * 1024 * 1024  # past this everything is summarized
+    TERMINAL_FLOOD_KILL: bool = False  # stop programs that pass TERMINAL_OUTPUT_MAX_BYTES
+    TERMINAL_TAIL_CHARS: int = 64 * 1024  # output kept per session for the error review
+
+    # Terminal session limits, counted over every worker of the node (0 = no limit)
+    TERMINAL_MAX_SESSIONS: int = 64  # live terminal programs on the node
+    TERMINAL_MAX_SESSIONS_PER_CLIENT: int = 12  # per client IP: a lab behind NAT shares one, so leave room
+    TERMINAL_IDLE_TIMEOUT_SECONDS: float = 1800.0  # no input, output or CPU for this long stops the program
+    TERMINAL_MAX_LIFETIME_SECONDS: float = 3600.0  # programs are stopped this long after they start
+    TERMINAL_SLOT_WAIT_SECONDS: float = 30.0  # a run waits this long for a slot (running programs keep theirs)
+
+    # Reconnecting to a terminal session (the client keeps a session token)
+    TERMINAL_RECONNECT_GRACE_SECONDS: float = 60.0  # a disconnected session's program keeps running this long
+    TERMINAL_SCROLLBACK_CHARS: int = 256 * 1024  # output replayed to a reconnecting client
+
+    # Idle terminal sessions (see services/hibernation.py)
+    HIBERNATE_ENABLED: bool = True
+    HIBERNATE_IDLE_SECONDS: float = 120.0  # no input, output or CPU for this long freezes the JVM
+    HIBERNATE_CHECK_INTERVAL: float = 5.0
+    HIBERNATE_UNVERIFIED_SECONDS: float = 60.0  # thaw after this where stdin waits can't be seen (non-Linux)
+
+    # Message bus between the workers of a host (see services/session_bus.py)
+    SESSION_BUS_ENABLED: bool = True
+    SESSION_BUS_PATH: str = ""  # Unix socket, in a 0700 directory; defaults to jyvra-session-bus-<uid>/ in the temp dir
+
+    # Thread pools per blocking workload (see services/executors.py)
+    EXECUTOR_PIPE_IO_WORKERS: int = 64  # Windows: one blocked reader per live terminal session
+    EXECUTOR_COMPILE_WORKERS: int = 8
+    EXECUTOR_AI_WORKERS: int = 4
+    EXECUTOR_AI_MAX_QUEUE: int = 16  # beyond this, skip AI and use the local explainer
+    EXECUTOR_REAPER_WORKERS: int = 8
+    EXECUTOR_FORWARD_WORKERS: int = 16  # requests forwarded to cluster peers
+
+    # Asynchronous jobs
+    JOB_LEASE_SECONDS: int = 30  # how long a claimed job stays owned without a heartbeat
+    JOB_MAX_ATTEMPTS: int = 3  # claims before a job is marked failed
+    JOB_RESULT_RETENTION: int = 3600  # seconds finished jobs are kept
+    JOB_WORKER_CONCURRENCY: int = 2  # jobs executed in parallel per API process
+    JOB_POLL_INTERVAL: float = 1.0  # seconds between queue polls when idle
+
+    # Problem sets (see services/judge.py)
+    JUDGE_MAX_PARALLEL_TESTS: int = 4  # test cases of one submission run at once
+    JUDGE_DEFAULT_TIME_LIMIT: float = 2.0  # seconds per test case, capped by EXEC_TIMEOUT_SECONDS
+    JUDGE_DEFAULT_MEMORY_MB: int = 256  # JVM heap (-Xmx) per test case
+
+    # Compile cache (per node, shared by all of its workers)
+    COMPILE_CACHE_ENABLED: bool = True
+    COMPILE_CACHE_DIR: str = Field(default="compile-cache")
+    COMPILE_CACHE_MAX_ENTRIES: int = 500
+
+    # JDK symbol index for completions and import fixes (one file per JDK)
+    SYMBOL_INDEX_DIR: str = Field(default="symbol-index")
+
+    # Cluster mode: runs go to the node whose cache is warm for that source
+    CLUSTER_PEERS: List[str] = []  # base URL of every node, e.g. '["http://10.0.0.1:5000", ...]'
+    CLUSTER_SELF: str = ""  # this node's entry in CLUSTER_PEERS; empty disables cluster mode
+    CLUSTER_VNODES: int = 160  # points per node on the hash ring
+    CLUSTER_CONNECT_TIMEOUT: float = 1.0  # peer is treated as unreachable after this
+    CLUSTER_FORWARD_TIMEOUT: float = 60.0  # max wait for a forwarded run's response
+    CLUSTER_PEER_COOLDOWN: float = 15.0  # seconds an unreachable peer is skipped
+
+    # Graceful drain (SIGTERM or POST /api/admin/drain)
+    DRAIN_DEADLINE_SECONDS: int = 25  # keep below gunicorn's --graceful-timeout
+    ADMIN_TOKEN: str = Field(default="")  # X-Admin-Token for /api/admin/*; empty disables them
+
+    # Live-tunable limits (see services/runtime_config.py)
+    RUNTIME_CONFIG_REFRESH_SECONDS: float = 5.0  # how quickly workers see admin changes
+
+    # Worker watchdog: recycle a worker whose own footprint keeps growing
+    WATCHDOG_ENABLED: bool = True
+    WATCHDOG_INTERVAL: float = 15.0  # seconds between self-checks
+    WORKER_MAX_RSS_MB: int = 1024  # resident memory of the worker process itself
+    WORKER_MAX_FDS: int = 4096  # open file descriptors (handles on Windows)
+    WORKER_MAX_THREADS: int = 400
+    WORKER_MAX_REQUESTS: int = 0  # HTTP requests + terminal runs before recycling (0 = never)
+    WORKER_MAX_REQUESTS_JITTER: int = 500  # spread recycles so workers don't restart together
+
     # Static files
     PROJECT_ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
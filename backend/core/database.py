@@ -24,3 +24,184 @@ def init_share_db():
     conn.commit()
     conn.close()
     print("[DB] Share database initialized")
+
+
+def init_jobs_db():
+    """Initialize SQLite tables for the asynchronous job queue"""
+    conn = sqlite3.connect(settings.DB_PATH)
+    cursor = conn.cursor()
+
+    # WAL lets every API worker poll the queue while another one writes
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL,
+            cancel_requested INTEGER DEFAULT 0
+        )
+    """)
+    # Databases created before job cancellation existed lack the column
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(jobs)")]
+    if "cancel_requested" not in columns:
+        cursor.execute(
+            "ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER DEFAULT 0")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs (finished_at)")
+
+    conn.commit()
+    conn.close()
+    print("[DB] Job queue initialized")
+
+
+def init_runtime_config_db():
+    """Initialize SQLite tables for live-tunable limits and their audit log"""
+    conn = sqlite3.connect(settings.DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS runtime_config (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            updated_by TEXT
+        )
+    """)
+    # One row per changed key; a PATCH (or rollback) shares one change_id
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS config_audit (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            change_id TEXT NOT NULL,
+            action TEXT NOT NULL,
+            key TEXT NOT NULL,
+            old_value TEXT,
+            new_value TEXT,
+            actor TEXT,
+            changed_at REAL NOT NULL
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_config_audit_change ON config_audit (change_id)")
+
+    conn.commit()
+    conn.close()
+    print("[DB] Runtime config initialized")
+
+
+def init_memory_ledger_db():
+    """Initialize the SQLite table of memory reservations held by each worker"""
+    conn = sqlite3.connect(settings.DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS memory_reservations (
+            owner TEXT NOT NULL,
+            id INTEGER NOT NULL,
+            outstanding INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (owner, id)
+        )
+    """)
+
+    conn.commit()
+    conn.close()
+    print("[DB] Memory ledger initialized")
+
+
+def init_problems_db():
+    """Initialize SQLite tables for problem sets, their tests and submissions"""
+    conn = sqlite3.connect(settings.DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS problems (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            statement TEXT NOT NULL,
+            time_limit_seconds REAL NOT NULL,
+            memory_limit_mb INTEGER NOT NULL,
+            reference_solution TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    # Expected outputs come from running the reference solution on create
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS problem_tests (
+            problem_id TEXT NOT NULL,
+            ordinal INTEGER NOT NULL,
+            input TEXT NOT NULL,
+            expected_output TEXT NOT NULL,
+            hidden INTEGER NOT NULL DEFAULT 1,
+            PRIMARY KEY (problem_id, ordinal)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS submissions (
+            id TEXT PRIMARY KEY,
+            problem_id TEXT NOT NULL,
+            author TEXT NOT NULL,
+            client TEXT,
+            code TEXT NOT NULL,
+            verdict TEXT NOT NULL,
+            passed INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            runtime_ms REAL,
+            results TEXT,
+            created_at REAL NOT NULL
+        )
+    """)
+    # Covers the leaderboard query (best accepted run per author) entirely
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_submissions_leaderboard
+        ON submissions (problem_id, verdict, author, runtime_ms, created_at)
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_recent ON submissions (problem_id, created_at)")
+
+    conn.commit()
+    conn.close()
+    print("[DB] Problem sets initialized")
+
+
+def init_terminal_sessions_db():
+    """Initialize the SQLite table mapping live terminal sessions to their worker"""
+    conn = sqlite3.connect(settings.DB_PATH)
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS terminal_sessions (
+            session_id TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            client_ip TEXT,
+            pid INTEGER,
+            run_id TEXT,
+            started_at REAL NOT NULL
+        )
+    """)
+    # Tables created before quota claims existed lack the column
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(terminal_sessions)")]
+    if "run_id" not in columns:
+        cursor.execute("ALTER TABLE terminal_sessions ADD COLUMN run_id TEXT")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_terminal_sessions_owner ON terminal_sessions (owner)")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_terminal_sessions_client ON terminal_sessions (client_ip)")
+
+    conn.commit()
+    conn.close()
+    print("[DB] Terminal session registry initialized")
@@ -0,0 +1,22 @@
+import threading
+
+# Process-local counters, exposed through /api/metrics
+_counters = {}
+_lock = threading.Lock()
+
+
+def incr(name, amount=1):
+    """Increment a named counter (safe to call from worker threads)"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def get(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    """Return a copy of all counters"""
+    with _lock:
+        return dict(_counters)
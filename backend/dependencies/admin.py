@@ -0,0 +1,10 @@
+import secrets
+from fastapi import Header, HTTPException
+from core.config import settings
+
+def require_admin(x_admin_token: str = Header(default="")):
+    """Guard for /api/admin/* — disabled unless ADMIN_TOKEN is configured"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
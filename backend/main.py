@@ -14,9 +14,16 @@ from fastapi.middleware.cors import CORSMiddleware
 import socketio
 
 from core.config import settings
-from core.database import init_share_db
-from routers import share, compile, system, sockets
+from core.database import (init_share_db, init_jobs_db, init_runtime_config_db, init_problems_db,
+                           init_terminal_sessions_db, init_memory_ledger_db)
+from routers import share, compile, system, sockets, jobs, admin, problems
 from services.share_service import cleanup_expired_shares_task
+from services.job_queue import job_worker_task, job_sweeper_task
+from services.executors import shutdown_executors
+from services.memory_admission import memory_admission, memory_ledger_task
+from services.lifecycle import install_sigterm_handler, wrap_server_exit
+from services import (watchdog, runtime_config, symbol_index, java_compiler, suggest, hibernation,
+                      session_bus, session_registry, compile_cache)
 from services.java_compiler import find_java, JAVAC_PATH, JAVA_PATH
 from utils.helpers import _boot_step, _boot_step_fail, get_java_version
 
@@ -56,6 +63,14 @@ def print_boot_banner():
         _boot_step("Locating javac binary", JAVAC_PATH)
         jvm_ver = get_java_version(JAVA_PATH)
         _boot_step("Verifying JVM heartbeat", jvm_ver)
+        try:
+            symbols = symbol_index.load(java_compiler.JAVA_PATH)
+            built = f", built in {symbols['build_seconds']:.1f}s" if symbols["build_seconds"] else ""
+            _boot_step("Indexing JDK symbols",
+                       f"{symbols['symbols']:,} symbols, {symbols['size_mb']} MB{built}")
+            suggest.warm()
+        except Exception as e:
+            _boot_step_fail("Indexing JDK symbols", f"Unavailable ({e})")
     else:
         _boot_step_fail("Locating javac binary", "NOT FOUND")
         _boot_step_fail("Verifying JVM heartbeat", "Skipped (no Java)")
@@ -74,6 +89,20 @@ def print_boot_banner():
     
     init_share_db()
     _boot_step("Initializing share database", "SQLite ready")
+    init_jobs_db()
+    _boot_step("Initializing job queue", f"{settings.JOB_WORKER_CONCURRENCY} workers")
+    init_problems_db()
+    _boot_step("Initializing problem sets", "SQLite ready")
+    init_runtime_config_db()
+    overrides = runtime_config.apply_overrides()
+    _boot_step("Loading runtime limits", f"{len(overrides)} overrides")
+    init_terminal_sessions_db()
+    stale = session_registry.prune_dead_workers()
+    _boot_step("Initializing terminal session registry", f"{stale} stale sessions dropped")
+    init_memory_ledger_db()
+    _boot_step("Initializing memory ledger", "shared by all workers")
+    if settings.COMPILE_CACHE_ENABLED:
+        _boot_step("Counting compile cache", f"{compile_cache.rescan()} entries")
     _boot_step("Starting cleanup daemon", "Background task active")
     
     print()
@@ -87,12 +116,37 @@ async def lifespan(app: FastAPI):
     print_boot_banner()
     # Start cleanup task in the background
     asyncio.create_task(cleanup_expired_shares_task())
+    # Start job queue workers and the lease/retention sweeper
+    for _ in range(settings.JOB_WORKER_CONCURRENCY):
+        asyncio.create_task(job_worker_task())
+    asyncio.create_task(job_sweeper_task())
+    # Pick up limit changes made through the admin API on any worker
+    asyncio.create_task(runtime_config.runtime_config_task())
+    # Recycle this worker if its own memory/fd/thread usage keeps growing
+    asyncio.create_task(watchdog.watchdog_task())
+    # Freeze terminal sessions left waiting for input, evict them under memory pressure,
+    # stop those past their idle or lifetime limit
+    asyncio.create_task(hibernation.hibernation_task())
+    # Share memory reservations with the other workers so launches are admitted against the whole node
+    asyncio.create_task(memory_ledger_task())
+    # Connect to the other workers (becoming the broker if none is) and serve their session events
+    asyncio.create_task(session_bus.bus.run())
+    asyncio.create_task(sockets.terminal_bus_task())
+    # SIGTERM drains live sessions before the server shuts down
+    install_sigterm_handler()
     yield
     # Shutdown logic (process cleanup if needed)
     from routers.sockets import interactive_processes, _kill_process
-    sids = list(interactive_processes.keys())
-    for sid in sids:
-        _kill_process(sid)
+    for session in list(interactive_processes.keys()):
+        _kill_process(session)
+    await sockets.wait_for_teardowns()
+    # Sessions kept for a reconnect die with this worker
+    session_registry.forget_worker()
+    memory_admission.forget()
+    shutdown_executors()
+
+# Before the server installs its signal handlers (see lifecycle.wrap_server_exit)
+wrap_server_exit()
 
 app = FastAPI(
     title="Java Arena API",
@@ -110,10 +164,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count served requests for the worker watchdog's max-requests limit
+app.add_middleware(watchdog.RequestCounterMiddleware)
+
 # Mount Routers
 app.include_router(share.router)
 app.include_router(compile.router)
 app.include_router(system.router)
+app.include_router(jobs.router)
+app.include_router(problems.router)
+app.include_router(admin.router)
 
 # Mount Socket.IO
 socket_app = socketio.ASGIApp(sockets.sio, other_asgi_app=app)
@@ -1 +1 @@
-from . import share, compile, system, sockets
+from . import share, compile, system, sockets, jobs
@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from schemas.admin import (DrainRequest, DrainStatus, ConfigUpdate, ConfigRollback,
+                           ConfigResponse, ConfigAuditResponse, SessionsResponse,
+                           SchedulerClientsResponse)
+from schemas.problems import ProblemCreate, ProblemDetail
+from dependencies.admin import require_admin
+from core.config import settings
+from services import lifecycle, runtime_config, judge, session_registry, session_bus
+from services.runtime_config import InvalidConfig
+from services.judge import InvalidReference
+from services.scheduler import RateLimitExceeded, scheduler
+from services.memory_admission import MemoryPressure
+from services.executors import run_in
+from utils.helpers import get_client_ip
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/drain", response_model=DrainStatus)
+async def drain_status():
+    return DrainStatus(success=True, **lifecycle.status())
+
+
+@router.post("/drain", response_model=DrainStatus, status_code=202)
+async def start_drain(drain: DrainRequest):
+    """
+    Drain the worker that handles this request: stop accepting runs, let
+    in-flight ones finish until the deadline, then stop the rest. With
+    exit_when_done the worker also shuts down afterwards.
+    """
+    lifecycle.start_drain("admin", drain.deadline_seconds, drain.exit_when_done)
+    return DrainStatus(success=True, **lifecycle.status())
+
+
+@router.post("/resume", response_model=DrainStatus)
+async def resume():
+    if not lifecycle.resume():
+        raise HTTPException(status_code=409, detail="Worker is not draining or is already shutting down")
+    return DrainStatus(success=True, **lifecycle.status())
+
+
+def _actor(request):
+    # The admin token is shared, so let operators say who they are
+    return request.headers.get("X-Admin-User") or get_client_ip(request)
+
+
+@router.get("/config", response_model=ConfigResponse)
+async def get_config():
+    return ConfigResponse(success=True, settings=await run_in("db", runtime_config.snapshot))
+
+
+@router.patch("/config", response_model=ConfigResponse)
+async def update_config(update: ConfigUpdate, request: Request):
+    """Change limits on every worker of this node (applied within a few seconds)"""
+    if not update.values:
+        raise HTTPException(status_code=400, detail="No values provided")
+    try:
+        change_id = await run_in("db", runtime_config.update, update.values, _actor(request))
+    except InvalidConfig as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await runtime_config.refresh()
+    return ConfigResponse(success=True, change_id=change_id,
+                          settings=await run_in("db", runtime_config.snapshot))
+
+
+@router.post("/config/rollback", response_model=ConfigResponse)
+async def rollback_config(rollback: ConfigRollback, request: Request):
+    change_id = await run_in("db", runtime_config.rollback, rollback.change_id, _actor(request))
+    if not change_id:
+        raise HTTPException(status_code=404, detail="No such config change")
+    await runtime_config.refresh()
+    return ConfigResponse(success=True, change_id=change_id,
+                          settings=await run_in("db", runtime_config.snapshot))
+
+
+@router.get("/config/audit", response_model=ConfigAuditResponse)
+async def config_audit(limit: int = 50):
+    entries = await run_in("db", runtime_config.audit_log, min(max(limit, 1), 500))
+    return ConfigAuditResponse(success=True, entries=entries)
+
+
+@router.get("/sessions", response_model=SessionsResponse)
+async def list_sessions():
+    """Live terminal sessions on every worker of this node"""
+    return SessionsResponse(success=True, sessions=await run_in("db", session_registry.sessions),
+                            bus=session_bus.bus.status())
+
+
+@router.delete("/sessions/{session_id}", status_code=204)
+async def kill_session(session_id: str):
+    """Stop a terminal session, whichever worker runs it"""
+    from routers.sockets import _terminal_kill
+    if await run_in("db", session_registry.owner, session_id) is None:
+        raise HTTPException(status_code=404, detail="No such terminal session")
+    await _terminal_kill(session_id)
+
+
+@router.get("/scheduler/clients", response_model=SchedulerClientsResponse)
+async def scheduler_clients(limit: int = 10):
+    """Clients of this worker with the most runs in flight (kept out of the public /api/metrics)"""
+    return SchedulerClientsResponse(success=True, clients=scheduler.busiest(min(max(limit, 1), 100)))
+
+
+@router.post("/problems", response_model=ProblemDetail, status_code=201)
+async def create_problem(problem: ProblemCreate):
+    """
+    Add a problem. The reference solution is run on every test input to
+    produce the expected outputs, and must pass all of them.
+    """
+    try:
+        problem_id = await judge.create_problem(
+            problem.title, problem.statement, [t.model_dump() for t in problem.tests],
+            problem.reference_solution,
+            problem.time_limit_seconds or settings.JUDGE_DEFAULT_TIME_LIMIT,
+            problem.memory_limit_mb or settings.JUDGE_DEFAULT_MEMORY_MB)
+    except InvalidReference as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except (RateLimitExceeded, MemoryPressure) as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return ProblemDetail(success=True, **await run_in("db", judge.get_problem, problem_id, True))
+
+
+@router.get("/problems/{problem_id}", response_model=ProblemDetail)
+async def get_problem(problem_id: str):
+    """A problem with its hidden tests and expected outputs"""
+    problem = await run_in("db", judge.get_problem, problem_id, True)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    return ProblemDetail(success=True, **problem)
+
+
+@router.delete("/problems/{problem_id}", status_code=204)
+async def delete_problem(problem_id: str):
+    if not await run_in("db", judge.delete_problem, problem_id):
+        raise HTTPException(status_code=404, detail="Problem not found")
@@ -1,52 +1,144 @@
-from fastapi import APIRouter, HTTPException
-from schemas.compile import CompileRequest, CompileResponse, VisualizeRequest, VisualizeResponse
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response, Query
+from fastapi.responses import JSONResponse
+from schemas.compile import (CompileRequest, CompileResponse, VisualizeRequest, VisualizeResponse,
+                             BenchmarkSettings, CheckRequest, CheckResponse, CompletionResponse)
 from services.java_compiler import compile_java
-from services.codeReview import explain_error, ai_review_error
+from services.benchmark import run_benchmark
+from services.codeReview import review_compile_result
 from services.visualizer import visualize_code
+from services.scheduler import scheduler, RateLimitExceeded
+from services.memory_admission import memory_admission, MemoryPressure
+from services.executors import run_in, ExecutorSaturated
+from services.cancellation import CancelToken, ExecutionCancelled, run_until_disconnected
+from services import lifecycle, syntax_check, symbol_index
+from services.cluster import cluster, PeerUnavailable
+from core import metrics
+from utils.helpers import get_client_ip
 from core.config import settings
 
 router = APIRouter(prefix="/api", tags=["compile"])
 
+async def _run_compile(source_code, stdin_input, client_ip, cancel_token, benchmark=None,
+                       profile=False):
+    """Schedule, compile, run (or benchmark) and review one submission"""
+    # A profiled run decodes its recording with `jfr print` afterwards
+    launches = ("javac", "java", "jfr") if profile else ("javac", "java")
+    async with scheduler.slot("rest", client_ip):
+        async with memory_admission.admitted_launch(launches) as reservation:
+            if benchmark:
+                result = await run_in(
+                    "compile", run_benchmark, source_code, benchmark, reservation, cancel_token)
+            else:
+                result = await run_in(
+                    "compile", compile_java, source_code, stdin_input, reservation, cancel_token,
+                    profile)
+    try:
+        await run_in("ai", review_compile_result, result, source_code, True, cancel_token)
+    except ExecutorSaturated:
+        # The local review scans the whole source: keep it off the event loop too
+        try:
+            await run_in("compile", review_compile_result, result, source_code, False)
+        except ExecutorSaturated:
+            pass  # the result goes out without a review
+    return result
+
+async def _forward_compile(peer, request, client_ip):
+    """Run on the peer that owns this source; None means run it here instead"""
+    try:
+        status_code, body, headers = await run_in(
+            "forward", cluster.forward, peer, "/api/compile", request.model_dump(), client_ip)
+    except (PeerUnavailable, ExecutorSaturated) as e:
+        metrics.incr("cluster.fallbacks")
+        print(f"[CLUSTER] Running locally instead of on {peer}: {e}")
+        return None
+    return JSONResponse(status_code=status_code, content=body, headers=headers)
+
 @router.post("/compile", response_model=CompileResponse)
-async def compile_endpoint(request: CompileRequest):
+async def compile_endpoint(request: CompileRequest, http_request: Request):
     source_code = request.code
     stdin_input = request.stdin or ""
 
     if not source_code:
         raise HTTPException(status_code=400, detail="No code provided")
 
+    if lifecycle.is_draining():
+        raise HTTPException(
+            status_code=503, detail="Server is restarting, please try again shortly",
+            headers={"Retry-After": "5"})
+
+    benchmark = (request.benchmark or BenchmarkSettings()) if request.mode == "benchmark" else None
+
     print(f"[COMPILE REQUEST] Code length: {len(source_code)}, Stdin length: {len(stdin_input)}")
-    
-    # Run sync function in thread pool
-    try:
-        result = compile_java(source_code, stdin_input)
-
-        error_text = result.get('error', '')
-        if error_text and error_text.strip():
-            is_compilation = not result.get('success') and (
-                'Compilation failed' in error_text or 'error:' in error_text
-            )
-
-            ai_explanation = ai_review_error(
-                error_text=error_text,
-                source_code=source_code,
-                is_compilation_error=is_compilation,
-            )
-            if ai_explanation:
-                result['ai_review'] = ai_explanation
-            else:
-                review = explain_error(
-                    error_text=error_text,
-                    source_code=source_code,
-                    is_compilation_error=is_compilation,
-                )
-                if review:
-                    result['error_review'] = review
 
+    # The whole pipeline is cancelled (JVM killed, AI call aborted, slot and
+    # workdir released) if the client disconnects before it finishes.
+    cancel_token = CancelToken("rest")
+    client_ip = get_client_ip(http_request)
+    try:
+        with lifecycle.track_rest_run():
+            peer = cluster.route(source_code, http_request)
+            if peer:
+                forwarded = await _forward_compile(peer, request, client_ip)
+                if forwarded is not None:
+                    return forwarded
+            result = await run_until_disconnected(
+                http_request, cancel_token,
+                _run_compile(source_code, stdin_input, client_ip, cancel_token, benchmark,
+                             request.profile))
         return CompileResponse(**result)
+    except ExecutionCancelled:
+        # Nobody is listening; 499 is nginx's "client closed request"
+        return Response(status_code=499)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except MemoryPressure as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/check", response_model=CheckResponse)
+async def check_endpoint(request: CheckRequest, http_request: Request):
+    """
+    As-you-type diagnostics: a javalang parse, then (if that's clean and
+    typecheck is set) a javac type-check. Nothing is executed. A newer
+    check with the same document_id cancels this one (409).
+    """
+    client_ip = get_client_ip(http_request)
+    document_key = f"{client_ip}:{request.document_id}" if request.document_id else None
+    cancel_token = syntax_check.start_check(document_key)
+    try:
+        result = await run_until_disconnected(
+            http_request, cancel_token,
+            syntax_check.check(request.code, cancel_token, request.typecheck, client_ip))
+        return CheckResponse(success=True, **result)
+    except ExecutionCancelled:
+        if cancel_token.reason == "client disconnected":
+            return Response(status_code=499)
+        raise HTTPException(status_code=409, detail="Superseded by a newer check")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        syntax_check.finish_check(document_key, cancel_token)
+
+@router.get("/complete", response_model=CompletionResponse)
+async def complete_endpoint(prefix: str = Query(..., min_length=1, max_length=100),
+                            kind: Optional[str] = None, owner: Optional[str] = None,
+                            limit: int = 50):
+    """
+    JDK classes and members whose name starts with prefix. kind narrows to
+    "class" (any type), "method" or "field"; owner to members of one class
+    (simple or qualified name).
+    """
+    if symbol_index.index is None:
+        raise HTTPException(status_code=503, detail="JDK symbol index is not available")
+    kinds = ("class", "interface", "enum", "annotation") if kind == "class" else \
+        (kind,) if kind else None
+    items = symbol_index.index.prefix(prefix, min(max(limit, 1), 200), kinds, owner)
+    return CompletionResponse(success=True, items=items)
+
 @router.post("/visualize", response_model=VisualizeResponse)
 async def visualize_endpoint(request: VisualizeRequest):
     code = request.code
@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from schemas.jobs import JobCreate, JobCreated, JobDetail
+from services.job_queue import enqueue_job, get_job, request_cancel
+from services.executors import run_in
+from utils.helpers import get_client_ip
+
+router = APIRouter(prefix="/api", tags=["jobs"])
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value).isoformat() if value else None
+
+
+def _job_detail(job):
+    return JobDetail(
+        success=True,
+        id=job["id"],
+        kind=job["kind"],
+        status=job["status"],
+        attempts=job["attempts"],
+        created_at=_timestamp(job["created_at"]),
+        started_at=_timestamp(job["started_at"]),
+        finished_at=_timestamp(job["finished_at"]),
+        result=job["result"],
+        error=job["error"],
+    )
+
+
+@router.post("/jobs", response_model=JobCreated, status_code=202)
+async def create_job(job_data: JobCreate, request: Request):
+    if not job_data.code or not job_data.code.strip():
+        raise HTTPException(status_code=400, detail="No code provided")
+
+    try:
+        job_id = await run_in("db", enqueue_job, "compile", {
+            "code": job_data.code,
+            "stdin": job_data.stdin or "",
+            "client": get_client_ip(request),
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    print(f"[JOBS] Enqueued job {job_id}")
+    return JobCreated(success=True, id=job_id, status="queued")
+
+
+@router.get("/jobs/{job_id}", response_model=JobDetail)
+async def get_job_status(job_id: str):
+    job = await run_in("db", get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_detail(job)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobDetail)
+async def cancel_job(job_id: str):
+    if not await run_in("db", request_cancel, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_detail(await run_in("db", get_job, job_id))
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, cancel_on_disconnect: bool = False):
+    """
+    Server-Sent Events stream of status changes, ending with the result.
+    With cancel_on_disconnect the job is cancelled if the stream is closed
+    before it finishes.
+    """
+    if not await run_in("db", get_job, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def event_stream():
+        last_status = None
+        finished = False
+        try:
+            while not await request.is_disconnected():
+                job = await run_in("db", get_job, job_id)
+                if not job:
+                    yield "event: error\ndata: {\"detail\": \"Job not found\"}\n\n"
+                    return
+
+                if job["status"] != last_status:
+                    last_status = job["status"]
+                    detail = _job_detail(job)
+                    finished = last_status in FINISHED_STATUSES
+                    event = "result" if finished else "status"
+                    yield f"event: {event}\ndata: {detail.model_dump_json()}\n\n"
+                    if finished:
+                        return
+
+                await asyncio.sleep(0.5)
+        finally:
+            # Reached on disconnect too: Starlette cancels the generator
+            if cancel_on_disconnect and not finished:
+                await run_in("db", request_cancel, job_id)
+                print(f"[JOBS] Event stream closed, cancelling job {job_id}")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
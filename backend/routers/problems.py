@@ -0,0 +1,84 @@
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request, Response
+from schemas.problems import (ProblemListResponse, ProblemSummary, ProblemDetail, SubmissionCreate,
+                              SubmissionDetail, LeaderboardResponse)
+from services import judge, lifecycle
+from services.scheduler import RateLimitExceeded
+from services.memory_admission import MemoryPressure
+from services.cancellation import CancelToken, ExecutionCancelled, run_until_disconnected
+from services.executors import run_in
+from utils.helpers import get_client_ip
+
+router = APIRouter(prefix="/api", tags=["problems"])
+
+
+def _submission_detail(submission):
+    return SubmissionDetail(
+        success=True,
+        **{**submission, "created_at": datetime.fromtimestamp(submission["created_at"]).isoformat()},
+    )
+
+
+@router.get("/problems", response_model=ProblemListResponse)
+async def list_problems():
+    return ProblemListResponse(
+        success=True, problems=[ProblemSummary(**p) for p in await run_in("db", judge.list_problems)])
+
+
+@router.get("/problems/{problem_id}", response_model=ProblemDetail)
+async def get_problem(problem_id: str):
+    problem = await run_in("db", judge.get_problem, problem_id)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    return ProblemDetail(success=True, **problem)
+
+
+@router.post("/problems/{problem_id}/submissions", response_model=SubmissionDetail)
+async def submit(problem_id: str, submission: SubmissionCreate, http_request: Request):
+    """Judge a solution against every test of the problem (hidden ones included)"""
+    if not submission.code.strip():
+        raise HTTPException(status_code=400, detail="No code provided")
+
+    if lifecycle.is_draining():
+        raise HTTPException(
+            status_code=503, detail="Server is restarting, please try again shortly",
+            headers={"Retry-After": "5"})
+
+    problem = await run_in("db", judge.get_problem, problem_id, True)
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    cancel_token = CancelToken("rest")
+    try:
+        with lifecycle.track_rest_run():
+            result = await run_until_disconnected(
+                http_request, cancel_token,
+                judge.judge_submission(problem, submission.code, submission.author.strip(),
+                                       get_client_ip(http_request), cancel_token))
+        return _submission_detail(result)
+    except ExecutionCancelled:
+        return Response(status_code=499)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after) + 1)})
+    except MemoryPressure as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/submissions/{submission_id}", response_model=SubmissionDetail)
+async def get_submission(submission_id: str):
+    submission = await run_in("db", judge.get_submission, submission_id)
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return _submission_detail(submission)
+
+
+@router.get("/problems/{problem_id}/leaderboard", response_model=LeaderboardResponse)
+async def leaderboard(problem_id: str, limit: int = 50):
+    entries = await run_in("db", judge.leaderboard, problem_id, min(max(limit, 1), 500))
+    for entry in entries:
+        entry["created_at"] = datetime.fromtimestamp(entry["created_at"]).isoformat()
+    return LeaderboardResponse(success=True, problem_id=problem_id, entries=entries)
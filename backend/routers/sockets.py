@@ -1,178 +1,664 @@
 import os
+import re
+import time
 import shutil
+import asyncio
+import secrets
 import threading
 import subprocess
 import socketio
 from typing import Dict, Any
-from utils.helpers import _ansi_escape
-from services.codeReview import ai_review_error, explain_error
+from utils.helpers import _ansi_escape, get_environ_client_ip
+from services.codeReview import ai_review_error, explain_error, is_confident
 from services.java_compiler import start_interactive_session
+from services.benchmark import run_benchmark, format_summary
+from schemas.compile import BenchmarkSettings
+from pydantic import ValidationError
+from services.scheduler import scheduler
+from services.memory_admission import memory_admission, MemoryPressure
+from services.executors import run_in, ExecutorSaturated
+from services.cancellation import CancelToken, ExecutionCancelled
+from services.output_batcher import OutputBatcher
+from services.flood_control import FloodControl, OutputTail, format_bytes
+from core.config import settings
+from core import metrics
+from services import lifecycle, watchdog, profiler, java_compiler, hibernation, pipe_reader
+from services import session_bus, session_registry
+from services.job_queue import WORKER_ID
 
-# Maps socket session ID → running subprocess
+# A terminal session outlives the connection that started it: it is keyed by a
+# session token the client keeps across reconnects, and every emit for it goes
+# to the Socket.IO room of that name, which each connection of the session joins.
+
+# Maps session token → running subprocess
 interactive_processes: Dict[str, subprocess.Popen] = {}
-# Maps socket session ID → temp directory path (for cleanup)
+# Maps session token → temp directory path (for cleanup)
 interactive_temp_dirs: Dict[str, str] = {}
+# Maps session token → cancel token of its current run (compile → run → AI review)
+run_tokens: Dict[str, CancelToken] = {}
+# Maps session token → scheduler slot and memory reservation its running program holds
+session_holds: Dict[str, "_Hold"] = {}
+# Maps session token → (rows, cols) of the client's terminal
+terminal_sizes: Dict[str, tuple] = {}
+# Maps socket session ID → client IP (for per-client fair scheduling)
+client_ips: Dict[str, str] = {}
+# Maps socket session ID → session token of the connection
+connection_sessions: Dict[str, str] = {}
 # Lock for thread-safe process management
 process_lock = threading.Lock()
 
-sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+_SESSION_TOKEN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class _SessionState:
+    """What a reconnecting client needs to catch up, kept on the worker that produces it"""
+
+    def __init__(self):
+        self.scrollback = OutputTail(settings.TERMINAL_SCROLLBACK_CHARS)
+        self.sids = set()  # connections attached right now (on any worker)
+        self.last_exit = None  # terminal:exit of the last run, replayed with the scrollback
+        self.grace_timer = None  # stops the session if nobody reattaches in time
+        self.stdin_lock = asyncio.Lock()  # keeps input writes in the order they came
+
+
+# Maps session token → _SessionState
+sessions: Dict[str, _SessionState] = {}
+
+class _Hold:
+    """Interactive lane slot and memory reservation a terminal program keeps while it runs"""
+
+    def __init__(self, client, reservation):
+        self.client = client
+        self.reservation = reservation
+
+    def launched(self):
+        # Programs are capped per client by TERMINAL_MAX_SESSIONS_PER_CLIENT; a
+        # long-lived one would otherwise use up the client's scheduler cap for runs
+        scheduler.detach_client(self.client)
+        self.client = None
+
+    def release(self):
+        if self.reservation is None:
+            return
+        scheduler.release("interactive", self.client)
+        memory_admission.release(self.reservation)
+        self.reservation = None
+
+
+async def _hold_capacity(client):
+    """
+    Take an interactive slot and a memory reservation for a terminal run,
+    or None if no slot frees up within TERMINAL_SLOT_WAIT_SECONDS.
+    """
+    try:
+        await asyncio.wait_for(scheduler.acquire("interactive", client),
+                               settings.TERMINAL_SLOT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        metrics.incr("terminal.slot_timeout")
+        return None
+    try:
+        reservation = await memory_admission.reserve(("javac", "java"))
+    except BaseException:
+        scheduler.release("interactive", client)
+        raise
+    return _Hold(client, reservation)
+
+
+# Emits to a client connected to another worker travel the session bus
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*',
+                           client_manager=session_bus.client_manager())
 
-def _kill_process(sid: str):
-    """Kill an interactive process and clean up its resources."""
+# Teardowns still reaping a JVM, removing its temp dir or updating the registry (awaited at shutdown)
+_teardowns = set()
+
+def _kill_process(session: str):
+    """Kill an interactive process and clean up its resources (the slow part in the background)."""
     with process_lock:
-        proc = interactive_processes.pop(sid, None)
-        temp_dir = interactive_temp_dirs.pop(sid, None)
+        proc = interactive_processes.pop(session, None)
+        temp_dir = interactive_temp_dirs.pop(session, None)
+        hold = session_holds.pop(session, None)
+    hibernation.forget(session)
+    if hold:
+        hold.release()
 
+    if proc:
+        _registry_update(session_registry.set_pid, session, None)
+        print(f"[JYVRA TERMINAL] Killing process for session={session[:8]}")
+    _teardown(proc, temp_dir)
+
+def _registry_update(fn, *args):
+    """Apply a session registry write on the db executor without waiting for it."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        fn(*args)  # no event loop (interpreter shutdown)
+        return
+    task = asyncio.ensure_future(run_in("db", fn, *args))
+    _teardowns.add(task)
+    task.add_done_callback(_teardowns.discard)
+
+def _teardown(proc, temp_dir):
+    """
+    Kill proc's process group right away, then reap it and remove temp_dir
+    on the reaper executor so the event loop never waits on either.
+    """
     if proc:
         try:
             proc.stdin.close()
         except Exception:
             pass
+        java_compiler.kill_session_process(proc)
+    if not proc and not temp_dir:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _finish_teardown(proc, temp_dir)  # no event loop (interpreter shutdown)
+        return
+    task = asyncio.ensure_future(run_in("reaper", _finish_teardown, proc, temp_dir))
+    _teardowns.add(task)
+    task.add_done_callback(_teardowns.discard)
+
+def _finish_teardown(proc, temp_dir):
+    """Blocking half of a teardown: wait for the JVM to exit, delete its temp dir."""
+    if proc:
         try:
-            proc.kill()
             proc.wait(timeout=5)
-        except Exception:
-            pass
-        print(f"[JYVRA TERMINAL] Killed process for sid={sid}")
-
+        except subprocess.TimeoutExpired:
+            print(f"[JYVRA TERMINAL] Process {proc.pid} did not exit after SIGKILL")
     if temp_dir and os.path.exists(temp_dir):
         try:
             shutil.rmtree(temp_dir)
-            print(f"[JYVRA TERMINAL] Cleaned temp dir for sid={sid}")
         except Exception as e:
             print(f"[JYVRA TERMINAL] Failed to clean temp dir {temp_dir}: {e}")
 
+async def wait_for_teardowns():
+    """Let background teardowns finish (worker shutdown)."""
+    if _teardowns:
+        await asyncio.gather(*list(_teardowns), return_exceptions=True)
+
+async def _claim_quota(sid, session, run_id):
+    """
+    Register the session and claim its run's place in the terminal quota
+    (counted on every worker). Returns why the run can't start, or None.
+    """
+    per_client = settings.TERMINAL_MAX_SESSIONS_PER_CLIENT
+    full = await run_in("db", session_registry.reserve, session, client_ips.get(sid), run_id,
+                        per_client, settings.TERMINAL_MAX_SESSIONS)
+    if full == "client":
+        metrics.incr("terminal.quota_client")
+        return (f'You already have {per_client} programs running. '
+                'Stop one (or close its tab) and try again.')
+    if full == "total":
+        metrics.incr("terminal.quota_global")
+        return 'The server is running as many programs as it can, please try again in a minute'
+    return None
+
+def _cancel_run(session: str, reason: str):
+    """Abort whatever the session's current run is still doing (javac, AI review...)."""
+    with process_lock:
+        token = run_tokens.pop(session, None)
+    if token:
+        token.cancel(reason)
+
+def _finish_run(session: str, token: CancelToken):
+    """Forget a run's token once it completed on its own."""
+    with process_lock:
+        if run_tokens.get(session) is token:
+            del run_tokens[session]
+
+def _state(session):
+    if session not in sessions:
+        sessions[session] = _SessionState()
+    return sessions[session]
+
+async def _output(session, text):
+    """Send terminal output, keeping it in the session's scrollback for reconnects."""
+    _state(session).scrollback.append(text)
+    await sio.emit('terminal:output', {'data': text}, room=session)
+
+async def _exit(session, code, reason):
+    _state(session).last_exit = {'code': code, 'reason': reason}
+    await sio.emit('terminal:exit', {'code': code, 'reason': reason}, room=session)
+
+async def _owner_elsewhere(session):
+    """Worker holding the session if it isn't this one, else None"""
+    if session in sessions or session in interactive_processes or session in run_tokens:
+        return None
+    owner = await run_in("db", session_registry.owner, session)
+    return owner if owner != WORKER_ID else None
+
+def _publish(owner, session, event, data=None):
+    """Send a session event to the worker that owns the session; False if the bus is down"""
+    metrics.incr("terminal.routed_events")
+    return session_bus.bus.publish(
+        'terminal', {'event': event, 'session': session, 'data': data}, to=owner)
+
+async def _route_to_owner(session, event, data=None):
+    """
+    Send a session event to the worker holding the session (its JVM and
+    scrollback), if that is another worker. True if it was sent there.
+    """
+    owner = await _owner_elsewhere(session)
+    if owner is None:
+        return False
+    return _publish(owner, session, event, data)
+
+async def _unreachable(room):
+    # The session's program and scrollback live on a worker the bus can't reach
+    # now; handling the event here would only start an empty local session
+    metrics.incr("terminal.owner_unreachable")
+    await sio.emit('terminal:error', {
+        'message': 'Could not reach your running program, please reload the page in a moment'}, room=room)
+
+def _note_remote(session, sid, joined):
+    """Emits to a session followed from another worker must take the bus"""
+    if isinstance(sio.manager, session_bus.BusManager) and sid not in connection_sessions:
+        sio.manager.note_remote(session, sid, joined)
+
+async def _attach(session, sid):
+    """A connection joined the session: stop its grace timer and replay what it missed."""
+    state = _state(session)
+    state.sids.add(sid)
+    _note_remote(session, sid, True)
+    if state.grace_timer:
+        state.grace_timer.cancel()
+        state.grace_timer = None
+    with process_lock:
+        proc = interactive_processes.get(session)
+        running = proc is not None or session in run_tokens
+    if state.scrollback.size or running:
+        metrics.incr("terminal.resumed")
+        scrollback = state.scrollback.text()
+        if state.scrollback.dropped:
+            scrollback = '\x1b[0m\x1b[2m… earlier output not kept …\x1b[0m\r\n' + scrollback
+        await sio.emit('terminal:replay', {
+            'data': scrollback,
+            'running': running,
+            'pty': bool(getattr(proc, 'pty', False)),
+            'exit': None if running else state.last_exit,
+        }, room=sid)
+
+def _detach(session, sid):
+    """A connection left: the session lives on for the grace period, waiting for a reconnect."""
+    state = sessions.get(session)
+    if state is None:
+        return
+    state.sids.discard(sid)
+    _note_remote(session, sid, False)
+    if state.sids or state.grace_timer:
+        return
+    grace = settings.TERMINAL_RECONNECT_GRACE_SECONDS
+    state.grace_timer = asyncio.get_running_loop().call_later(grace, _expire, session)
+
+def _expire(session):
+    """Nobody came back: stop the session's program and forget it."""
+    state = sessions.get(session)
+    if state is None or state.sids:
+        return
+    _cancel_run(session, "client disconnected")
+    _kill_process(session)
+    del sessions[session]
+    terminal_sizes.pop(session, None)
+    _registry_update(session_registry.unregister, session)
+    print(f"[JYVRA TERMINAL] Session {session[:8]} expired after the reconnect grace period")
+
 @sio.event
-async def connect(sid, environ):
-    print(f"[JYVRA SOCKET] Client connected: {sid}")
-    await sio.emit('connected', {'sid': sid}, room=sid)
+async def connect(sid, environ, auth=None):
+    client_ips[sid] = get_environ_client_ip(environ)
+    # Resume the session the client had, if it still exists on any worker
+    requested = (auth or {}).get('session') if isinstance(auth, dict) else None
+    resumed = bool(requested and _SESSION_TOKEN.match(requested)
+                   and (requested in sessions or await run_in("db", session_registry.owner, requested)))
+    session = requested if resumed else secrets.token_urlsafe(16)
+    connection_sessions[sid] = session
+    await sio.enter_room(sid, session)
+    print(f"[JYVRA SOCKET] Client connected: {sid} (session {session[:8]}, "
+          f"{'resumed' if resumed else 'new'})")
+    await sio.emit('connected', {'sid': sid, 'session': session, 'resumed': resumed}, room=sid)
+    owner = await _owner_elsewhere(session)
+    if owner is None:
+        await _attach(session, sid)
+    elif not _publish(owner, session, 'attach', sid):
+        await _unreachable(sid)
 
 @sio.event
 async def disconnect(sid):
+    session = connection_sessions.pop(sid, None)
+    client_ips.pop(sid, None)
     print(f"[JYVRA SOCKET] Client disconnected: {sid}")
-    _kill_process(sid)
+    if session and not await _route_to_owner(session, 'detach', sid):
+        _detach(session, sid)
 
 @sio.on('terminal:run')
 async def handle_terminal_run(sid, data):
-    _kill_process(sid)
+    session = connection_sessions.get(sid)
+    if not session:
+        return
+    _cancel_run(session, "superseded by a new run")
+    _kill_process(session)
+    # The previous run may live on the worker this client was connected to before
+    await _route_to_owner(session, 'stop')
 
     code = data.get('code', '').strip()
     print(f"[JYVRA SOCKET] Received code to run from sid={sid}, length={len(code)}")
-    
+
     if not code:
         await sio.emit('terminal:error', {'message': 'No code provided'}, room=sid)
         return
 
+    if lifecycle.is_draining():
+        await sio.emit('terminal:error', {
+            'message': 'Server is restarting, please run your code again in a moment'}, room=sid)
+        return
+
+    run_id = secrets.token_hex(8)
+    refusal = await _claim_quota(sid, session, run_id)
+    if refusal:
+        await sio.emit('terminal:error', {'message': refusal}, room=sid)
+        return
+
+    watchdog.count_request()
+    cancel_token = CancelToken("terminal")
+    with process_lock:
+        run_tokens[session] = cancel_token
+    # The replay of a reconnect starts at this run
+    state = _state(session)
+    state.sids.add(sid)
+    state.scrollback = OutputTail(settings.TERMINAL_SCROLLBACK_CHARS)
+    state.last_exit = None
+    client = client_ips.get(sid, sid)
+
+    if data.get('mode') == 'benchmark':
+        try:
+            await _run_benchmark_session(session, client, code, data.get('benchmark') or {}, cancel_token)
+        finally:
+            _registry_update(session_registry.release, session, run_id)
+        return
+
+    profile = bool(data.get('profile'))
+    _remember_size(session, data)
+    launched = False
     try:
-        await sio.emit('terminal:output', {
-             'data': '\r\n\x1b[36m⚙  Compiling...\x1b[0m\r\n'}, room=sid)
+        unsupported = profile and java_compiler.find_java() and \
+            profiler.unsupported_reason(java_compiler.JAVA_PATH)
+        if unsupported:
+            await _output(session, f'\r\n\x1b[33m⚠ {unsupported}, running without it\x1b[0m\r\n')
+            profile = False
+
+        await _output(session, '\r\n\x1b[36m⚙  Compiling...\x1b[0m\r\n')
+
+        # Raises RateLimitExceeded (reported as terminal:error) for flooding clients
+        # Raises MemoryPressure (also reported as terminal:error) when the host is low on memory
+        hold = await _hold_capacity(client)
+        if hold is None:
+            await sio.emit('terminal:error', {
+                'message': 'The server is running as many programs as it can, please try again in a minute'},
+                room=session)
+            _finish_run(session, cancel_token)
+            return
+        try:
+            # start_interactive_session is sync; it runs on the compile executor
+            proc, temp_dir, compile_result = await run_in(
+                "compile", start_interactive_session, code, "Main", hold.reservation, cancel_token,
+                profile, terminal_sizes.get(session))
+        except BaseException:
+            hold.release()
+            raise
 
-        # start_interactive_session is sync, call in a way that doesn't block (using loop.run_in_executor if needed, but for simplicity we'll keep it as is or wrap it)
-        # Actually, for a production FastAPI app, we should use a proper background task or async wrapper
-        import asyncio
-        loop = asyncio.get_event_loop()
-        proc, temp_dir, compile_result = await loop.run_in_executor(None, start_interactive_session, code)
+        if cancel_token.cancelled:
+            # The client left (or started another run) while we were launching
+            hold.release()
+            _teardown(proc, temp_dir)
+            return
 
         if not proc:
+            hold.release()
+            _teardown(None, temp_dir)
             error_msg = getattr(compile_result, 'stderr', None) or "Compilation failed"
-            await sio.emit('terminal:output', {
-                'data': f'\r\n\x1b[31m✗ Compilation Error:\x1b[0m\r\n{_ansi_escape(error_msg)}\r\n'
-            }, room=sid)
-
-            await sio.emit('terminal:output', {
-                'data': '\r\n\x1b[36m🤖 Asking AI for help...\x1b[0m\r\n'
-            }, room=sid)
-            
-            ai_explanation = await loop.run_in_executor(None, ai_review_error, error_msg, code, True)
-            if ai_explanation:
-                await sio.emit('terminal:output', {
-                    'data': f'\r\n\x1b[33m💡 AI Suggestion:\x1b[0m\r\n{_ansi_escape(ai_explanation)}\r\n'
-                }, room=sid)
-            else:
-                review = await loop.run_in_executor(None, explain_error, error_msg, code, True)
-                if review:
-                    explanation = review.get("explanation", "")
-                    suggestions = "\n".join(f"• {s}" for s in review.get("suggestions", []))
-                    await sio.emit('terminal:output', {
-                        'data': f'\r\n\x1b[33m💡 Suggestion:\x1b[0m\r\n{_ansi_escape(explanation)}\r\n\r\n{_ansi_escape(suggestions)}\r\n'
-                    }, room=sid)
-
-            await sio.emit('terminal:exit', {'code': 1, 'reason': 'compilation_error'}, room=sid)
-            shutil.rmtree(temp_dir, ignore_errors=True)
-            return
+            await _output(session, f'\r\n\x1b[31m✗ Compilation Error:\x1b[0m\r\n{_ansi_escape(error_msg)}\r\n')
 
-        await sio.emit('terminal:output', {
-             'data': '\x1b[32m✓ Compiled successfully\x1b[0m\r\n\r\n'}, room=sid)
+            await _emit_review(session, error_msg, code, True, cancel_token)
+
+            if not cancel_token.cancelled:
+                await _exit(session, 1, 'compilation_error')
+            _finish_run(session, cancel_token)
+            return
 
+        # Registered before anything else can fail, so every later error path cleans it up
         with process_lock:
-            interactive_processes[sid] = proc
-            interactive_temp_dirs[sid] = temp_dir
+            interactive_processes[session] = proc
+            interactive_temp_dirs[session] = temp_dir
+            session_holds[session] = hold
+        launched = True  # the quota claim now ends with the program (_kill_process)
+        hold.launched()
+        hibernation.track(session, proc, hold.reservation)
+        await run_in("db", session_registry.set_pid, session, proc.pid)
+
+        await _output(session, '\x1b[32m✓ Compiled successfully\x1b[0m\r\n\r\n')
+        # Under a pty the terminal echoes and edits lines itself; the client sends raw keys
+        await sio.emit('terminal:started', {'pty': bool(getattr(proc, 'pty', False))}, room=session)
 
         # Start output streaming in a separate thread/task
-        asyncio.create_task(_stream_output(sid, proc, code))
+        asyncio.create_task(_stream_output(session, proc, code, cancel_token, profile and temp_dir))
 
+    except ExecutionCancelled:
+        pass
     except Exception as e:
-        await sio.emit('terminal:error', {'message': str(e)}, room=sid)
-        _kill_process(sid)
-
-async def _stream_output(sid, proc, code):
-    import os as python_os
-    import asyncio
-    
-    loop = asyncio.get_event_loop()
-    
+        await sio.emit('terminal:error', {'message': str(e)}, room=session)
+        _kill_process(session)
+    finally:
+        if not launched:
+            _registry_update(session_registry.release, session, run_id)
+
+async def _run_benchmark_session(session, client, code, options, cancel_token):
+    """Benchmark the marked methods, streaming each iteration to the terminal."""
     try:
-        fd = proc.stdout.fileno()
-        output_buffer = []
-        
-        while True:
-            # We use loop.run_in_executor for the blocking read
-            chunk = await loop.run_in_executor(None, python_os.read, fd, 1)
-            if not chunk:
-                break
-            try:
-                text = chunk.decode('utf-8', errors='replace')
-                output_buffer.append(text)
-                await sio.emit('terminal:output', {
-                    'data': text.replace('\n', '\r\n')
-                }, room=sid)
-            except Exception:
-                pass
-
-        exit_code = await loop.run_in_executor(None, proc.wait)
-
-        if exit_code != 0:
-            full_output = "".join(output_buffer)
-            await sio.emit('terminal:output', {
-                'data': '\r\n\x1b[36m🤖 Asking AI for help...\x1b[0m\r\n'
-            }, room=sid)
-
-            ai_explanation = await loop.run_in_executor(None, ai_review_error, full_output, code, False)
-            if ai_explanation:
-                await sio.emit('terminal:output', {
-                    'data': f'\r\n\x1b[33m💡 AI Suggestion:\x1b[0m\r\n{_ansi_escape(ai_explanation)}\r\n'
-                }, room=sid)
-            else:
-                review = await loop.run_in_executor(None, explain_error, full_output, code, False)
-                if review:
-                    explanation = review.get("explanation", "")
-                    suggestions = "\n".join(f"• {s}" for s in review.get("suggestions", []))
-                    await sio.emit('terminal:output', {
-                        'data': f'\r\n\x1b[33m💡 Suggestion:\x1b[0m\r\n{_ansi_escape(explanation)}\r\n\r\n{_ansi_escape(suggestions)}\r\n'
-                    }, room=sid)
-
-        await sio.emit('terminal:exit', {'code': exit_code, 'reason': 'natural'}, room=sid)
+        options = BenchmarkSettings(**options)
+    except ValidationError as e:
+        await sio.emit('terminal:error', {'message': f'Invalid benchmark settings: {e}'}, room=session)
+        _finish_run(session, cancel_token)
+        return
+
+    loop = asyncio.get_running_loop()
+
+    def progress(event):
+        # Called from the compile executor thread for every harness line
+        if event['type'] == 'iteration':
+            line = (f"\x1b[2m[fork {event['fork']}/{options.forks}] {event['method']} "
+                    f"{event['phase']} #{event['iteration']}:\x1b[0m "
+                    f"{event['ns_per_op']:,.1f} ns/op\r\n")
+            asyncio.run_coroutine_threadsafe(_output(session, line), loop)
+        asyncio.run_coroutine_threadsafe(sio.emit('benchmark:progress', event, room=session), loop)
+
+    try:
+        await _output(session, '\r\n\x1b[36m⚙  Compiling benchmark...\x1b[0m\r\n')
+
+        async with scheduler.slot("interactive", client):
+            async with memory_admission.admitted_launch(("javac", "java")) as reservation:
+                result = await run_in(
+                    "compile", run_benchmark, code, options, reservation, cancel_token, progress)
+
+        if cancel_token.cancelled:
+            return
+
+        if result.get('output'):
+            await _output(session, _ansi_escape(result['output']))
+
+        if not result.get('success'):
+            error_msg = result.get('error') or 'Benchmark failed'
+            await _output(session, f'\r\n\x1b[31m✗ Benchmark failed:\x1b[0m\r\n{_ansi_escape(error_msg)}\r\n')
+            await _emit_review(session, error_msg, code, 'error:' in error_msg, cancel_token)
+            if not cancel_token.cancelled:
+                await _exit(session, 1, 'benchmark_failed')
+            return
+
+        await _output(session, f"\r\n\x1b[32m✓ Benchmark results\x1b[0m\r\n"
+                               f"{_ansi_escape(format_summary(result['benchmark']))}\r\n")
+        await sio.emit('benchmark:result', result['benchmark'], room=session)
+        await _exit(session, 0, 'benchmark')
+
+    except ExecutionCancelled:
+        pass
     except Exception as e:
-        await sio.emit('terminal:exit', {'code': -1, 'reason': str(e)}, room=sid)
+        await sio.emit('terminal:error', {'message': str(e)}, room=session)
     finally:
-        _kill_process(sid)
+        _finish_run(session, cancel_token)
 
-@sio.on('terminal:input')
-async def handle_terminal_input(sid, data):
+async def _emit_review(session, error_text, code, is_compilation, cancel_token):
+    """
+    Send an AI explanation of an error, or the local one if AI is unavailable
+    or not needed (the local review already pins down every missing symbol).
+    """
+    try:
+        review = await run_in("compile", explain_error, error_text, code, is_compilation)
+    except ExecutorSaturated:
+        review = None  # not confident: the AI review (if it has room) still answers
+    if cancel_token.cancelled:
+        return
+    if not is_confident(review):
+        await _output(session, '\r\n\x1b[36m🤖 Asking AI for help...\x1b[0m\r\n')
+
+        try:
+            ai_explanation = await run_in(
+                "ai", ai_review_error, error_text, code, is_compilation, cancel_token)
+        except ExecutorSaturated:
+            ai_explanation = None
+        if cancel_token.cancelled:
+            return
+
+        if ai_explanation:
+            await _output(session, f'\r\n\x1b[33m💡 AI Suggestion:\x1b[0m\r\n{_ansi_escape(ai_explanation)}\r\n')
+            return
+
+    if review:
+        explanation = review.get("explanation", "")
+        suggestions = "\n".join(f"• {s}" for s in review.get("suggestions", []))
+        await _output(session, f'\r\n\x1b[33m💡 Suggestion:\x1b[0m\r\n{_ansi_escape(explanation)}'
+                               f'\r\n\r\n{_ansi_escape(suggestions)}\r\n')
+
+async def _emit_profile(session, temp_dir, wall_seconds, cancel_token):
+    """Decode the flight recording of a finished profiled run and send it to the client."""
+    await _output(session, '\r\n\x1b[36m⚙  Analyzing profile...\x1b[0m\r\n')
+    try:
+        # The session still holds its interactive slot; `jfr print` is a JVM of
+        # its own and needs memory admission like the program it profiled
+        async with memory_admission.admitted_launch(("jfr",)) as reservation:
+            profile = await run_in(
+                "compile", profiler.analyze_recording, java_compiler.JAVA_PATH, temp_dir,
+                wall_seconds, cancel_token, reservation)
+    except ExecutorSaturated:
+        profile = {"error": "Server is busy, the profile was skipped"}
+    except MemoryPressure:
+        profile = {"error": "Server is low on memory, the profile was skipped"}
+    if cancel_token.cancelled:
+        return
+    await _output(session, _ansi_escape(profiler.format_summary(profile)) + '\r\n')
+    await sio.emit('profile:result', profile, room=session)
+
+async def _on_flood(session, proc, flood):
+    """
+    Tell the client its program's output is being summarized, and stop the
+    program once it passes the total cap if TERMINAL_FLOOD_KILL is set.
+    Returns the exit reason to report if the program was stopped.
+    """
+    metrics.incr(f"terminal.flood_{flood.flooding}")
+    await sio.emit('terminal:flood', {'reason': flood.flooding, **flood.stats()}, room=session)
+    if flood.flooding == "total" and settings.TERMINAL_FLOOD_KILL:
+        proc.kill()
+        await _output(session, f'\r\n\x1b[31m✗ Program stopped: it printed more than '
+                               f'{format_bytes(settings.TERMINAL_OUTPUT_MAX_BYTES)}\x1b[0m\r\n')
+        return 'output_limit'
+    if flood.flooding == "rate":
+        await _output(session, '\r\n\x1b[33m⚠ Your program is printing faster than the terminal can show; '
+                               'output is being summarized. Use Stop to end it.\x1b[0m\r\n')
+    return None
+
+def _send_queue_length(session):
+    """Messages queued but not yet written to the session's connections on this worker"""
+    state = sessions.get(session)
+    longest = 0
+    for sid in list(state.sids) if state else ():
+        try:
+            queue = sio.eio.sockets[sio.manager.eio_sid_from_sid(sid, '/')].queue
+        except (KeyError, AttributeError):
+            continue  # connected to another worker, or gone
+        longest = max(longest, queue.qsize())
+    return longest
+
+async def _wait_for_client(session, cancel_token):
+    """
+    Stop reading the program's output while the client is too far behind.
+    The pipe then fills up and the program blocks on write, so a slow
+    browser costs us a bounded queue rather than unbounded memory.
+    """
+    if _send_queue_length(session) <= settings.TERMINAL_MAX_QUEUED_MESSAGES:
+        return
+    metrics.incr("terminal.backpressure_pauses")
+    while _send_queue_length(session) > settings.TERMINAL_MAX_QUEUED_MESSAGES // 2 \
+            and not cancel_token.cancelled:
+        hibernation.touch(session)  # blocked on us, not idle
+        await asyncio.sleep(0.05)
+
+async def _stream_output(session, proc, code, cancel_token, profile_dir=None):
+    started = time.monotonic()
+    # A pty already sends \r\n; plain pipes and our own notices send \n
+    batcher = OutputBatcher(lambda text: _output(session, text.replace('\r\n', '\n').replace('\n', '\r\n')))
+    try:
+        # Only the end of the output is kept, for the error review
+        tail = OutputTail(settings.TERMINAL_TAIL_CHARS)
+        flood = FloodControl()
+        exit_reason = 'natural'
+
+        async for text in pipe_reader.iter_text(proc.stdout):
+            tail.append(text)
+            hibernation.touch(session)
+            flooding = flood.flooding
+            shown = flood.filter(text)
+            if flood.flooding != flooding:
+                exit_reason = await _on_flood(session, proc, flood) or exit_reason
+            if shown:
+                await batcher.write(shown)
+            await _wait_for_client(session, cancel_token)
+        summary = flood.finish()
+        if summary:
+            await batcher.write(summary)
+        await batcher.flush()
+
+        exit_code = await run_in("reaper", proc.wait)
+
+        if profile_dir and not cancel_token.cancelled:
+            await _emit_profile(session, profile_dir, time.monotonic() - started, cancel_token)
+
+        if exit_code != 0 and exit_reason == 'natural' and not cancel_token.cancelled:
+            await _emit_review(session, tail.text(), code, False, cancel_token)
+
+        # A cancelled run was stopped by someone who already sent its terminal:exit
+        if not cancel_token.cancelled:
+            await _exit(session, exit_code, exit_reason)
+    except Exception as e:
+        await _exit(session, -1, str(e))
+    finally:
+        batcher.discard()
+        _finish_run(session, cancel_token)
+        # A newer run may already own this session; only clean up our own process
+        with process_lock:
+            owns_session = interactive_processes.get(session) is proc
+        if owns_session:
+            _kill_process(session)
+
+async def _terminal_input(session, data, forwarded=False):
     with process_lock:
-        proc = interactive_processes.get(sid)
+        proc = interactive_processes.get(session)
+
+    if proc is None and not forwarded:
+        await _route_to_owner(session, 'input', data)
+        return
 
     if proc and proc.poll() is None:
+        # A frozen JVM is woken before it is handed the input
+        if hibernation.resume(session):
+            await sio.emit('terminal:resumed', {}, room=session)
         try:
             input_data = data.get('data', '')
             if isinstance(input_data, str):
@@ -180,16 +666,85 @@ async def handle_terminal_input(sid, data):
             else:
                 input_bytes = input_data
 
-            proc.stdin.write(input_bytes)
-            proc.stdin.flush()
+            # A pasted block may not fit the pty's input buffer: the write
+            # waits for the program to read, off the event loop
+            async with _state(session).stdin_lock:
+                await run_in("pipe_io", java_compiler.write_stdin, proc, input_bytes)
         except Exception as e:
             print(f"[JYVRA SOCKET] Stdin error: {e}")
 
+async def _terminal_kill(session, forwarded=False):
+    owner = None if forwarded else await _owner_elsewhere(session)
+    if owner is not None:
+        if not _publish(owner, session, 'kill'):
+            await _unreachable(session)
+        return
+    _cancel_run(session, "killed by user")
+    _kill_process(session)
+    await _exit(session, -1, 'killed')
+
+@sio.on('terminal:input')
+async def handle_terminal_input(sid, data):
+    session = connection_sessions.get(sid)
+    if session:
+        await _terminal_input(session, data)
+
 @sio.on('terminal:kill')
 async def handle_terminal_kill(sid):
-    _kill_process(sid)
-    await sio.emit('terminal:exit', {'code': -1, 'reason': 'killed'}, room=sid)
+    session = connection_sessions.get(sid)
+    if session:
+        await _terminal_kill(session)
+
+def _remember_size(session, data):
+    try:
+        rows, cols = int(data.get('rows', 0)), int(data.get('cols', 0))
+    except (TypeError, ValueError, AttributeError):
+        return None
+    if 0 < rows <= 1000 and 0 < cols <= 1000:
+        terminal_sizes[session] = (rows, cols)
+        return rows, cols
+    return None
+
+async def _terminal_resize(session, data, forwarded=False):
+    size = _remember_size(session, data)
+    if not size:
+        return
+    with process_lock:
+        proc = interactive_processes.get(session)
+    if proc:
+        java_compiler.resize_terminal(proc, *size)
+    elif not forwarded:
+        await _route_to_owner(session, 'resize', data)
 
 @sio.on('terminal:resize')
 async def handle_terminal_resize(sid, data):
-    pass
+    session = connection_sessions.get(sid)
+    if session:
+        await _terminal_resize(session, data)
+
+async def terminal_bus_task():
+    """Handle session events other workers forward to this one (the session lives here)"""
+    queue = session_bus.bus.subscribe('terminal')
+    while True:
+        message = await queue.get()
+        session, event, data = message['session'], message['event'], message.get('data')
+        try:
+            if event == 'input':
+                await _terminal_input(session, data, forwarded=True)
+            elif event == 'kill':
+                await _terminal_kill(session, forwarded=True)
+            elif event == 'resize':
+                await _terminal_resize(session, data, forwarded=True)
+            elif event == 'stop':
+                # Superseded by a run started on another worker, which holds the session now
+                _cancel_run(session, "superseded by a new run")
+                _kill_process(session)
+                state = sessions.pop(session, None)
+                if state and state.grace_timer:
+                    state.grace_timer.cancel()
+            elif event == 'attach':
+                await _attach(session, data)
+            elif event == 'detach':
+                _detach(session, data)
+        except Exception as e:
+            print(f"[JYVRA SOCKET] Forwarded {event} for session={session[:8]} failed: {e}")
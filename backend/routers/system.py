@@ -1,8 +1,15 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 import sys
-from schemas.system import HealthResponse, InfoResponse
+from schemas.system import HealthResponse, InfoResponse, MetricsResponse, ClusterResponse
 from core.config import settings
+from core import metrics as metric_counters
 from services.java_compiler import JAVA_AVAILABLE
+from services.scheduler import scheduler
+from services.memory_admission import memory_admission
+from services.executors import executor_stats
+from services import lifecycle, compile_cache, watchdog, syntax_check, hibernation
+from services.cluster import cluster
 
 # We'll need a way to access interactive_processes
 # For now, we'll import it from sockets (which we'll create next)
@@ -13,14 +20,23 @@ router = APIRouter(prefix="/api", tags=["system"])
 @router.get("/health", response_model=HealthResponse)
 async def health():
     from .sockets import interactive_processes
-    return HealthResponse(
-        status="ok",
+    draining = lifecycle.is_draining()
+    sessions = hibernation.counts()
+    response = HealthResponse(
+        status="draining" if draining else "ok",
         os=settings.SYSTEM,
         java_available=JAVA_AVAILABLE,
         is_windows=settings.IS_WINDOWS,
         is_linux=settings.IS_LINUX,
-        interactive_sessions=len(interactive_processes)
+        interactive_sessions=len(interactive_processes),
+        active_sessions=sessions["active"],
+        hibernated_sessions=sessions["hibernated"],
+        draining=draining
     )
+    if draining:
+        # Fail health checks so the load balancer stops sending us traffic
+        return JSONResponse(status_code=503, content=response.model_dump())
+    return response
 
 @router.get("/info", response_model=InfoResponse)
 async def info():
@@ -33,3 +49,20 @@ async def info():
         java_available=JAVA_AVAILABLE,
         python_version=f"{sys.version_info.major}.{sys.version_info.minor}"
     )
+
+@router.get("/metrics", response_model=MetricsResponse)
+async def metrics():
+    return MetricsResponse(
+        status="ok",
+        counters=metric_counters.snapshot(),
+        scheduler=scheduler.stats(),
+        memory=memory_admission.stats(),
+        executors=executor_stats(),
+        compile_cache=compile_cache.stats(),
+        watchdog=watchdog.stats(),
+        checks=syntax_check.stats()
+    )
+
+@router.get("/cluster", response_model=ClusterResponse)
+async def cluster_status():
+    return ClusterResponse(status="ok", **cluster.status())
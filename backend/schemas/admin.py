@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
+
+class DrainRequest(BaseModel):
+    deadline_seconds: Optional[int] = Field(default=None, ge=0, le=3600)
+    exit_when_done: bool = False
+
+class DrainStatus(BaseModel):
+    success: bool
+    draining: bool
+    reason: Optional[str] = None
+    seconds_left: Optional[float] = None
+    rest_runs_in_flight: int
+    exit_when_done: bool
+
+class ConfigUpdate(BaseModel):
+    values: Dict[str, Any]  # null resets a setting to its default
+
+class ConfigRollback(BaseModel):
+    change_id: Optional[str] = None  # defaults to the most recent change
+
+class ConfigResponse(BaseModel):
+    success: bool
+    change_id: Optional[str] = None
+    settings: Dict[str, Any]
+
+class ConfigAuditResponse(BaseModel):
+    success: bool
+    entries: List[Dict[str, Any]]
+
+class SessionsResponse(BaseModel):
+    success: bool
+    sessions: List[Dict[str, Any]]  # every worker's, from the session registry
+    bus: Dict[str, Any]
+
+class SchedulerClientsResponse(BaseModel):
+    success: bool
+    clients: List[Dict[str, Any]]  # busiest first, keyed by client IP
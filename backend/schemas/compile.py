@@ -1,9 +1,18 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal
+
+class BenchmarkSettings(BaseModel):
+    warmup_iterations: int = Field(default=3, ge=0, le=20)
+    iterations: int = Field(default=5, ge=1, le=50)
+    forks: int = Field(default=2, ge=1, le=5)
+    iteration_ms: int = Field(default=200, ge=10, le=2000)
 
 class CompileRequest(BaseModel):
     code: str
     stdin: Optional[str] = ""
+    mode: Literal["run", "benchmark"] = "run"
+    benchmark: Optional[BenchmarkSettings] = None
+    profile: bool = False
 
 class CompileResponse(BaseModel):
     success: bool
@@ -13,6 +22,39 @@ class CompileResponse(BaseModel):
     ai_review: Optional[str] = None
     error_review: Optional[Dict[str, Any]] = None
     needs_input: Optional[bool] = None
+    benchmark: Optional[Dict[str, Any]] = None
+    profile: Optional[Dict[str, Any]] = None
+    transcript: Optional[List[Dict[str, str]]] = None  # stdout/stderr chunks in print order
+
+class CheckRequest(BaseModel):
+    code: str = Field(..., max_length=50000)
+    document_id: Optional[str] = Field(default=None, max_length=100)  # newer checks cancel older ones
+    typecheck: bool = True
+
+class Diagnostic(BaseModel):
+    line: int
+    column: Optional[int] = None
+    severity: str
+    message: str
+    source: str
+
+class CheckResponse(BaseModel):
+    success: bool
+    tier: str
+    diagnostics: List[Diagnostic]
+    cached: bool
+    elapsed_ms: float
+    typecheck_skipped: Optional[str] = None
+
+class CompletionItem(BaseModel):
+    kind: str  # class, interface, enum, annotation, method or field
+    name: str
+    owner: str  # package of a class, class of a member
+    detail: str  # qualified class name, or the member's signature
+
+class CompletionResponse(BaseModel):
+    success: bool
+    items: List[CompletionItem]
 
 class VisualizeRequest(BaseModel):
     code: str
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+from schemas.compile import CompileResponse
+
+class JobCreate(BaseModel):
+    code: str = Field(..., max_length=50000)
+    stdin: Optional[str] = ""
+
+class JobCreated(BaseModel):
+    success: bool
+    id: str
+    status: str
+
+class JobDetail(BaseModel):
+    success: bool
+    id: str
+    kind: str
+    status: str
+    attempts: int
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[CompileResponse] = None
+    error: Optional[str] = None
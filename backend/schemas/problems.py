@@ -0,0 +1,63 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any
+
+class ProblemTestCreate(BaseModel):
+    input: str = Field(default="", max_length=1_000_000)
+    hidden: bool = True
+
+class ProblemCreate(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    statement: str = Field(..., max_length=50000)
+    reference_solution: str = Field(..., max_length=50000)
+    tests: List[ProblemTestCreate] = Field(..., min_length=1, max_length=100)
+    time_limit_seconds: Optional[float] = Field(default=None, gt=0, le=60)
+    memory_limit_mb: Optional[int] = Field(default=None, ge=32, le=4096)
+
+class ProblemTest(BaseModel):
+    ordinal: int
+    input: str
+    expected_output: str
+    hidden: bool
+
+class ProblemSummary(BaseModel):
+    id: str
+    title: str
+    time_limit_seconds: float
+    memory_limit_mb: int
+    test_count: int
+
+class ProblemListResponse(BaseModel):
+    success: bool
+    problems: List[ProblemSummary]
+
+class ProblemDetail(BaseModel):
+    success: bool
+    id: str
+    title: str
+    statement: str
+    time_limit_seconds: float
+    memory_limit_mb: int
+    test_count: int
+    tests: List[ProblemTest]  # sample tests only, unless requested by an admin
+
+class SubmissionCreate(BaseModel):
+    code: str = Field(..., max_length=50000)
+    author: str = Field(..., min_length=1, max_length=40)
+
+class SubmissionDetail(BaseModel):
+    success: bool
+    id: str
+    problem_id: str
+    author: str
+    verdict: str
+    passed: int
+    total: int
+    runtime_ms: Optional[float] = None
+    results: List[Dict[str, Any]]
+    compile_error: Optional[str] = None
+    created_at: Optional[str] = None
+
+class LeaderboardResponse(BaseModel):
+    success: bool
+    problem_id: str
+    entries: List[Dict[str, Any]]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any, List
 
 class HealthResponse(BaseModel):
     status: str
@@ -8,6 +8,9 @@ class HealthResponse(BaseModel):
     is_windows: bool
     is_linux: bool
     interactive_sessions: int
+    active_sessions: int = 0
+    hibernated_sessions: int = 0  # frozen while waiting for input (see services/hibernation.py)
+    draining: bool = False
 
 class InfoResponse(BaseModel):
     name: str
@@ -17,3 +20,24 @@ class InfoResponse(BaseModel):
     is_mac: bool
     java_available: bool
     python_version: str
+
+class MetricsResponse(BaseModel):
+    status: str
+    counters: Dict[str, Any]
+    scheduler: Dict[str, Any]
+    memory: Dict[str, Any]
+    executors: Dict[str, Any]
+    compile_cache: Dict[str, Any]
+    watchdog: Dict[str, Any]
+    checks: Dict[str, Any]
+
+class ClusterResponse(BaseModel):
+    status: str
+    enabled: bool
+    self_url: Optional[str] = None
+    vnodes: int
+    peers: List[Dict[str, Any]]
+    forwarded: int
+    received: int
+    fallbacks: int
+    peer_failures: int
@@ -0,0 +1,303 @@
+"""
+benchmark.py — Microbenchmark mode for user code
+A single run of a student's program is dominated by JVM startup and JIT
+warmup, so comparing two algorithms that way is mostly noise. In
+benchmark mode the user marks no-argument methods with @Benchmark (or
+names them bench*), and a small harness compiled next to their code runs
+each one in several forked JVMs:
+
+    for each fork:  W warmup iterations, then M measured iterations,
+                    each calling the method repeatedly for iteration_ms
+
+Return values are written to a volatile sink so the JIT can't eliminate
+the call. The harness prints one tagged line per iteration, which is
+streamed as progress and aggregated here into mean, stddev, percentiles
+and ops/s per method. Every fork runs under the usual timeout, memory
+admission and cancellation.
+
+stdout belongs to the harness: before loading the user's class it points
+System.out at a file, so user output can't split or fake its lines. Its
+tags also carry a per-run nonce, read from a file the harness deletes
+first, so a program writing to the raw stdout can't forge measurements.
+"""
+
+import os
+import re
+import math
+import secrets
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from core.config import settings
+from services import java_compiler
+from services.cancellation import ExecutionCancelled
+
+LINE_TAG = "@@JYVRA-BENCH"
+HARNESS_CLASS = "JyvraBenchHarness"
+NONCE_FILE = "jyvra-bench.nonce"
+USER_OUTPUT_FILE = "jyvra-bench.out"
+
+# Reflection-based, so it works with any user class and Java 8+
+HARNESS_SOURCE = """
+import java.io.*;
+import java.lang.annotation.Annotation;
+import java.lang.reflect.*;
+import java.util.*;
+
+public class JyvraBenchHarness {
+    public static volatile Object sink;
+
+    static boolean isBenchmark(Method m) {
+        if (m.getParameterTypes().length != 0) return false;
+        for (Annotation a : m.getAnnotations()) {
+            if (a.annotationType().getSimpleName().equals("Benchmark")) return true;
+        }
+        return m.getName().startsWith("bench");
+    }
+
+    public static void main(String[] args) throws Throwable {
+        // Read before any user code runs, which then can't learn it
+        File nonceFile = new File(args[5]);
+        BufferedReader nonceReader = new BufferedReader(new FileReader(nonceFile));
+        String tag = "@@JYVRA-BENCH " + nonceReader.readLine().trim() + " ";
+        nonceReader.close();
+        nonceFile.delete();
+        // stdout is the harness's channel; the program's System.out goes to a file
+        PrintStream channel = System.out;
+        System.setOut(new PrintStream(new FileOutputStream(args[6], true), true, "UTF-8"));
+
+        Class<?> target = Class.forName(args[0]);
+        int fork = Integer.parseInt(args[1]);
+        int warmup = Integer.parseInt(args[2]);
+        int iterations = Integer.parseInt(args[3]);
+        long iterationNanos = Long.parseLong(args[4]) * 1000000L;
+
+        List<Method> methods = new ArrayList<Method>();
+        for (Method m : target.getDeclaredMethods()) {
+            if (isBenchmark(m)) methods.add(m);
+        }
+        Collections.sort(methods, new Comparator<Method>() {
+            public int compare(Method a, Method b) { return a.getName().compareTo(b.getName()); }
+        });
+
+        Object instance = null;
+        for (Method m : methods) {
+            m.setAccessible(true);
+            Object receiver = null;
+            if (!Modifier.isStatic(m.getModifiers())) {
+                if (instance == null) {
+                    Constructor<?> c = target.getDeclaredConstructor();
+                    c.setAccessible(true);
+                    instance = c.newInstance();
+                }
+                receiver = instance;
+            }
+            for (int i = 0; i < warmup + iterations; i++) {
+                boolean measured = i >= warmup;
+                long ops = 0, batch = 1, elapsed;
+                long start = System.nanoTime();
+                do {
+                    long batchStart = System.nanoTime();
+                    try {
+                        for (long k = 0; k < batch; k++) sink = m.invoke(receiver);
+                    } catch (InvocationTargetException e) {
+                        channel.println(tag + "error " + m.getName() + " " + e.getCause());
+                        System.exit(1);
+                    }
+                    ops += batch;
+                    long now = System.nanoTime();
+                    // Grow the batch so reading the clock stays negligible
+                    if (now - batchStart < iterationNanos / 100) batch *= 2;
+                    elapsed = now - start;
+                } while (elapsed < iterationNanos);
+                channel.println(tag + "iter " + m.getName() + " " + fork + " "
+                        + (measured ? "measure" : "warmup") + " " + (measured ? i - warmup : i)
+                        + " " + ops + " " + elapsed);
+            }
+        }
+        channel.println(tag + "done " + fork + " " + methods.size());
+    }
+}
+"""
+
+ANNOTATION_SOURCE = """
+import java.lang.annotation.*;
+
+@Retention(RetentionPolicy.RUNTIME)
+@Target(ElementType.METHOD)
+public @interface Benchmark {}
+"""
+
+_BENCH_METHOD = re.compile(
+    r'(?:@Benchmark\s+(?:(?:public|private|protected|static|final)\s+)*[\w<>\[\],.?\s]+?\s+(\w+)'
+    r'|[\w<>\[\]]+\s+(bench\w*))\s*\(\s*\)')
+
+
+def find_benchmark_methods(source_code):
+    """Names of methods that look like benchmarks (the harness has the final say)"""
+    return sorted({a or b for a, b in _BENCH_METHOD.findall(source_code)})
+
+
+def _percentile(sorted_values, pct):
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples):
+    """Statistics over measured ns/op samples of one method"""
+    values = sorted(samples)
+    n = len(values)
+    mean = sum(values) / n
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1)) if n > 1 else 0.0
+    return {
+        "samples": n,
+        "mean_ns": round(mean, 3),
+        "stddev_ns": round(stddev, 3),
+        "min_ns": round(values[0], 3),
+        "p50_ns": round(_percentile(values, 50), 3),
+        "p90_ns": round(_percentile(values, 90), 3),
+        "p99_ns": round(_percentile(values, 99), 3),
+        "max_ns": round(values[-1], 3),
+        "ops_per_sec": round(1e9 / mean, 2) if mean > 0 else None,
+    }
+
+
+def _parse_line(line, nonce):
+    """
+    Decode one harness line into a progress event, or None for user output
+    (including lines that only look like ours: without the run's nonce, or malformed)
+    """
+    prefix = f"{LINE_TAG} {nonce} "
+    if not line.startswith(prefix):
+        return None
+    parts = line[len(prefix):].split()
+    try:
+        if parts[0] == "iter":
+            method, fork, phase, index, ops, elapsed = parts[1:7]
+            return {
+                "type": "iteration", "method": method, "fork": int(fork), "phase": phase,
+                "iteration": int(index) + 1, "ns_per_op": int(elapsed) / max(int(ops), 1),
+            }
+        if parts[0] == "error":
+            return {"type": "error", "method": parts[1], "message": " ".join(parts[2:])}
+        if parts[0] == "done":
+            return {"type": "fork_done", "fork": int(parts[1]), "methods": int(parts[2])}
+    except (IndexError, ValueError):
+        return None
+    return None
+
+
+def run_benchmark(source_code, options, reservation=None, cancel_token=None, progress=None):
+    """
+    Compile source_code with the harness and benchmark its marked methods
+    using options (a schemas.compile.BenchmarkSettings). Returns a compile_java()-style result dict with a `benchmark` entry.
+    progress, if given, is called (from this thread) with each event.
+    """
+    if not java_compiler.find_java():
+        return {"success": False, "error": "Java compiler (javac) not found on this system"}
+
+    methods = find_benchmark_methods(source_code)
+    if not methods:
+        return {"success": False, "error": (
+            "No benchmark methods found. Mark a no-argument method with @Benchmark "
+            "or name it bench<Something>().")}
+
+    per_fork_seconds = len(methods) * (options.warmup_iterations + options.iterations) \
+        * options.iteration_ms / 1000
+    if per_fork_seconds > settings.EXEC_TIMEOUT_SECONDS * 0.8:
+        return {"success": False, "error": (
+            f"This benchmark needs about {per_fork_seconds:.0f}s per fork, over the "
+            f"{settings.EXEC_TIMEOUT_SECONDS:g}s limit. Use fewer iterations or a shorter iteration time.")}
+
+    match = re.search(r'public\s+class\s+(\w+)', source_code)
+    class_name = match.group(1) if match else "Main"
+    temp_dir = tempfile.mkdtemp()
+    try:
+        source_file = Path(temp_dir) / f"{class_name}.java"
+        source_file.write_text(source_code, encoding='utf-8')
+        extra_files = [Path(temp_dir) / f"{HARNESS_CLASS}.java"]
+        extra_files[0].write_text(HARNESS_SOURCE, encoding='utf-8')
+        if "@interface Benchmark" not in source_code:
+            extra_files.append(Path(temp_dir) / "Benchmark.java")
+            extra_files[1].write_text(ANNOTATION_SOURCE, encoding='utf-8')
+
+        result = java_compiler._compile_source(
+            source_code, source_file, temp_dir, reservation, cancel_token, extra_files)
+        if result.returncode != 0:
+            return {"success": False, "error": result.stderr or "Compilation failed"}
+
+        samples = {}
+        user_output = []
+        failure = None
+        nonce = secrets.token_hex(16)
+        user_output_file = os.path.join(temp_dir, USER_OUTPUT_FILE)
+
+        def on_line(line):
+            nonlocal failure
+            event = _parse_line(line.rstrip("\n"), nonce)
+            if event is None:
+                user_output.append(line)
+                return
+            if event["type"] == "iteration" and event["phase"] == "measure":
+                samples.setdefault(event["method"], []).append(event["ns_per_op"])
+            if event["type"] == "error":
+                failure = f"{event['method']}() threw {event['message']}"
+            if progress:
+                progress(event)
+
+        stderr = []
+        for fork in range(1, options.forks + 1):
+            nonce_file = os.path.join(temp_dir, NONCE_FILE)
+            Path(nonce_file).write_text(nonce, encoding='utf-8')
+            cmd = [java_compiler.JAVA_PATH, "-Dfile.encoding=UTF-8", "-cp", temp_dir,
+                   HARNESS_CLASS, class_name, str(fork), str(options.warmup_iterations),
+                   str(options.iterations), str(options.iteration_ms), nonce_file,
+                   user_output_file]
+            run = java_compiler._run_measured(
+                cmd, "java", reservation, timeout=settings.EXEC_TIMEOUT_SECONDS,
+                cwd=temp_dir, cancel_token=cancel_token, on_line=on_line)
+            if os.path.exists(user_output_file):
+                user_output.append(Path(user_output_file).read_text(encoding='utf-8', errors='replace'))
+                os.remove(user_output_file)
+            if run.stderr:
+                stderr.append(run.stderr)
+            if failure or run.returncode != 0:
+                return {
+                    "success": False,
+                    "output": "".join(user_output),
+                    "error": failure or "".join(stderr) or f"Benchmark fork exited with code {run.returncode}",
+                }
+
+        return {
+            "success": True,
+            "output": java_compiler._truncate_output("".join(user_output)),
+            "error": "".join(stderr),
+            "os": settings.SYSTEM,
+            "benchmark": {
+                "warmup_iterations": options.warmup_iterations,
+                "iterations": options.iterations,
+                "forks": options.forks,
+                "iteration_ms": options.iteration_ms,
+                "methods": {name: summarize(values) for name, values in sorted(samples.items())},
+            },
+        }
+    except subprocess.TimeoutExpired:
+        return {"success": False,
+                "error": f"Benchmark timeout ({settings.EXEC_TIMEOUT_SECONDS:g}s limit per fork)"}
+    except ExecutionCancelled:
+        raise
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def format_summary(benchmark):
+    """Plain-text results table for the terminal"""
+    lines = [f"{'Benchmark':<28}{'ns/op':>14}{'± stddev':>12}{'p90':>12}{'ops/s':>16}"]
+    for name, stats in benchmark["methods"].items():
+        lines.append(
+            f"{name:<28}{stats['mean_ns']:>14,.1f}{stats['stddev_ns']:>12,.1f}"
+            f"{stats['p90_ns']:>12,.1f}{stats['ops_per_sec'] or 0:>16,.0f}")
+    return "\n".join(lines)
@@ -0,0 +1,89 @@
+"""
+cancellation.py — Cancelling an execution pipeline once nobody is waiting
+A CancelToken travels with one request through scheduling, javac, java
+and the AI review. Blocking code registers how to abort what it's doing
+(kill the JVM, close the AI response); cancel() runs those callbacks
+from whichever thread notices the client is gone.
+"""
+
+import asyncio
+import threading
+from core import metrics
+
+
+class ExecutionCancelled(Exception):
+    """Raised when work is abandoned because its client went away"""
+
+
+class CancelToken:
+    def __init__(self, source="rest"):
+        self.source = source
+        self.stage = "queued"
+        self.reason = None
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="client disconnected"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        metrics.incr(f"cancellations.{self.source}")
+        metrics.incr(f"cancellations.{self.source}.{self.stage}")
+        print(f"[CANCEL] {self.source} pipeline cancelled during {self.stage}: {reason}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"[CANCEL] Cancel callback failed: {e}")
+
+    def add_callback(self, callback):
+        """Run callback on cancel (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise ExecutionCancelled(self.reason)
+
+
+async def run_until_disconnected(request, token, coro, poll_interval=0.25):
+    """
+    Await coro, cancelling it (and the token) if the HTTP client disconnects
+    first. Raises ExecutionCancelled in that case.
+    """
+    work = asyncio.ensure_future(coro)
+
+    async def watch():
+        while not work.done():
+            if await request.is_disconnected():
+                token.cancel("client disconnected")
+                work.cancel()
+                return
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await work
+    except asyncio.CancelledError:
+        if token.cancelled:
+            raise ExecutionCancelled(token.reason)
+        raise
+    finally:
+        watcher.cancel()
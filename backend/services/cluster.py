@@ -0,0 +1,162 @@
+"""
+cluster.py — Consistent-hash routing of runs across backend nodes
+With CLUSTER_PEERS and CLUSTER_SELF set, every node places all peers on a
+hash ring (CLUSTER_VNODES points each) and sends a submission to the node
+that owns the hash of its source — the node whose compile cache most
+likely already holds it. Adding or removing a node only moves the keys
+next to it on the ring.
+
+Forwarded requests carry X-Arena-Forwarded and always run where they
+land, so requests never bounce between nodes. A peer that can't be
+reached (or answers 503 because it is draining or out of memory) is
+skipped for CLUSTER_PEER_COOLDOWN seconds and the run falls through to
+the next node on the ring, which may be this one.
+"""
+
+import time
+import bisect
+import hashlib
+import requests
+from core.config import settings
+from core import metrics
+from services.compile_cache import source_key
+
+FORWARDED_HEADER = "X-Arena-Forwarded"
+
+
+class PeerUnavailable(Exception):
+    """Raised when a peer can't take a forwarded run; run it locally instead"""
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+def _normalize(url):
+    return url.strip().rstrip("/")
+
+
+class HashRing:
+    def __init__(self, nodes, vnodes):
+        self.nodes = list(nodes)
+        self._ring = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in self.nodes for i in range(max(1, vnodes))
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def nodes_for(self, key):
+        """Every node once, in ring order starting from the key's owner"""
+        if not self._ring:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        for i in range(len(self._ring)):
+            node = self._ring[(start + i) % len(self._ring)][1]
+            if node not in seen:
+                seen.add(node)
+                yield node
+                if len(seen) == len(self.nodes):
+                    return
+
+
+class Cluster:
+    def __init__(self):
+        self._ring = None
+        self._ring_config = None
+        self.down_until = {}
+
+    @property
+    def self_url(self):
+        return _normalize(settings.CLUSTER_SELF)
+
+    @property
+    def enabled(self):
+        return bool(self.self_url) and len(settings.CLUSTER_PEERS) > 1
+
+    def ring(self):
+        # Rebuilt whenever the peer list changes
+        peers = tuple(sorted({_normalize(p) for p in settings.CLUSTER_PEERS}))
+        config = (peers, settings.CLUSTER_VNODES)
+        if config != self._ring_config:
+            self._ring = HashRing(peers, settings.CLUSTER_VNODES)
+            self._ring_config = config
+        return self._ring
+
+    def route(self, source_code, request):
+        """Peer URL a submission should be forwarded to, or None to run it here"""
+        if not self.enabled:
+            return None
+        if request.headers.get(FORWARDED_HEADER):
+            metrics.incr("cluster.received")
+            return None
+
+        now = time.monotonic()
+        for node in self.ring().nodes_for(source_key(source_code)):
+            if node == self.self_url:
+                return None
+            if self.down_until.get(node, 0) <= now:
+                return node
+        return None
+
+    def mark_down(self, node, reason):
+        self.down_until[node] = time.monotonic() + settings.CLUSTER_PEER_COOLDOWN
+        metrics.incr("cluster.peer_failures")
+        print(f"[CLUSTER] Skipping {node} for {settings.CLUSTER_PEER_COOLDOWN:.0f}s: {reason}")
+
+    def forward(self, node, path, payload, client_ip):
+        """
+        POST a run to a peer (blocking; use the forward executor). Returns
+        (status_code, body, headers); raises PeerUnavailable on failure.
+        """
+        try:
+            response = requests.post(
+                f"{node}{path}",
+                json=payload,
+                headers={FORWARDED_HEADER: self.self_url, "X-Forwarded-For": client_ip},
+                timeout=(settings.CLUSTER_CONNECT_TIMEOUT, settings.CLUSTER_FORWARD_TIMEOUT),
+            )
+        except requests.RequestException as e:
+            # Unreachable, or too slow to answer within CLUSTER_FORWARD_TIMEOUT
+            self.mark_down(node, str(e))
+            raise PeerUnavailable(str(e))
+
+        if response.status_code == 503:
+            self.mark_down(node, "peer is draining or out of memory")
+            raise PeerUnavailable("peer returned 503")
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {"detail": response.text}
+        headers = {}
+        if "Retry-After" in response.headers:
+            headers["Retry-After"] = response.headers["Retry-After"]
+        metrics.incr("cluster.forwarded")
+        return response.status_code, body, headers
+
+    def status(self):
+        now = time.monotonic()
+        ring = self.ring()
+        return {
+            "enabled": self.enabled,
+            "self_url": self.self_url or None,
+            "vnodes": settings.CLUSTER_VNODES,
+            "peers": [
+                {
+                    "url": node,
+                    "self": node == self.self_url,
+                    "available": self.down_until.get(node, 0) <= now,
+                    "retry_in": round(max(0.0, self.down_until.get(node, 0) - now), 1),
+                }
+                for node in ring.nodes
+            ],
+            "forwarded": metrics.get("cluster.forwarded"),
+            "received": metrics.get("cluster.received"),
+            "fallbacks": metrics.get("cluster.fallbacks"),
+            "peer_failures": metrics.get("cluster.peer_failures"),
+        }
+
+
+# Shared by every router in this process
+cluster = Cluster()
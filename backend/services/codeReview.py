@@ -12,6 +12,7 @@ import os
 import json
 import requests
 from dotenv import load_dotenv
+from services import symbol_index, suggest
 
 load_dotenv()  # Load environment variables from .env file
 
@@ -192,6 +193,12 @@ COMPILE_ERROR_PATTERNS = [
     },
 ]
 
+# Used for import hints when the JDK symbol index isn't available
+_COMMON_IMPORTS = {
+    name: [f"java.util.{name}"]
+    for name in ("Scanner", "ArrayList", "Arrays", "HashMap", "List", "Map")
+}
+
 # ── Common Java runtime error patterns ──
 RUNTIME_ERROR_PATTERNS = [
     {
@@ -339,6 +346,84 @@ def _match_patterns(error_text, patterns):
     return matched
 
 
+def _missing_symbols(error_text):
+    """(kind, name, location type) of each symbol javac couldn't resolve, in order"""
+    seen = []
+    for kind, name, owner in re.findall(
+            r"symbol:\s+(class|variable|method)\s+(\w+)[^\n]*"
+            r"(?:\n\s*location:\s+(?:variable \w+ of type |class |interface )?([\w.]+))?",
+            error_text):
+        if (kind, name, owner) not in seen:
+            seen.append((kind, name, owner))
+    return seen
+
+
+def import_fixes(error_text, source_code=""):
+    """
+    Exact "add import" fixes for unresolved class names, looked up in the
+    JDK symbol index (or a few common classes if it isn't loaded).
+    """
+    fixes = []
+    for kind, name, _ in _missing_symbols(error_text):
+        # `Arrays.sort(...)` without the import is reported as a variable
+        if kind == "method" or not name[0].isupper():
+            continue
+        candidates = symbol_index.import_candidates(name) or _COMMON_IMPORTS.get(name, [])
+        candidates = [c for c in candidates if f"import {c};" not in source_code]
+        if candidates:
+            fixes.append({
+                "kind": "add_import", "symbol": name,
+                "import": candidates[0], "alternatives": candidates[1:],
+            })
+    return fixes
+
+
+def symbol_fixes(error_text, source_code=""):
+    """
+    Fixes for every unresolved symbol: an import when the name is a JDK
+    class, otherwise a rename to the closest known name ("did you mean").
+    """
+    fixes = import_fixes(error_text, source_code)
+    imported = {fix["symbol"] for fix in fixes}
+    for kind, name, owner in _missing_symbols(error_text):
+        if name in imported:
+            continue
+        # The location is often the user's own class; only JDK types narrow members
+        if not (owner and symbol_index.index and symbol_index.index.classes_named(owner.rpartition(".")[2])):
+            owner = None
+        candidates = suggest.did_you_mean(name, kind, source_code, owner)
+        if candidates:
+            fixes.append({
+                "kind": "rename", "symbol": name,
+                "replacement": candidates[0]["name"],
+                "distance": candidates[0]["distance"],
+                "alternatives": [c["name"] for c in candidates[1:]],
+            })
+    return fixes
+
+
+def is_confident(review):
+    """
+    Whether a local review fully explains the error: every diagnostic is a
+    cannot-find-symbol with a clear import or a single close typo fix. The
+    slow AI review adds nothing then.
+    """
+    if not review or review.get("error_type") != "compilation":
+        return False
+    raw = review.get("raw_error", "")
+    errors = re.findall(r": error: (.*)", raw)
+    if not errors or any(e.strip() != "cannot find symbol" for e in errors):
+        return False
+    fixes = {fix["symbol"]: fix for fix in review.get("fixes", [])}
+    for _, name, _ in _missing_symbols(raw):
+        fix = fixes.get(name)
+        if fix is None:
+            return False
+        if fix["kind"] == "rename" and (fix["distance"] > 1 or fix["alternatives"]):
+            return False
+    return True
+
+
 def explain_error(error_text, source_code="", is_compilation_error=False):
     """
     Analyse a Java error (compilation or runtime) and return a structured,
@@ -363,6 +448,7 @@ def explain_error(error_text, source_code="", is_compilation_error=False):
         - explanation  : Detailed friendly explanation
         - line_numbers : List[int] of affected line numbers (if detected)
         - suggestions  : List[str] of actionable fix suggestions
+        - fixes        : List[dict] of exact edits (e.g. imports to add)
     """
     if not error_text or not error_text.strip():
         return None
@@ -409,6 +495,7 @@ def explain_error(error_text, source_code="", is_compilation_error=False):
         "explanation": explanation,
         "line_numbers": line_numbers,
         "suggestions": suggestions,
+        "fixes": symbol_fixes(error_text, source_code) if is_compilation_error else [],
     }
 
 
@@ -425,26 +512,16 @@ def _build_suggestions(error_text, source_code, is_compilation, matches):
             )
 
         if re.search(r"cannot find symbol", error_text, re.IGNORECASE):
-            # Check for common missing imports
-            if source_code:
-                if "Scanner" in source_code and "import java.util.Scanner" not in source_code:
-                    suggestions.append(
-                        "Add `import java.util.Scanner;` at the top of your file.")
-                if "ArrayList" in source_code and "import java.util.ArrayList" not in source_code:
-                    suggestions.append(
-                        "Add `import java.util.ArrayList;` at the top of your file.")
-                if "Arrays" in source_code and "import java.util.Arrays" not in source_code:
-                    suggestions.append(
-                        "Add `import java.util.Arrays;` at the top of your file.")
-                if "HashMap" in source_code and "import java.util.HashMap" not in source_code:
-                    suggestions.append(
-                        "Add `import java.util.HashMap;` at the top of your file.")
-                if "List" in source_code and "import java.util.List" not in source_code:
+            for fix in symbol_fixes(error_text, source_code):
+                alternatives = fix["alternatives"][:2]
+                if fix["kind"] == "add_import":
                     suggestions.append(
-                        "Add `import java.util.List;` at the top of your file.")
-                if "Map" in source_code and "import java.util.Map" not in source_code:
+                        f"Add `import {fix['import']};` at the top of your file."
+                        + (f" (or {', '.join(alternatives)})" if alternatives else ""))
+                else:
                     suggestions.append(
-                        "Add `import java.util.Map;` at the top of your file.")
+                        f"`{fix['symbol']}` is not defined. Did you mean `{fix['replacement']}`?"
+                        + (f" (or {', '.join(alternatives)})" if alternatives else ""))
             suggestions.append(
                 "Double-check your spelling of variable and method names.")
 
@@ -513,17 +590,59 @@ _SYSTEM_PROMPT = (
 )
 
 
-def ai_review_error(error_text, source_code="", is_compilation_error=False):
+def _clean_ai_content(content):
+    """Remove Markdown formatting so it prints cleanly in raw terminal output"""
+    content = re.sub(r'\*\*(.*?)\*\*', r'\1', content)
+    content = re.sub(r'__(.*?)__', r'\1', content)
+    content = re.sub(r'`(.*?)`', r'\1', content)
+    content = re.sub(r'```[a-zA-Z]*\n(.*?)\n```', r'\n\1\n', content, flags=re.DOTALL)
+    content = re.sub(r'```(.*?)```', r'\1', content, flags=re.DOTALL)
+    return content
+
+
+def _read_streamed_content(response, cancel_token):
+    """
+    Collect the text of a streamed (SSE) chat completion, stopping as soon
+    as cancel_token is cancelled. Returns None if cancelled.
+    """
+    parts = []
+    for line in response.iter_lines(decode_unicode=True):
+        if cancel_token.cancelled:
+            return None
+        # Blank lines separate events; ":" lines are keep-alive comments
+        if not line or line.startswith(":") or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        delta = chunk.get("choices", [{}])[0].get("delta", {})
+        parts.append(delta.get("content") or "")
+    return "".join(parts)
+
+
+def ai_review_error(error_text, source_code="", is_compilation_error=False, cancel_token=None):
     """
     Call the OpenRouter reasoning model to get a detailed, AI-generated
     explanation of a Java error.
 
+    When a cancel_token is given the completion is streamed, so the request
+    can be abandoned mid-generation once the client is gone.
+
     Returns a string with the AI explanation, or None if the call fails.
     """
     if not OPENROUTER_API_KEY:
         print("[REVIEW] OPENROUTER_API_KEY not set — skipping AI review")
         return None
 
+    if cancel_token:
+        if cancel_token.cancelled:
+            return None
+        cancel_token.stage = "ai"
+
     error_kind = "compilation" if is_compilation_error else "runtime"
     user_message = (
         f"Error type: {error_kind}\n\n"
@@ -531,6 +650,7 @@ def ai_review_error(error_text, source_code="", is_compilation_error=False):
         f"--- Error Output ---\n{error_text}"
     )
 
+    response = None
     try:
         response = requests.post(
             url=OPENROUTER_API_URL,
@@ -545,11 +665,13 @@ def ai_review_error(error_text, source_code="", is_compilation_error=False):
                     {"role": "user", "content": user_message},
                 ],
                 "temperature": 0,
+                "stream": cancel_token is not None,
                 # "response_format": {"type": "text"},
                 # "max_tokens": 200,
 
             }),
             timeout=15,
+            stream=cancel_token is not None,
         )
 
         if response.status_code != 200:
@@ -557,18 +679,20 @@ def ai_review_error(error_text, source_code="", is_compilation_error=False):
                 f"[REVIEW] OpenRouter API error: {response.status_code} {response.text[:200]}")
             return None
 
-        data = response.json()
-        ai_message = data.get("choices", [{}])[0].get("message", {})
-        content = ai_message.get("content", "")
+        if cancel_token:
+            cancel_token.add_callback(response.close)
+            content = _read_streamed_content(response, cancel_token)
+            if content is None:
+                print("[REVIEW] AI review aborted, client is gone")
+                return None
+        else:
+            data = response.json()
+            ai_message = data.get("choices", [{}])[0].get("message", {})
+            content = ai_message.get("content", "")
 
         if content and content.strip():
-            # Remove Markdown formatting so it prints cleanly in raw terminal output
-            content = re.sub(r'\*\*(.*?)\*\*', r'\1', content)
-            content = re.sub(r'__(.*?)__', r'\1', content)
-            content = re.sub(r'`(.*?)`', r'\1', content)
-            content = re.sub(r'```[a-zA-Z]*\n(.*?)\n```', r'\n\1\n', content, flags=re.DOTALL)
-            content = re.sub(r'```(.*?)```', r'\1', content, flags=re.DOTALL)
-            
+            content = _clean_ai_content(content)
+
             print(f"[REVIEW] AI review received ({len(content)} chars)")
             return content.strip()
 
@@ -579,5 +703,55 @@ def ai_review_error(error_text, source_code="", is_compilation_error=False):
         print("[REVIEW] OpenRouter API timed out")
         return None
     except Exception as e:
+        if cancel_token and cancel_token.cancelled:
+            print("[REVIEW] AI review aborted, client is gone")
+            return None
         print(f"[REVIEW] OpenRouter API exception: {e}")
         return None
+    finally:
+        if cancel_token and response is not None:
+            cancel_token.remove_callback(response.close)
+            response.close()
+
+
+def review_compile_result(result, source_code="", use_ai=True, cancel_token=None):
+    """
+    Attach an error review to a compile_java() result dict.
+
+    Tries the AI reviewer first (unless use_ai is False) and falls back to
+    the local pattern-based explanation. Errors the local review fully
+    explains (missing imports, typos) skip the AI round-trip. The result
+    dict is updated in place and returned.
+    """
+    error_text = result.get('error', '')
+    if not error_text or not error_text.strip():
+        return result
+
+    is_compilation = not result.get('success') and (
+        'Compilation failed' in error_text or 'error:' in error_text
+    )
+
+    if is_compilation:
+        review = explain_error(error_text, source_code, is_compilation_error=True)
+        if is_confident(review):
+            result['error_review'] = review
+            return result
+
+    ai_explanation = ai_review_error(
+        error_text=error_text,
+        source_code=source_code,
+        is_compilation_error=is_compilation,
+        cancel_token=cancel_token,
+    ) if use_ai else None
+    if ai_explanation:
+        result['ai_review'] = ai_explanation
+    else:
+        review = explain_error(
+            error_text=error_text,
+            source_code=source_code,
+            is_compilation_error=is_compilation,
+        )
+        if review:
+            result['error_review'] = review
+
+    return result
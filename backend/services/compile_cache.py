@@ -0,0 +1,211 @@
+"""
+compile_cache.py — On-disk cache of javac results keyed by source hash
+Students resubmit the same program over and over (and share links replay
+it), so javac output is cached per node under COMPILE_CACHE_DIR:
+
+    <dir>/<sha256 of key>/*.class   →  successful compile
+    <dir>/<sha256 of key>/classes   →  names of those class files, one per line
+    <dir>/<sha256 of key>/stderr    →  javac diagnostics (always present)
+    <dir>/<sha256 of key>/status    →  javac exit code
+
+The key is the source plus the javac that compiled it (version, binary)
+and its flags, so upgrading the JDK never restores class files from the
+old one.
+
+Entries are written to a temporary directory and renamed into place, so
+every gunicorn worker on the node can share the cache safely. Once it
+holds more than COMPILE_CACHE_MAX_ENTRIES, the least recently used
+entries are evicted down to 90% of that. Each worker counts its own
+stores between directory scans, and rescans at the latest every
+_RESCAN_SECONDS to see the others'. A restore that loses a race with an
+eviction is a miss.
+In cluster mode the hash of the source alone picks the node a submission
+is routed to.
+"""
+
+import os
+import glob
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from functools import lru_cache
+from core.config import settings
+from core import metrics
+
+# javac diagnostics mention the temp directory the source was compiled in
+_WORKDIR_PLACEHOLDER = "\x00WORKDIR\x00"
+
+# Eviction trims the cache to this share of COMPILE_CACHE_MAX_ENTRIES
+_LOW_WATER = 0.9
+# Longest time between scans, so stores by other workers are counted
+_RESCAN_SECONDS = 60.0
+
+# Entries as of the last scan plus this worker's stores since; None until scanned
+_entries = None
+_scanned_at = 0.0
+_count_lock = threading.Lock()
+
+
+def source_key(source_code):
+    return hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _javac_version(javac_path, mtime, size):
+    try:
+        result = subprocess.run([javac_path, "-version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return (result.stdout + result.stderr).strip()
+
+
+def compiler_key(javac_path, flags):
+    """Identifies a javac binary and its flags (the part of the key besides the source)"""
+    path = os.path.realpath(str(javac_path))
+    try:
+        stat = os.stat(path)
+        version = _javac_version(path, stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = "unknown"
+    return "\0".join([path, version, *flags])
+
+
+class CachedCompile:
+    def __init__(self, returncode, stderr):
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def _entry_dir(key):
+    return os.path.join(settings.COMPILE_CACHE_DIR, key)
+
+
+def restore(source_code, workdir):
+    """
+    Copy cached class files for this source into workdir. Returns a
+    CachedCompile, or None on a miss (or when the cache is disabled).
+    """
+    if not settings.COMPILE_CACHE_ENABLED:
+        return None
+
+    entry = _entry_dir(source_key(source_code))
+    try:
+        with open(os.path.join(entry, "status")) as f:
+            returncode = int(f.read().strip())
+        with open(os.path.join(entry, "stderr"), encoding="utf-8") as f:
+            stderr = f.read().replace(_WORKDIR_PLACEHOLDER, workdir)
+        try:
+            with open(os.path.join(entry, "classes"), encoding="utf-8") as f:
+                class_files = [os.path.join(entry, name) for name in f.read().split()]
+        except FileNotFoundError:
+            # Stored before the manifest existed
+            class_files = glob.glob(os.path.join(entry, "*.class"))
+        if returncode == 0 and not class_files:
+            raise OSError("no class files")
+        # An eviction removing the entry meanwhile makes a copy fail: a miss,
+        # never a compile with classes missing
+        for class_file in class_files:
+            shutil.copy2(class_file, workdir)
+        os.utime(entry)  # mark as recently used
+    except (OSError, ValueError):
+        metrics.incr("compile_cache.misses")
+        return None
+
+    metrics.incr("compile_cache.hits")
+    return CachedCompile(returncode, stderr)
+
+
+def store(source_code, workdir, returncode, stderr):
+    """Save the outcome of compiling this source in workdir"""
+    if not settings.COMPILE_CACHE_ENABLED:
+        return
+
+    entry = _entry_dir(source_key(source_code))
+    if os.path.isdir(entry):
+        return
+    try:
+        os.makedirs(settings.COMPILE_CACHE_DIR, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=settings.COMPILE_CACHE_DIR, prefix=".staging-")
+        class_files = glob.glob(os.path.join(workdir, "*.class")) if returncode == 0 else []
+        for class_file in class_files:
+            shutil.copy2(class_file, staging)
+        with open(os.path.join(staging, "classes"), "w", encoding="utf-8") as f:
+            f.write("".join(os.path.basename(c) + "\n" for c in class_files))
+        with open(os.path.join(staging, "stderr"), "w", encoding="utf-8") as f:
+            f.write((stderr or "").replace(workdir, _WORKDIR_PLACEHOLDER))
+        with open(os.path.join(staging, "status"), "w") as f:
+            f.write(str(returncode))
+        try:
+            os.rename(staging, entry)
+        except OSError:
+            # Another worker stored the same source first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+    except OSError as e:
+        print(f"[CACHE] Failed to store compile result: {e}")
+        return
+
+    metrics.incr("compile_cache.stores")
+    _evict()
+
+
+def _scan():
+    return [
+        e for e in os.scandir(settings.COMPILE_CACHE_DIR)
+        if e.is_dir() and not e.name.startswith(".")
+    ]
+
+
+def _evict():
+    """Count a new entry, and scan and trim the cache only when due"""
+    global _entries, _scanned_at
+    with _count_lock:
+        if _entries is not None:
+            _entries += 1
+        now = time.monotonic()
+        if _entries is not None and _entries <= settings.COMPILE_CACHE_MAX_ENTRIES \
+                and now - _scanned_at < _RESCAN_SECONDS:
+            return
+        _scanned_at = now
+    rescan()
+
+
+def rescan():
+    """Count the entries on disk and evict beyond the limit; returns the count"""
+    global _entries
+    try:
+        entries = _scan()
+    except OSError:
+        entries = []
+    if len(entries) > settings.COMPILE_CACHE_MAX_ENTRIES:
+        keep = int(settings.COMPILE_CACHE_MAX_ENTRIES * _LOW_WATER)
+
+        def mtime(entry):
+            try:
+                return entry.stat().st_mtime
+            except OSError:
+                return 0  # evicted by another worker already
+
+        entries.sort(key=mtime)
+        for entry in entries[:len(entries) - keep]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            metrics.incr("compile_cache.evictions")
+        entries = entries[len(entries) - keep:]
+    with _count_lock:
+        _entries = len(entries)
+    return len(entries)
+
+
+def stats():
+    with _count_lock:
+        entries = _entries
+    return {
+        "enabled": settings.COMPILE_CACHE_ENABLED,
+        "entries": entries,  # None until the first scan
+        "max_entries": settings.COMPILE_CACHE_MAX_ENTRIES,
+        "hits": metrics.get("compile_cache.hits"),
+        "misses": metrics.get("compile_cache.misses"),
+    }
@@ -0,0 +1,162 @@
+"""
+executors.py — Dedicated thread pools per blocking workload
+Blocking work used to share asyncio's small default executor, so a few
+slow AI calls or long proc.wait() calls could starve every terminal's
+output reads. Each workload class now gets its own pool:
+
+    pipe_io   →  blocking reads from interactive JVM pipes (Windows only,
+                 see pipe_reader.py) and writes of terminal input
+    compile   →  javac/java launches (compile_java, interactive sessions)
+    ai        →  AI error reviews (bounded queue; callers fall back to
+                 the local explainer when it's full)
+    reaper    →  waiting on and cleaning up finished processes
+    forward   →  runs forwarded to another node in cluster mode
+    db        →  SQLite queries made on behalf of the event loop (job
+                 queue, terminal session registry); a locked database
+                 then holds up that query, not the whole worker. One
+                 thread, so the writes of one caller land in order.
+"""
+
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.config import settings
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a bounded executor's queue is full"""
+
+
+class BoundedExecutor:
+    def __init__(self, name, max_workers, max_queue=0):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue  # 0 = unbounded
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"jyvra-{name}")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+        self.started_at = time.monotonic()
+
+    def _wrap(self, fn, args):
+        submitted_at = time.monotonic()
+
+        def call():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += started - submitted_at
+            try:
+                return fn(*args)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.total_run += time.monotonic() - started
+
+        return call
+
+    def resize(self, max_workers, max_queue=None):
+        """
+        Switch to a pool of a different size. Work already submitted
+        finishes on the old pool, which shuts down once it's drained.
+        """
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if max_workers == self.max_workers or max_workers < 1:
+            return
+        old_pool = self._pool
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"jyvra-{self.name}")
+        self.max_workers = max_workers
+        old_pool.shutdown(wait=False)
+        print(f"[EXECUTORS] {self.name} pool resized to {max_workers} workers")
+
+    def run(self, fn, *args):
+        """Schedule fn(*args) on this pool and return an awaitable future"""
+        with self._lock:
+            if self.max_queue and self.queued >= self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} executor queue is full")
+            self.queued += 1
+        try:
+            future = self._pool.submit(self._wrap(fn, args))
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+        future.add_done_callback(self._forget_cancelled)
+        return asyncio.wrap_future(future, loop=asyncio.get_event_loop())
+
+    def _forget_cancelled(self, future):
+        # Only work that never started can be cancelled, so call() never
+        # took it off the queue (cancelled awaiters, shutdown(cancel_futures))
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-9)
+            done = max(self.completed, 1)
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "utilization": round(self.active / self.max_workers, 3),
+                "busy_ratio": round(self.total_run / (elapsed * self.max_workers), 4),
+                "avg_wait_ms": round(self.total_wait / done * 1000, 2),
+                "avg_run_ms": round(self.total_run / done * 1000, 2),
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+executors = {
+    "pipe_io": BoundedExecutor("pipe_io", settings.EXECUTOR_PIPE_IO_WORKERS),
+    "compile": BoundedExecutor("compile", settings.EXECUTOR_COMPILE_WORKERS),
+    "ai": BoundedExecutor("ai", settings.EXECUTOR_AI_WORKERS, settings.EXECUTOR_AI_MAX_QUEUE),
+    "reaper": BoundedExecutor("reaper", settings.EXECUTOR_REAPER_WORKERS),
+    "forward": BoundedExecutor("forward", settings.EXECUTOR_FORWARD_WORKERS),
+    "db": BoundedExecutor("db", 1),
+}
+
+
+def apply_executor_settings():
+    """Resize the pools to the current settings (after a runtime config change)"""
+    executors["pipe_io"].resize(settings.EXECUTOR_PIPE_IO_WORKERS)
+    executors["compile"].resize(settings.EXECUTOR_COMPILE_WORKERS)
+    executors["ai"].resize(settings.EXECUTOR_AI_WORKERS, settings.EXECUTOR_AI_MAX_QUEUE)
+    executors["reaper"].resize(settings.EXECUTOR_REAPER_WORKERS)
+    executors["forward"].resize(settings.EXECUTOR_FORWARD_WORKERS)
+
+
+def run_in(name, fn, *args):
+    """Run a blocking callable on the named executor: await run_in("ai", fn, ...)"""
+    return executors[name].run(fn, *args)
+
+
+def executor_stats():
+    return {name: executor.stats() for name, executor in executors.items()}
+
+
+def shutdown_executors():
+    for executor in executors.values():
+        executor.shutdown()
@@ -0,0 +1,120 @@
+"""
+flood_control.py — Limits on how much a terminal program may print
+A runaway `while (true) System.out.println(...)` would otherwise stream
+to the browser forever. Each session's output passes a token bucket
+
+    TERMINAL_OUTPUT_RATE_BYTES per second, bursts up to TERMINAL_OUTPUT_BURST_BYTES
+
+and a total cap of TERMINAL_OUTPUT_MAX_BYTES. Output over the rate is
+not sent; once a second a one-line summary takes its place ("… 48.0 MB
+suppressed …" with the last line printed as a sample), and normal output
+resumes when the program slows down. Past the total cap everything is
+summarized, and with TERMINAL_FLOOD_KILL the program is stopped.
+
+Only a bounded tail of the output (OutputTail) is kept for the error
+review after the program exits.
+"""
+
+import time
+from collections import deque
+from core.config import settings
+
+_NOTICE_INTERVAL = 1.0  # seconds between suppression summaries
+
+
+def format_bytes(n):
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.1f} MB"
+    if n >= 1024:
+        return f"{n / 1024:.1f} KB"
+    return f"{n} bytes"
+
+
+class FloodControl:
+    def __init__(self):
+        self.tokens = settings.TERMINAL_OUTPUT_BURST_BYTES
+        self.updated = time.monotonic()
+        self.total = 0
+        self.suppressed = 0
+        self.unreported = 0  # suppressed since the last summary
+        self.last_notice = 0.0
+        self.sample = ""
+        self.suppressing = False
+        self.flooding = None  # None, "rate" or "total" once suppression started
+
+    @property
+    def over_total(self):
+        return self.total > settings.TERMINAL_OUTPUT_MAX_BYTES
+
+    def filter(self, text):
+        """What to show for a chunk of output: the chunk, a summary in its place, or ''"""
+        now = time.monotonic()
+        size = len(text.encode("utf-8"))
+        self.total += size
+        self.tokens = min(settings.TERMINAL_OUTPUT_BURST_BYTES,
+                          self.tokens + (now - self.updated) * settings.TERMINAL_OUTPUT_RATE_BYTES)
+        self.updated = now
+
+        # Once suppressing, wait for the bucket to refill halfway so output doesn't flicker
+        needed = max(size, settings.TERMINAL_OUTPUT_BURST_BYTES / 2) if self.suppressing else size
+        if not self.over_total and self.tokens >= needed:
+            self.tokens -= size
+            self.suppressing = False
+            # Calmed down: account for what was dropped, then carry on as normal
+            return self._notice() + text if self.unreported else text
+
+        self.suppressing = True
+        if self.flooding != "total":
+            self.flooding = "total" if self.over_total else "rate"
+        self.suppressed += size
+        self.unreported += size
+        lines = text.splitlines()
+        if len(lines) > 1 and not text.endswith("\n"):
+            lines.pop()  # cut off mid-line
+        lines = [line for line in lines if line.strip()]
+        if lines:
+            self.sample = lines[-1]
+        if now - self.last_notice >= _NOTICE_INTERVAL:
+            self.last_notice = now
+            return self._notice()
+        return ""
+
+    def finish(self):
+        """Summary of output suppressed since the last one (at exit)"""
+        return self._notice() if self.unreported else ""
+
+    def _notice(self):
+        sample = f" last line: {self.sample[:200]}" if self.sample else ""
+        notice = f"\n\x1b[2m… {format_bytes(self.unreported)} suppressed …{sample}\x1b[0m\n"
+        self.unreported = 0
+        return notice
+
+    def stats(self):
+        return {"total_bytes": self.total, "suppressed_bytes": self.suppressed,
+                "flooding": self.flooding}
+
+
+class OutputTail:
+    """The last max_chars characters of a stream, kept in chunks"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+
+    def append(self, text):
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size > self.max_chars and len(self.chunks) > 1:
+            removed = self.chunks.popleft()
+            self.size -= len(removed)
+            self.dropped += len(removed)
+        if self.size > self.max_chars:
+            # A single chunk longer than the whole tail
+            self.dropped += self.size - self.max_chars
+            self.chunks[0] = self.chunks[0][-self.max_chars:]
+            self.size = self.max_chars
+
+    def text(self):
+        return "".join(self.chunks)
@@ -0,0 +1,310 @@
+"""
+hibernation.py — Freezing terminal sessions that sit idle
+A program blocked at Scanner.nextLine() keeps a whole JVM resident while
+the student is away. Every HIBERNATE_CHECK_INTERVAL seconds each live
+session is looked at; one that got no input, printed nothing and used
+next to no CPU for HIBERNATE_IDLE_SECONDS is stopped (SIGSTOP, or a
+suspend on Windows, through psutil). Only a program waiting for stdin is
+frozen: on Linux one of its threads must be blocked in read() on fd 0
+(/proc/<pid>/task/*/syscall), so a program in Thread.sleep() or waiting
+on a timer keeps running. Where that can't be seen (other platforms), a
+frozen program is thawed again after HIBERNATE_UNVERIFIED_SECONDS. A stopped JVM's GC and compiler
+threads stay quiet and its pages are the first the kernel reclaims. The
+next terminal:input resumes it before the input is written, so the
+program never notices.
+
+When the host is too short of memory to admit another JVM (see
+memory_admission.py), hibernated sessions are killed, longest asleep
+first, until their memory covers the shortfall, and their owners are
+told why.
+
+Sessions are stopped for good once idle for TERMINAL_IDLE_TIMEOUT_SECONDS
+(a tab left open over the weekend) or TERMINAL_MAX_LIFETIME_SECONDS after
+they started, whether hibernation is enabled or not.
+
+All state is touched from the event loop only. The psutil and /proc
+reads of a check run as one sweep on the "reaper" executor, and the loop
+then applies what it found: activity, freezes, thaws and evictions.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import platform
+import psutil
+from core.config import settings
+from core import metrics
+from services.memory_admission import memory_admission
+from services.executors import run_in
+
+# CPU seconds a JVM may use between two checks and still count as idle (GC, JIT threads)
+_IDLE_CPU_SECONDS = 0.05
+
+# read() in /proc/<pid>/task/<tid>/syscall, by machine
+_READ_SYSCALL = {"x86_64": 0, "aarch64": 63, "arm64": 63, "i386": 3, "i686": 3, "armv7l": 3}
+
+
+class _Session:
+    def __init__(self, proc, reservation=None):
+        self.proc = proc
+        self.reservation = reservation  # memory admission reservation, fed the JVM's RSS
+        self.started_at = time.monotonic()
+        self.last_active = self.started_at
+        self.cpu_seconds = None
+        self.hibernated_at = None
+        self.thaw_at = None  # frozen without seeing it wait for stdin: resume by then
+        self.frozen = ()  # processes stopped when it was hibernated
+        self.rss = 0  # RSS of the process tree at the last check
+
+
+class _Sample:
+    """What one sweep saw of a session"""
+
+    def __init__(self, key, session, probe):
+        self.key = key
+        self.session = session
+        self.probe = probe  # idle long enough to check whether it waits for stdin
+        # Copied so the sweep never reads state the loop may be changing
+        self.hibernated = session.hibernated_at is not None
+        self.cpu_before = session.cpu_seconds
+        self.processes = None  # the process tree, None if it couldn't be read
+        self.rss = 0
+        self.cpu = None
+        self.waiting = False  # True/None (can't tell) when idle and maybe waiting for stdin
+
+
+_sessions = {}  # session token → _Session
+
+
+def track(key, proc, reservation=None):
+    _sessions[key] = _Session(proc, reservation)
+
+
+def forget(key):
+    _sessions.pop(key, None)
+
+
+def touch(key):
+    """Record activity (input or output) on a session"""
+    session = _sessions.get(key)
+    if session:
+        session.last_active = time.monotonic()
+
+
+def _processes(proc):
+    root = psutil.Process(proc.pid)
+    return [root] + root.children(recursive=True)
+
+
+def _waiting_for_input(processes):
+    """
+    Whether a thread of the program is blocked reading its stdin. None when
+    that can't be told (not Linux, an unknown machine, /proc unreadable).
+    """
+    read_nr = _READ_SYSCALL.get(platform.machine())
+    if not sys.platform.startswith("linux") or read_nr is None:
+        return None
+    try:
+        for process in processes:
+            tasks = f"/proc/{process.pid}/task"
+            for tid in os.listdir(tasks):
+                try:
+                    with open(f"{tasks}/{tid}/syscall") as f:
+                        fields = f.read().split()
+                except FileNotFoundError:
+                    continue  # the thread just exited
+                # "<nr> <arg0> ..." while in a syscall, "running" or "-1 ..." otherwise
+                if len(fields) > 1 and fields[0] == str(read_nr) and int(fields[1], 16) == 0:
+                    return True
+    except (OSError, ValueError, psutil.Error):
+        return None
+    return False
+
+
+def resume(key):
+    """Wake the session if it is hibernated; True if it was"""
+    session = _sessions.get(key)
+    if not session:
+        return False
+    session.last_active = time.monotonic()
+    if session.hibernated_at is None:
+        return False
+    for process in session.frozen:
+        try:
+            process.resume()
+        except psutil.Error:
+            pass
+    session.hibernated_at = None
+    session.thaw_at = None
+    session.frozen = ()
+    session.cpu_seconds = None
+    metrics.incr("hibernation.resumed")
+    return True
+
+
+def counts():
+    hibernated = sum(1 for s in _sessions.values() if s.hibernated_at is not None)
+    return {"active": len(_sessions) - hibernated, "hibernated": hibernated}
+
+
+def _sweep(samples, hibernate):
+    """
+    Blocking half of a check (reaper executor): read the process tree, RSS
+    and CPU time of each session, and whether the idle ones are waiting for
+    stdin. Returns memory admission's shortfall.
+    """
+    for sample in samples:
+        try:
+            sample.processes = _processes(sample.session.proc)
+        except psutil.Error:
+            continue
+        cpu = 0.0
+        for process in sample.processes:
+            try:
+                sample.rss += process.memory_info().rss
+                if not sample.hibernated:
+                    times = process.cpu_times()
+                    cpu += times.user + times.system
+            except psutil.Error:
+                pass
+        if sample.hibernated:
+            continue
+        sample.cpu = cpu
+        before = sample.cpu_before
+        if hibernate and sample.probe and (before is None or cpu - before <= _IDLE_CPU_SECONDS):
+            sample.waiting = _waiting_for_input(sample.processes)
+    return memory_admission.shortfall() if hibernate else 0
+
+
+def _record_activity(now, samples):
+    """
+    Count CPU use since the last check as activity, so a busy program is never
+    idle, and show memory admission what the program really uses
+    """
+    for sample in samples:
+        session = sample.session
+        if sample.processes is None:
+            continue
+        session.rss = sample.rss
+        if sample.cpu is None:
+            continue  # hibernated
+        if session.reservation:
+            session.reservation.observe(sample.rss)
+        if session.cpu_seconds is not None and sample.cpu - session.cpu_seconds > _IDLE_CPU_SECONDS:
+            session.last_active = now
+        session.cpu_seconds = sample.cpu
+
+
+async def _hibernate_idle(now, samples):
+    from routers.sockets import sio
+
+    for sample in samples:
+        key, session = sample.key, sample.session
+        if _sessions.get(key) is not session or sample.processes is None:
+            continue  # forgotten during the sweep, or its processes couldn't be read
+        if session.hibernated_at is not None or session.proc.poll() is not None:
+            continue
+        if now - session.last_active < settings.HIBERNATE_IDLE_SECONDS:
+            continue  # active since the snapshot, or during the sweep
+        if sample.waiting is False:
+            continue  # sleeping or waiting on a timer: it will wake up by itself
+        frozen = []
+        try:
+            for process in sample.processes:
+                process.suspend()
+                frozen.append(process)
+        except psutil.Error:
+            for process in frozen:
+                try:
+                    process.resume()
+                except psutil.Error:
+                    pass
+            continue
+        session.frozen = frozen
+        session.hibernated_at = now
+        if sample.waiting is None:
+            session.thaw_at = now + settings.HIBERNATE_UNVERIFIED_SECONDS
+        metrics.incr("hibernation.hibernated")
+        print(f"[HIBERNATE] Froze idle session {key[:8]}")
+        await sio.emit('terminal:hibernated', {
+            'idle_seconds': round(now - session.last_active)}, room=key)
+
+
+async def _thaw_unverified(now):
+    """Resume programs frozen without being seen to wait for stdin"""
+    from routers.sockets import sio
+
+    for key, session in list(_sessions.items()):
+        if session.thaw_at is not None and now >= session.thaw_at and resume(key):
+            await sio.emit('terminal:resumed', {}, room=key)
+
+
+async def _evict_under_pressure(shortfall):
+    if shortfall <= 0:
+        return
+    from routers.sockets import _output, _exit, _kill_process, _cancel_run
+
+    asleep = sorted((s.hibernated_at, key) for key, s in _sessions.items()
+                    if s.hibernated_at is not None)
+    for _, key in asleep:
+        if shortfall <= 0:
+            break
+        session = _sessions.get(key)
+        if not session:
+            continue
+        shortfall -= session.rss
+        await _output(key, '\r\n\x1b[33m💤 Your program was stopped: it had been waiting for input for a '
+                           'long time and the server ran low on memory. Please run it again.\x1b[0m\r\n')
+        await _exit(key, -1, 'evicted')
+        _cancel_run(key, "evicted while hibernated")
+        _kill_process(key)
+        metrics.incr("hibernation.evicted")
+        print(f"[HIBERNATE] Evicted hibernated session {key[:8]} (memory pressure)")
+
+
+async def _reap_expired(now):
+    from routers.sockets import _output, _exit, _kill_process, _cancel_run
+
+    idle_limit = settings.TERMINAL_IDLE_TIMEOUT_SECONDS
+    lifetime_limit = settings.TERMINAL_MAX_LIFETIME_SECONDS
+    for key, session in list(_sessions.items()):
+        if lifetime_limit and now - session.started_at > lifetime_limit:
+            reason, message = 'max_lifetime', f'it ran for the maximum of {lifetime_limit / 60:g} minutes'
+        elif idle_limit and now - session.last_active > idle_limit:
+            reason, message = 'idle_timeout', f'it sat idle for {idle_limit / 60:g} minutes'
+        else:
+            continue
+        await _output(key, f'\r\n\x1b[33m⏱ Your program was stopped: {message}. Please run it again.\x1b[0m\r\n')
+        await _exit(key, -1, reason)
+        _cancel_run(key, reason.replace('_', ' '))
+        _kill_process(key)
+        metrics.incr(f"terminal.reaped_{reason}")
+        print(f"[HIBERNATE] Stopped session {key[:8]} ({reason})")
+
+
+async def hibernation_task():
+    """
+    Background loop freezing idle sessions, evicting frozen ones under
+    memory pressure and stopping sessions past their idle or lifetime limit
+    """
+    while True:
+        await asyncio.sleep(settings.HIBERNATE_CHECK_INTERVAL)
+        try:
+            now = time.monotonic()
+            hibernate = settings.HIBERNATE_ENABLED
+            samples = [
+                _Sample(key, session, session.hibernated_at is None and
+                        now - session.last_active >= settings.HIBERNATE_IDLE_SECONDS)
+                for key, session in _sessions.items()
+                if session.hibernated_at is not None or session.proc.poll() is None
+            ]
+            shortfall = await run_in("reaper", _sweep, samples, hibernate)
+            _record_activity(now, samples)
+            if hibernate:
+                await _thaw_unverified(now)
+                await _hibernate_idle(now, samples)
+                await _evict_under_pressure(shortfall)
+            await _reap_expired(now)
+        except Exception as e:
+            print(f"[HIBERNATE] Check failed: {e}")
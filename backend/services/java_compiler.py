@@ -1,15 +1,34 @@
 import os
+import time
+import signal
+import select
+import struct
 import shutil
 import tempfile
+import threading
 import subprocess
+import psutil
 from pathlib import Path
 from core.config import settings
 
+try:  # POSIX only: terminal sessions run under a pseudo-terminal there
+    import pty
+    import fcntl
+    import termios
+except ImportError:
+    pty = None
+from services.memory_admission import memory_admission, process_tree_rss
+from services.cancellation import ExecutionCancelled
+from services import compile_cache, profiler, buffered_output
+
 # Global state for Java availability
 JAVA_PATH = None
 JAVAC_PATH = None
 JAVA_AVAILABLE = False
 
+# Seconds an interactive program may leave its input unread before write_stdin gives up
+STDIN_WRITE_TIMEOUT = 30.0
+
 
 def find_java():
     """Find java and javac executables"""
@@ -75,8 +94,134 @@ def find_java():
         return False
 
 
-def compile_java(source_code, stdin_input=""):
-    """Compile and run Java source code with optional stdin input. Class name is always extracted from code."""
+def _communicate_lines(proc, on_line, timeout):
+    """proc.communicate() that also hands each stdout line to on_line as it arrives"""
+    stderr_chunks = []
+    stderr_reader = threading.Thread(
+        target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    stderr_reader.start()
+    timed_out = threading.Event()
+
+    def expire():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, expire) if timeout else None
+    if timer:
+        timer.start()
+    stdout_lines = []
+    try:
+        for line in proc.stdout:
+            stdout_lines.append(line)
+            on_line(line)
+        proc.wait()
+    except BaseException:
+        # Nobody reads stdout any more: stop the child before waiting on stderr
+        proc.kill()
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+        stderr_reader.join()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(proc.args, timeout)
+    return "".join(stdout_lines), "".join(stderr_chunks)
+
+
+def _run_measured(cmd, profile, reservation=None, input=None, timeout=None, cwd=None,
+                  cancel_token=None, on_line=None, binary=False):
+    """
+    subprocess.run(capture_output=True, text=True) equivalent that samples the
+    child's RSS, feeding the memory admission reservation and profile history.
+    The child is killed if cancel_token is cancelled, raising ExecutionCancelled.
+    With on_line, stdout lines are also passed to it as they are printed.
+    With binary, input and output are bytes instead of text.
+    """
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+        cancel_token.stage = profile
+
+    proc = subprocess.Popen(
+        cmd,
+        stdin=subprocess.PIPE if input is not None else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=not binary,
+        encoding=None if binary else 'utf-8',
+        cwd=cwd
+    )
+    peak = 0
+    finished = threading.Event()
+
+    def sample():
+        nonlocal peak
+        while not finished.is_set():
+            rss = process_tree_rss(proc)
+            peak = max(peak, rss)
+            if reservation:
+                reservation.observe(rss)
+            finished.wait(0.05)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    if cancel_token:
+        cancel_token.add_callback(proc.kill)
+    try:
+        if on_line:
+            stdout, stderr = _communicate_lines(proc, on_line, timeout)
+        else:
+            stdout, stderr = proc.communicate(input, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+    finally:
+        finished.set()
+        sampler.join()
+        memory_admission.record_peak(profile, peak)
+        if cancel_token:
+            cancel_token.remove_callback(proc.kill)
+
+    if cancel_token:
+        cancel_token.raise_if_cancelled()
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+
+def _truncate_output(text):
+    limit = settings.EXEC_MAX_OUTPUT_CHARS
+    if text and len(text) > limit:
+        return text[:limit] + f"\n... output truncated ({len(text) - limit} more characters)"
+    return text
+
+
+def _compile_source(source_code, source_file, workdir, reservation=None, cancel_token=None,
+                    extra_files=()):
+    """
+    Run javac on source_file, reusing cached class files for identical source
+    compiled by the same javac. extra_files (e.g. the benchmark harness) are
+    compiled alongside it and are part of the cache key.
+    """
+    flags = ["-encoding", "UTF-8"]
+    compile_cmd = [str(JAVAC_PATH), *flags, str(source_file)]
+    compile_cmd += [str(f) for f in extra_files]
+    cache_key = compile_cache.compiler_key(JAVAC_PATH, flags) + "\0" + source_code + "".join(
+        "\0" + Path(f).read_text(encoding="utf-8") for f in extra_files)
+    cached = compile_cache.restore(cache_key, workdir)
+    if cached is not None:
+        return subprocess.CompletedProcess(compile_cmd, cached.returncode, "", cached.stderr)
+
+    result = _run_measured(compile_cmd, "javac", reservation, cwd=workdir,
+                           cancel_token=cancel_token)
+    compile_cache.store(cache_key, workdir, result.returncode, result.stderr)
+    return result
+
+
+def compile_java(source_code, stdin_input="", reservation=None, cancel_token=None, profile=False):
+    """
+    Compile and run Java source code with optional stdin input. Class name is always extracted from code.
+    With profile, the run is recorded with JFR and the summary is returned under "profile".
+    """
     print("[JYVRA DEBUG] Starting compile_java function.")
     if not find_java():
         print("[JYVRA DEBUG] Java compiler not found.")
@@ -96,16 +241,8 @@ def compile_java(source_code, stdin_input=""):
 
         print(
             f"[JYVRA DEBUG] Compiling Java code with class name: {class_name} in temp dir: {temp_dir}")
-        compile_cmd = [JAVAC_PATH, "-encoding", "UTF-8", str(source_file)]
-        print(
-            f"[JYVRA DEBUG] Running compile command: {' '.join(compile_cmd)}")
-        result = subprocess.run(
-            compile_cmd,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            cwd=temp_dir
-        )
+        result = _compile_source(
+            source_code, source_file, temp_dir, reservation, cancel_token)
 
         if result.returncode != 0:
             print("[JYVRA DEBUG] Compilation failed.")
@@ -116,31 +253,56 @@ def compile_java(source_code, stdin_input=""):
                 "error": result.stderr or "Compilation failed"
             }
 
-        run_cmd = [JAVA_PATH, "-Dfile.encoding=UTF-8", "-Dsun.stdout.encoding=UTF-8",
-                   "-Dsun.stderr.encoding=UTF-8", "-cp", temp_dir, class_name]
+        launcher = buffered_output.launcher_classpath(JAVAC_PATH) \
+            if settings.EXEC_BUFFERED_OUTPUT else None
+        if launcher:
+            run_cmd = [JAVA_PATH, "-Dfile.encoding=UTF-8", "-cp", temp_dir + os.pathsep + launcher,
+                       buffered_output.LAUNCHER_CLASS, class_name]
+        else:
+            run_cmd = [JAVA_PATH, "-Dfile.encoding=UTF-8", "-Dsun.stdout.encoding=UTF-8",
+                       "-Dsun.stderr.encoding=UTF-8", "-cp", temp_dir, class_name]
+        profile_error = profiler.unsupported_reason(JAVA_PATH) if profile else None
+        if profile and not profile_error:
+            run_cmd[1:1] = profiler.jvm_options(JAVA_PATH, temp_dir)
         print(f"[JYVRA DEBUG] Running execution command: {' '.join(run_cmd)}")
-        result = subprocess.run(
-            run_cmd,
+        started = time.monotonic()
+        if launcher and stdin_input:
+            stdin_input = stdin_input.encode('utf-8')
+        result = _run_measured(
+            run_cmd, "java", reservation,
             input=stdin_input if stdin_input else None,
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            timeout=10,
-            cwd=temp_dir
+            timeout=settings.EXEC_TIMEOUT_SECONDS,
+            cwd=temp_dir,
+            cancel_token=cancel_token,
+            binary=bool(launcher)
         )
 
-        output = result.stdout
-        error = result.stderr
-        print("[JYVRA DEBUG] Execution finished. Cleaning up temp directory.")
-        shutil.rmtree(temp_dir)
-        print("[JYVRA DEBUG] Returning result.")
-        return {
+        transcript = None
+        if launcher:
+            output, error, transcript = buffered_output.demux(
+                result.stdout, result.stderr, settings.EXEC_MAX_OUTPUT_CHARS)
+        else:
+            output, error = result.stdout, result.stderr
+        response = {
             "success": True,
-            "output": output,
-            "error": error,
+            "output": _truncate_output(output),
+            "error": _truncate_output(error),
             "os": settings.SYSTEM
         }
+        if transcript:
+            response["transcript"] = transcript
+        if profile:
+            response["profile"] = {"error": profile_error} if profile_error else \
+                profiler.analyze_recording(
+                    JAVA_PATH, temp_dir, time.monotonic() - started, cancel_token, reservation)
+        print("[JYVRA DEBUG] Execution finished. Cleaning up temp directory.")
+        shutil.rmtree(temp_dir)
+        print("[JYVRA DEBUG] Returning result.")
+        return response
 
+    except ExecutionCancelled:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
     except subprocess.TimeoutExpired:
         try:
             shutil.rmtree(temp_dir)
@@ -159,19 +321,106 @@ def compile_java(source_code, stdin_input=""):
                 "needs_input": True
             }
         else:
-            return {"success": False, "error": "Execution timeout (10s limit)"}
+            return {"success": False,
+                    "error": f"Execution timeout ({settings.EXEC_TIMEOUT_SECONDS:g}s limit)"}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-def run_interactive_java(temp_dir, class_name="Main"):
-    """Start an interactive Java process in the given temp directory with dynamic class name"""
+def _set_controlling_tty():
+    # Runs in the child after setsid(): the pty on fd 0 becomes its terminal,
+    # so Ctrl+C raises SIGINT and programs can open /dev/tty to switch to raw mode
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+def _winsize(size):
+    rows, cols = size
+    return struct.pack("HHHH", rows, cols, 0, 0)
+
+
+def _start_under_pty(cmd, temp_dir, size):
+    """
+    Popen cmd with a pseudo-terminal as stdin/stdout/stderr. proc.stdin and
+    proc.stdout are unbuffered files on the pty master, like plain pipes.
+    """
+    master, slave = pty.openpty()
+    try:
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, _winsize(size or (24, 80)))
+        proc = subprocess.Popen(
+            cmd,
+            stdin=slave,
+            stdout=slave,
+            stderr=slave,
+            cwd=temp_dir,
+            env={**os.environ, "TERM": "xterm-256color"},
+            start_new_session=True,
+            preexec_fn=_set_controlling_tty,
+        )
+    except Exception:
+        os.close(master)
+        raise
+    finally:
+        os.close(slave)
+    proc.stdout = os.fdopen(master, "rb", buffering=0)
+    proc.stdin = os.fdopen(os.dup(master), "wb", buffering=0)
+    proc.pty = True
+    return proc
+
+
+def resize_terminal(proc, rows, cols):
+    """Propagate a terminal:resize to a pty session (the kernel sends SIGWINCH)"""
+    if getattr(proc, "pty", False) and proc.poll() is None:
+        try:
+            fcntl.ioctl(proc.stdout.fileno(), termios.TIOCSWINSZ, _winsize((rows, cols)))
+        except (OSError, ValueError):
+            pass
+
+
+def write_stdin(proc, data):
+    """
+    Write all of data to an interactive program's stdin; blocks until the
+    program has taken it (run it on the pipe_io executor). The pty master is
+    non-blocking once its output is read through the event loop, and stdin
+    shares it, so a full input buffer gives short writes that are retried.
+    Raises TimeoutError if the program doesn't read for STDIN_WRITE_TIMEOUT.
+    """
+    fd = proc.stdin.fileno()
+    if not settings.IS_WINDOWS:
+        os.set_blocking(fd, False)
+    view = memoryview(data)
+    deadline = time.monotonic() + STDIN_WRITE_TIMEOUT
+    while view:
+        try:
+            written = os.write(fd, view)
+        except BlockingIOError:
+            written = 0
+        if written:
+            view = view[written:]
+            continue
+        if proc.poll() is not None:
+            raise BrokenPipeError("the program has exited")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"the program did not read {len(view)} bytes of input")
+        select.select([], [fd], [], min(remaining, 1.0))
+
+
+def run_interactive_java(temp_dir, class_name="Main", profile=False, size=None):
+    """
+    Start an interactive Java process in the given temp directory with dynamic class name.
+    On POSIX it runs under a pseudo-terminal of size (rows, cols) unless TERMINAL_PTY is off.
+    """
     if not find_java():
         raise RuntimeError("Java not available")
 
     class_name = class_name or "Main"
     cmd = [JAVA_PATH, "-Dfile.encoding=UTF-8", "-Dsun.stdout.encoding=UTF-8",
            "-Dsun.stderr.encoding=UTF-8", "-cp", temp_dir, class_name]
+    if profile:
+        cmd[1:1] = profiler.jvm_options(JAVA_PATH, temp_dir)
+
+    if pty and settings.TERMINAL_PTY:
+        return _start_under_pty(cmd, temp_dir, size)
 
     # On Windows, running through cmd /c can sometimes improve pipe responsiveness
     if settings.IS_WINDOWS:
@@ -184,10 +433,38 @@ def run_interactive_java(temp_dir, class_name="Main"):
         stderr=subprocess.STDOUT,
         bufsize=0,  # Completely unbuffered
         cwd=temp_dir,
+        # Own process group, so the session can be killed with everything it started
+        start_new_session=not settings.IS_WINDOWS,
     )
 
 
-def prepare_interactive_java(code, class_name="Main"):
+def kill_session_process(proc):
+    """
+    SIGKILL a terminal session's process group: the JVM and anything it
+    started. Doesn't wait for them; reap with proc.wait() afterwards.
+    """
+    if proc.returncode is not None:
+        return  # already reaped: its group ID may belong to someone else by now
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+        except OSError:
+            pass  # not a group leader after all; fall back to the process itself
+    else:
+        # Windows: `cmd /c java ...` leaves java running if only cmd is killed
+        try:
+            for child in psutil.Process(proc.pid).children(recursive=True):
+                child.kill()
+        except psutil.Error:
+            pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
+
+
+def prepare_interactive_java(code, class_name="Main", reservation=None, cancel_token=None):
     """
     Prepare for interactive Java execution:
     1. Create temp dir
@@ -202,34 +479,35 @@ def prepare_interactive_java(code, class_name="Main"):
     import re
     match = re.search(r'public\s+class\s+(\w+)', code)
     class_name_extracted = match.group(1) if match else "Main"
-    temp_dir = tempfile.mkdtemp()
-    source_file = Path(temp_dir) / f"{class_name_extracted}.java"
-    source_file.write_text(code, encoding='utf-8')
-
     if not JAVAC_PATH:
         raise RuntimeError("JAVAC_PATH is not set. Java compiler not found.")
-    compile_cmd = [str(JAVAC_PATH), "-encoding", "UTF-8", str(source_file)]
-    result = subprocess.run(
-        compile_cmd,
-        capture_output=True,
-        text=True,
-        encoding='utf-8',
-        cwd=temp_dir
-    )
+    temp_dir = tempfile.mkdtemp()
+    try:
+        source_file = Path(temp_dir) / f"{class_name_extracted}.java"
+        source_file.write_text(code, encoding='utf-8')
+        result = _compile_source(code, source_file, temp_dir, reservation, cancel_token)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
 
     return temp_dir, class_name_extracted, result
 
 
-def start_interactive_session(code, class_name="Main"):
+def start_interactive_session(code, class_name="Main", reservation=None, cancel_token=None,
+                              profile=False, size=None):
     """
     High-level function to compile and start an interactive Java process with dynamic class name.
-    Returns (proc, temp_dir, compile_result)
+    size is the client's terminal (rows, cols). Returns (proc, temp_dir, compile_result)
     """
     temp_dir, class_name_extracted, compile_result = prepare_interactive_java(
-        code)
+        code, reservation=reservation, cancel_token=cancel_token)
 
     if compile_result.returncode != 0:
         return None, temp_dir, compile_result
 
-    proc = run_interactive_java(temp_dir, class_name_extracted)
+    try:
+        proc = run_interactive_java(temp_dir, class_name_extracted, profile, size)
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
     return proc, temp_dir, compile_result
@@ -0,0 +1,287 @@
+"""
+job_queue.py — Durable asynchronous execution jobs
+Jobs are stored in the SQLite database so they survive restarts. Every API
+process runs a few workers that claim queued jobs with a lease and renew it
+while the job runs; when a worker dies its lease expires and the job is
+claimed again, up to JOB_MAX_ATTEMPTS times.
+"""
+
+import os
+import json
+import time
+import socket
+import sqlite3
+import asyncio
+from nanoid import generate
+from core.config import settings
+from services.java_compiler import compile_java
+from services.codeReview import review_compile_result
+from services.scheduler import scheduler
+from services.memory_admission import memory_admission
+from services.executors import run_in, ExecutorSaturated
+from services.cancellation import CancelToken
+from services import lifecycle
+
+JOB_KINDS = ("compile",)
+
+# Identifies this process as the owner of the leases it takes
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _connect():
+    conn = sqlite3.connect(settings.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def enqueue_job(kind, payload):
+    """Store a new job and return its ID"""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job_id = generate(size=12)
+    conn = _connect()
+    try:
+        conn.execute("""
+            INSERT INTO jobs (id, kind, payload, status, created_at)
+            VALUES (?, ?, ?, 'queued', ?)
+        """, (job_id, kind, json.dumps(payload), time.time()))
+        conn.commit()
+    finally:
+        conn.close()
+    return job_id
+
+
+def get_job(job_id):
+    """Return a job as a dict, or None if it doesn't exist (or was purged)"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+    if not row:
+        return None
+
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def claim_job(worker_id=WORKER_ID):
+    """
+    Atomically take the oldest runnable job: either queued, or running
+    under a lease that has expired. Returns the claimed job or None.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        row = conn.execute("""
+            UPDATE jobs
+            SET status = 'running',
+                lease_owner = ?,
+                lease_expires_at = ?,
+                attempts = attempts + 1,
+                started_at = ?
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE (status = 'queued'
+                       OR (status = 'running' AND lease_expires_at < ?))
+                  AND attempts < ?
+                ORDER BY created_at
+                LIMIT 1
+            )
+            RETURNING id, kind, payload, attempts
+        """, (worker_id, now + settings.JOB_LEASE_SECONDS, now, now,
+              settings.JOB_MAX_ATTEMPTS)).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    if not row:
+        return None
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+def renew_lease(job_id, worker_id=WORKER_ID):
+    """
+    Extend our lease on a running job. Returns "ok", "cancel" if a client
+    asked for the job to be cancelled, or "lost" if we no longer own it.
+    """
+    conn = _connect()
+    try:
+        row = conn.execute("""
+            UPDATE jobs SET lease_expires_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+            RETURNING cancel_requested
+        """, (time.time() + settings.JOB_LEASE_SECONDS, job_id, worker_id)).fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    if not row:
+        return "lost"
+    return "cancel" if row[0] else "ok"
+
+
+def request_cancel(job_id):
+    """
+    Cancel a job. Queued jobs are cancelled immediately; running jobs are
+    flagged and stopped by their worker at its next heartbeat. Returns the
+    job's resulting status, or None if it doesn't exist.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        cancelled = conn.execute("""
+            UPDATE jobs SET status = 'cancelled', finished_at = ?
+            WHERE id = ? AND status = 'queued'
+        """, (now, job_id)).rowcount
+        if not cancelled:
+            conn.execute("""
+                UPDATE jobs SET cancel_requested = 1
+                WHERE id = ? AND status = 'running'
+            """, (job_id,))
+        conn.commit()
+        row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+
+    return row[0] if row else None
+
+
+def finish_job(job_id, status, result=None, error=None, worker_id=WORKER_ID):
+    """Record the outcome of a job we still hold the lease for"""
+    conn = _connect()
+    try:
+        cursor = conn.execute("""
+            UPDATE jobs
+            SET status = ?, result = ?, error = ?, finished_at = ?,
+                lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND lease_owner = ? AND status = 'running'
+        """, (status, json.dumps(result) if result is not None else None,
+              error, time.time(), job_id, worker_id))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def sweep_jobs():
+    """
+    Fail jobs whose lease expired after their last allowed attempt and
+    purge finished jobs older than the retention period.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        exhausted = conn.execute("""
+            UPDATE jobs
+            SET status = 'failed', error = 'Job abandoned after too many attempts',
+                finished_at = ?, lease_owner = NULL, lease_expires_at = NULL
+            WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?
+        """, (now, now, settings.JOB_MAX_ATTEMPTS)).rowcount
+        purged = conn.execute("""
+            DELETE FROM jobs
+            WHERE status IN ('succeeded', 'failed', 'cancelled') AND finished_at < ?
+        """, (now - settings.JOB_RESULT_RETENTION,)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+
+    if exhausted:
+        print(f"[JOBS] Marked {exhausted} abandoned jobs as failed")
+    if purged:
+        print(f"[JOBS] Purged {purged} finished jobs")
+
+
+async def _execute_job(job, cancel_token):
+    """Run a claimed job in the batch lane and return its result dict"""
+    payload = job["payload"]
+    source_code = payload.get("code", "")
+
+    async with scheduler.slot("batch", payload.get("client", "anonymous")):
+        async with memory_admission.admitted_launch(("javac", "java")) as reservation:
+            result = await run_in(
+                "compile", compile_java, source_code, payload.get("stdin") or "",
+                reservation, cancel_token)
+    try:
+        return await run_in("ai", review_compile_result, result, source_code, True, cancel_token)
+    except ExecutorSaturated:
+        # The local review scans the whole source: keep it off the event loop too
+        try:
+            return await run_in("compile", review_compile_result, result, source_code, False)
+        except ExecutorSaturated:
+            return result
+
+
+async def _run_claimed_job(job):
+    cancel_token = CancelToken("job")
+    task = asyncio.ensure_future(_execute_job(job, cancel_token))
+    # Heartbeats also pick up cancel requests, so keep them frequent
+    heartbeat = min(settings.JOB_LEASE_SECONDS / 3, 2.0)
+
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=heartbeat)
+        if done:
+            break
+        lease = await run_in("db", renew_lease, job["id"])
+        if lease == "lost":
+            # Another worker took over after our lease lapsed; let it win.
+            print(f"[JOBS] Lost lease on job {job['id']}")
+            cancel_token.cancel("lease lost")
+            task.cancel()
+            return
+        if lease == "cancel":
+            cancel_token.cancel("job cancelled")
+            task.cancel()
+            await run_in("db", finish_job, job["id"], "cancelled")
+            print(f"[JOBS] Job {job['id']} cancelled")
+            return
+
+    try:
+        result = task.result()
+    except Exception as e:
+        await run_in("db", finish_job, job["id"], "failed", None, str(e))
+        print(f"[JOBS] Job {job['id']} failed: {e}")
+        return
+
+    await run_in("db", finish_job, job["id"], "succeeded", result)
+    print(f"[JOBS] Job {job['id']} finished (attempt {job['attempts']})")
+
+
+async def job_worker_task():
+    """Background loop that claims and runs queued jobs"""
+    while True:
+        if lifecycle.is_draining():
+            # Leave queued jobs to workers that aren't shutting down
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+
+        try:
+            job = await run_in("db", claim_job)
+        except Exception as e:
+            print(f"[JOBS] Error claiming job: {e}")
+            job = None
+
+        if not job:
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            continue
+
+        try:
+            await _run_claimed_job(job)
+        except Exception as e:
+            print(f"[JOBS] Worker error on job {job['id']}: {e}")
+
+
+async def job_sweeper_task():
+    """Background loop that expires abandoned jobs and purges old results"""
+    while True:
+        try:
+            await run_in("db", sweep_jobs)
+        except Exception as e:
+            print(f"[JOBS] Error during sweep: {e}")
+        await asyncio.sleep(30)
@@ -0,0 +1,345 @@
+"""
+judge.py — Problem sets with hidden tests and parallel judging
+A problem is a statement, time/memory limits and a list of test inputs.
+When an admin creates one, the reference solution is run on every input
+and its output becomes the expected output, so test data can't drift
+from the solution.
+
+A submission is compiled once (through the compile cache), then all of
+its test cases run in parallel, each in its own JVM with the problem's
+limits:
+
+    compile   →  one batch-lane slot, charged to the client
+    tests     →  up to JUDGE_MAX_PARALLEL_TESTS batch-lane slots at once,
+                 under memory admission and the submission's cancel token
+
+Verdicts and per-test timings are stored in the submissions table, which
+the leaderboard reads through a covering index.
+"""
+
+import re
+import json
+import time
+import shutil
+import sqlite3
+import asyncio
+import tempfile
+import subprocess
+from pathlib import Path
+from nanoid import generate
+from core.config import settings
+from services import java_compiler
+from services.scheduler import scheduler
+from services.memory_admission import memory_admission
+from services.executors import run_in
+from services.cancellation import CancelToken
+
+# Ordered by precedence: a submission gets the verdict of its first failing test
+VERDICTS = ("accepted", "wrong_answer", "time_limit_exceeded", "memory_limit_exceeded",
+            "runtime_error", "compilation_error")
+
+
+class InvalidReference(ValueError):
+    """Raised when the reference solution doesn't pass its own tests"""
+
+
+def _connect():
+    conn = sqlite3.connect(settings.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _normalize(output):
+    """Compare outputs ignoring trailing whitespace on lines and at the end"""
+    return "\n".join(line.rstrip() for line in (output or "").replace("\r\n", "\n").split("\n")).rstrip()
+
+
+def _time_limit(problem):
+    return min(problem["time_limit_seconds"], settings.EXEC_TIMEOUT_SECONDS)
+
+
+def _compile(source_code, reservation, cancel_token):
+    """Compile into a fresh workdir. Returns (workdir, class_name, compiler_error)"""
+    if not java_compiler.find_java():
+        return None, None, "Java compiler (javac) not found on this system"
+    match = re.search(r'public\s+class\s+(\w+)', source_code)
+    class_name = match.group(1) if match else "Main"
+    workdir = tempfile.mkdtemp()
+    source_file = Path(workdir) / f"{class_name}.java"
+    source_file.write_text(source_code, encoding='utf-8')
+    try:
+        result = java_compiler._compile_source(
+            source_code, source_file, workdir, reservation, cancel_token)
+    except Exception:
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+    if result.returncode != 0:
+        shutil.rmtree(workdir, ignore_errors=True)
+        return None, None, result.stderr or "Compilation failed"
+    return workdir, class_name, None
+
+
+def _run_test(workdir, class_name, test_input, time_limit, memory_limit_mb,
+              reservation, cancel_token):
+    """Run one test case; returns its verdict-less result (output, timing, exit)"""
+    cmd = [java_compiler.JAVA_PATH, f"-Xmx{memory_limit_mb}m", "-Dfile.encoding=UTF-8",
+           "-cp", workdir, class_name]
+    started = time.monotonic()
+    try:
+        result = java_compiler._run_measured(
+            cmd, "java", reservation, input=test_input, timeout=time_limit,
+            cwd=workdir, cancel_token=cancel_token)
+    except subprocess.TimeoutExpired:
+        return {"timed_out": True, "time_ms": round(time_limit * 1000, 1)}
+    return {
+        "timed_out": False,
+        "time_ms": round((time.monotonic() - started) * 1000, 1),
+        "returncode": result.returncode,
+        "stdout": java_compiler._truncate_output(result.stdout),
+        "stderr": java_compiler._truncate_output(result.stderr),
+    }
+
+
+def _verdict(run, expected_output):
+    if run["timed_out"]:
+        return "time_limit_exceeded"
+    if run["returncode"] != 0:
+        if "java.lang.OutOfMemoryError" in run["stderr"]:
+            return "memory_limit_exceeded"
+        return "runtime_error"
+    if expected_output is not None and _normalize(run["stdout"]) != _normalize(expected_output):
+        return "wrong_answer"
+    return "accepted"
+
+
+async def _run_all(source_code, inputs, time_limit, memory_limit_mb, client, cancel_token):
+    """
+    Compile once and run every input in parallel. Returns (runs, compiler_error);
+    runs are in input order.
+    """
+    async with scheduler.slot("batch", client):
+        async with memory_admission.admitted_launch(("javac",)) as reservation:
+            workdir, class_name, error = await run_in(
+                "compile", _compile, source_code, reservation, cancel_token)
+    if error:
+        return None, error
+
+    parallel = asyncio.Semaphore(max(1, settings.JUDGE_MAX_PARALLEL_TESTS))
+    # The tests share a token of their own so one failing test can stop the rest
+    tests_token = CancelToken("judge")
+
+    def forward_cancel():
+        tests_token.cancel(cancel_token.reason)
+
+    if cancel_token:
+        cancel_token.add_callback(forward_cancel)
+
+    async def run_one(test_input):
+        async with parallel:
+            tests_token.raise_if_cancelled()
+            async with scheduler.slot("batch", client, admitted=True):
+                async with memory_admission.admitted_launch(("java",)) as reservation:
+                    return await run_in(
+                        "compile", _run_test, workdir, class_name, test_input, time_limit,
+                        memory_limit_mb, reservation, tests_token)
+
+    tasks = [asyncio.ensure_future(run_one(test_input)) for test_input in inputs]
+    try:
+        runs = await asyncio.gather(*tasks)
+    finally:
+        if cancel_token:
+            cancel_token.remove_callback(forward_cancel)
+        # A failed (or cancelled) run leaves the other tests going: kill their
+        # JVMs and wait for them before removing the classes they load
+        if not all(task.done() for task in tasks):
+            tests_token.cancel("another test of the submission failed")
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await run_in("reaper", shutil.rmtree, workdir, True)
+    return runs, None
+
+
+async def create_problem(title, statement, tests, reference_solution, time_limit_seconds,
+                         memory_limit_mb, cancel_token=None):
+    """
+    Store a problem. tests is a list of {"input", "hidden"}; expected outputs
+    are produced by the reference solution, which must pass every test.
+    Raises InvalidReference otherwise. Returns the problem ID.
+    """
+    time_limit = min(time_limit_seconds, settings.EXEC_TIMEOUT_SECONDS)
+    runs, error = await _run_all(
+        reference_solution, [t["input"] for t in tests], time_limit, memory_limit_mb,
+        "admin", cancel_token)
+    if error:
+        raise InvalidReference(f"Reference solution does not compile:\n{error}")
+    for ordinal, run in enumerate(runs, 1):
+        verdict = _verdict(run, None)
+        if verdict != "accepted":
+            raise InvalidReference(
+                f"Reference solution failed test {ordinal}: {verdict.replace('_', ' ')}")
+
+    problem_id = generate(size=8)
+    await run_in("db", _insert_problem, problem_id, title, statement, tests, runs,
+                 time_limit_seconds, memory_limit_mb, reference_solution)
+    print(f"[JUDGE] Created problem {problem_id} with {len(tests)} tests")
+    return problem_id
+
+
+def _insert_problem(problem_id, title, statement, tests, runs, time_limit_seconds,
+                    memory_limit_mb, reference_solution):
+    conn = _connect()
+    try:
+        conn.execute("""
+            INSERT INTO problems (id, title, statement, time_limit_seconds, memory_limit_mb,
+                                  reference_solution, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (problem_id, title, statement, time_limit_seconds, memory_limit_mb,
+              reference_solution, time.time()))
+        conn.executemany("""
+            INSERT INTO problem_tests (problem_id, ordinal, input, expected_output, hidden)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(problem_id, ordinal, test["input"], run["stdout"], int(test.get("hidden", True)))
+              for ordinal, (test, run) in enumerate(zip(tests, runs), 1)])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def delete_problem(problem_id):
+    """Remove a problem with its tests and submissions. Returns False if it didn't exist"""
+    conn = _connect()
+    try:
+        deleted = conn.execute("DELETE FROM problems WHERE id = ?", (problem_id,)).rowcount
+        conn.execute("DELETE FROM problem_tests WHERE problem_id = ?", (problem_id,))
+        conn.execute("DELETE FROM submissions WHERE problem_id = ?", (problem_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    return bool(deleted)
+
+
+def list_problems():
+    conn = _connect()
+    try:
+        rows = conn.execute("""
+            SELECT p.id, p.title, p.time_limit_seconds, p.memory_limit_mb, p.created_at,
+                   (SELECT COUNT(*) FROM problem_tests t WHERE t.problem_id = p.id) AS test_count
+            FROM problems p ORDER BY p.created_at
+        """).fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def get_problem(problem_id, with_hidden=False):
+    """A problem with its sample tests (all tests with with_hidden), or None"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT * FROM problems WHERE id = ?", (problem_id,)).fetchone()
+        if not row:
+            return None
+        tests = conn.execute("""
+            SELECT ordinal, input, expected_output, hidden FROM problem_tests
+            WHERE problem_id = ? ORDER BY ordinal
+        """, (problem_id,)).fetchall()
+    finally:
+        conn.close()
+    problem = dict(row)
+    problem["test_count"] = len(tests)
+    problem["tests"] = [dict(t) for t in tests if with_hidden or not t["hidden"]]
+    return problem
+
+
+async def judge_submission(problem, source_code, author, client, cancel_token=None):
+    """Judge source_code against every test of problem and store the submission"""
+    tests = problem["tests"]
+    runs, error = await _run_all(
+        source_code, [t["input"] for t in tests], _time_limit(problem),
+        problem["memory_limit_mb"], client, cancel_token)
+
+    if error:
+        verdict, results, compile_error = "compilation_error", [], error
+    else:
+        compile_error = None
+        results = []
+        for test, run in zip(tests, runs):
+            entry = {"test": test["ordinal"], "verdict": _verdict(run, test["expected_output"]),
+                     "time_ms": run["time_ms"]}
+            if not test["hidden"]:
+                # Sample tests are public, so showing what went wrong leaks nothing
+                entry["output"] = run.get("stdout")
+                entry["error"] = run.get("stderr")
+            results.append(entry)
+        failed = [r["verdict"] for r in results if r["verdict"] != "accepted"]
+        verdict = failed[0] if failed else "accepted"
+
+    passed = sum(1 for r in results if r["verdict"] == "accepted")
+    runtime_ms = max((r["time_ms"] for r in results), default=None)
+    submission = {
+        "id": generate(size=12),
+        "problem_id": problem["id"],
+        "author": author,
+        "verdict": verdict,
+        "passed": passed,
+        "total": len(tests),
+        "runtime_ms": runtime_ms,
+        "results": results,
+        "compile_error": compile_error,
+        "created_at": time.time(),
+    }
+    await run_in("db", _insert_submission, submission, client, source_code)
+    print(f"[JUDGE] Submission {submission['id']} to {problem['id']}: {verdict} ({passed}/{len(tests)})")
+    return submission
+
+
+def _insert_submission(submission, client, source_code):
+    conn = _connect()
+    try:
+        conn.execute("""
+            INSERT INTO submissions (id, problem_id, author, client, code, verdict, passed,
+                                     total, runtime_ms, results, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (submission["id"], submission["problem_id"], submission["author"], client, source_code,
+              submission["verdict"], submission["passed"], submission["total"],
+              submission["runtime_ms"],
+              json.dumps({"tests": submission["results"],
+                          "compile_error": submission["compile_error"]}),
+              submission["created_at"]))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_submission(submission_id):
+    conn = _connect()
+    try:
+        row = conn.execute("""
+            SELECT id, problem_id, author, verdict, passed, total, runtime_ms, results, created_at
+            FROM submissions WHERE id = ?
+        """, (submission_id,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None
+    submission = dict(row)
+    details = json.loads(submission.pop("results") or "{}")
+    submission["results"] = details.get("tests", [])
+    submission["compile_error"] = details.get("compile_error")
+    return submission
+
+
+def leaderboard(problem_id, limit=50):
+    """Best accepted submission per author: fastest slowest-test time, then earliest"""
+    conn = _connect()
+    try:
+        # SQLite returns the created_at of the row holding MIN(runtime_ms)
+        rows = conn.execute("""
+            SELECT author, MIN(runtime_ms) AS runtime_ms, created_at
+            FROM submissions
+            WHERE problem_id = ? AND verdict = 'accepted'
+            GROUP BY author
+            ORDER BY runtime_ms, created_at
+            LIMIT ?
+        """, (problem_id, limit)).fetchall()
+    finally:
+        conn.close()
+    return [{"rank": rank, **dict(row)} for rank, row in enumerate(rows, 1)]
@@ -0,0 +1,179 @@
+"""
+lifecycle.py — Graceful drain of an API worker
+Draining stops this worker from accepting new runs, warns connected
+terminals with a `server:draining` socket event, waits up to a deadline
+for in-flight REST runs and live terminal sessions to finish on their
+own, and only then kills whatever is left. /api/health reports 503 while
+draining so the load balancer stops routing here.
+
+A drain is started by SIGTERM (deploys, gunicorn worker restarts) or by
+POST /api/admin/drain.
+"""
+
+import time
+import signal
+import asyncio
+import functools
+from contextlib import contextmanager
+from core.config import settings
+
+_state = {
+    "draining": False,
+    "reason": None,
+    "started_at": None,
+    "deadline": None,
+    "exit_when_done": False,
+}
+_rest_runs = 0
+_drain_task = None
+# Event loop the drain runs on, once the app has started
+_loop = None
+# uvicorn's own exit handling, bound to the server that got SIGTERM
+_server_exit = None
+
+
+def is_draining():
+    return _state["draining"]
+
+
+@contextmanager
+def track_rest_run():
+    """Count a REST run as in flight so a drain waits for it"""
+    global _rest_runs
+    _rest_runs += 1
+    try:
+        yield
+    finally:
+        _rest_runs -= 1
+
+
+def status():
+    deadline = _state["deadline"]
+    return {
+        "draining": _state["draining"],
+        "reason": _state["reason"],
+        "seconds_left": max(0.0, round(deadline - time.monotonic(), 1)) if deadline else None,
+        "rest_runs_in_flight": _rest_runs,
+        "exit_when_done": _state["exit_when_done"],
+    }
+
+
+def _live_sessions():
+    """Terminal sessions that are running or still compiling/reviewing"""
+    from routers.sockets import interactive_processes, run_tokens
+    return len(set(interactive_processes) | set(run_tokens))
+
+
+async def _drain(deadline_seconds):
+    from routers.sockets import (sio, interactive_processes, run_tokens, client_ips,
+                                 _output, _exit, _kill_process, _cancel_run)
+
+    # Only this worker's clients: a broadcast would reach every worker's over the session bus
+    for sid in list(client_ips):
+        await sio.emit('server:draining', {
+            'reason': _state["reason"],
+            'deadline_seconds': deadline_seconds,
+            'message': f"Server is restarting. Running programs will be stopped in {deadline_seconds}s.",
+        }, room=sid)
+
+    while time.monotonic() < _state["deadline"]:
+        if _rest_runs == 0 and _live_sessions() == 0:
+            break
+        await asyncio.sleep(0.5)
+
+    stopped = list(set(interactive_processes) | set(run_tokens))
+    for session in stopped:
+        await _output(session, '\r\n\x1b[33m⚡ Server is restarting — your program was stopped. '
+                               'Please run it again.\x1b[0m\r\n')
+        await _exit(session, -1, 'server_restart')
+        _cancel_run(session, "server restart")
+        _kill_process(session)
+
+    print(f"[DRAIN] Drain complete ({len(stopped)} sessions stopped, "
+          f"{_rest_runs} REST runs still in flight)")
+
+    if _state["exit_when_done"]:
+        _exit_worker()
+
+
+def start_drain(reason, deadline_seconds=None, exit_when_done=False):
+    """Enter drain mode (idempotent) and return the task performing it"""
+    global _drain_task
+    if deadline_seconds is None:
+        deadline_seconds = settings.DRAIN_DEADLINE_SECONDS
+
+    _state["exit_when_done"] = _state["exit_when_done"] or exit_when_done
+    if _state["draining"] and _drain_task and not _drain_task.done():
+        return _drain_task
+
+    _state.update(
+        draining=True,
+        reason=reason,
+        started_at=time.time(),
+        deadline=time.monotonic() + deadline_seconds,
+    )
+    print(f"[DRAIN] Draining worker ({reason}), deadline {deadline_seconds}s")
+    _drain_task = asyncio.ensure_future(_drain(deadline_seconds))
+    return _drain_task
+
+
+def resume():
+    """Leave drain mode if the worker isn't already on its way out"""
+    if not _state["draining"] or _state["exit_when_done"]:
+        return False
+    if _drain_task and not _drain_task.done():
+        _drain_task.cancel()
+    _state.update(draining=False, reason=None, started_at=None, deadline=None)
+    print("[DRAIN] Drain cancelled, accepting runs again")
+    return True
+
+
+def _exit_worker():
+    """Hand over to the server's own SIGTERM handling (graceful uvicorn shutdown)"""
+    if _server_exit is not None:
+        _server_exit()
+    else:
+        # Drained without a signal (watchdog recycle): the wrapped handler
+        # sees the drain is done and passes our own SIGTERM on to the server
+        signal.raise_signal(signal.SIGTERM)
+
+
+def _on_sigterm():
+    if _state["draining"] and _state["exit_when_done"]:
+        # Second SIGTERM: stop waiting
+        _exit_worker()
+        return
+    start_drain("SIGTERM", None, True)
+
+
+def wrap_server_exit():
+    """
+    Make SIGTERM drain first by wrapping uvicorn's Server.handle_exit: the
+    server's own handling only runs once the drain finishes (or right away
+    on a second SIGTERM). Must run when the app module is imported: the
+    server binds handle_exit when it installs its signal handlers, after
+    loading the app and before its lifespan starts.
+    """
+    try:
+        from uvicorn.server import Server
+    except ImportError:
+        return
+    original = Server.handle_exit
+    if getattr(original, "drains_first", False):
+        return
+
+    def handle_exit(server, sig, frame):
+        global _server_exit
+        if sig != signal.SIGTERM or _loop is None or _loop.is_closed():
+            return original(server, sig, frame)
+        _server_exit = functools.partial(original, server, sig, frame)
+        _loop.call_soon_threadsafe(_on_sigterm)
+
+    handle_exit.drains_first = True
+    Server.handle_exit = handle_exit
+
+
+def install_sigterm_handler():
+    """Start draining on SIGTERM from now on (called once the app has started)"""
+    global _loop
+    _loop = asyncio.get_running_loop()
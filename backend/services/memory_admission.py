@@ -0,0 +1,381 @@
+"""
+memory_admission.py — Memory-aware admission for JVM launches
+Each javac/java process can take 100–300 MB, so admitting launches purely
+by slot count lets a burst of submissions push the host into the
+OOM-killer. Before launching, callers reserve the predicted footprint of
+the processes they are about to start; the launch is held while
+
+    headroom - outstanding reservations - prediction < MEMORY_MIN_FREE_MB
+
+where headroom is the smaller of the host's available memory and the
+room left under our cgroup limit. Predictions start from per-profile
+defaults and follow the peak RSS actually observed for each profile.
+
+Every worker of the node launches JVMs into the same memory, so the
+reservations are kept in the SQLite `memory_reservations` table: a launch
+is checked against every worker's rows and its own row written in one
+transaction. Held launches wake when a reservation of this worker is
+released, and at each ledger sync (MEMORY_LEDGER_SYNC_SECONDS), which
+also publishes how far this worker's reservations have shrunk and picks
+up releases made by the others. The sqlite calls run on the "db" executor.
+"""
+
+import os
+import time
+import math
+import socket
+import asyncio
+import sqlite3
+import itertools
+import threading
+from contextlib import asynccontextmanager
+import psutil
+from core.config import settings
+from services.executors import run_in
+
+MB = 1024 * 1024
+
+# (limit, usage) files for cgroup v2 and v1
+_CGROUP_FILES = (
+    ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+    ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+)
+
+# Samples needed before the observed history fully replaces the default
+_WARM_SAMPLES = 5
+# Weight of each new sample in the moving average
+_EWMA_ALPHA = 0.2
+
+
+class MemoryPressure(Exception):
+    """Raised when a launch could not be admitted before the timeout"""
+
+
+def _connect():
+    conn = sqlite3.connect(settings.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _worker():
+    # Same form as job_queue.WORKER_ID, taken at call time since workers are forked
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_alive(worker):
+    try:
+        pid = int(worker.rpartition(":")[2])
+    except ValueError:
+        return False
+    return pid == os.getpid() or psutil.pid_exists(pid)
+
+
+def _read_int(path):
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def cgroup_memory():
+    """Return (limit, usage) in bytes for our cgroup, or (None, None) if unlimited/unknown"""
+    for limit_path, usage_path in _CGROUP_FILES:
+        limit = _read_int(limit_path)
+        usage = _read_int(usage_path)
+        # cgroup v1 reports "unlimited" as a huge page-aligned number
+        if limit is not None and usage is not None and limit < (1 << 60):
+            return limit, usage
+    return None, None
+
+
+def host_headroom():
+    """Bytes we can still allocate before hitting the host or cgroup limit"""
+    available = psutil.virtual_memory().available
+    limit, usage = cgroup_memory()
+    if limit is not None:
+        available = min(available, max(0, limit - usage))
+    return available
+
+
+class _Profile:
+    def __init__(self, name, default_bytes):
+        self.name = name
+        self.default_bytes = default_bytes
+        self.samples = 0
+        self.mean = 0.0
+        self.var = 0.0
+
+    def record(self, peak):
+        self.samples += 1
+        if self.samples == 1:
+            self.mean = float(peak)
+            self.var = 0.0
+            return
+        delta = peak - self.mean
+        self.mean += _EWMA_ALPHA * delta
+        self.var = (1 - _EWMA_ALPHA) * (self.var + _EWMA_ALPHA * delta * delta)
+
+    def predict(self):
+        observed = self.mean + 2 * math.sqrt(self.var)
+        if self.samples >= _WARM_SAMPLES:
+            return int(observed)
+        # Until we have enough history, never predict below the default
+        return int(max(self.default_bytes, observed))
+
+
+class MemoryReservation:
+    """Predicted footprint of one admitted launch, shrunk as real RSS shows up"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, predicted):
+        self.id = next(self._ids)
+        self.predicted = predicted
+        self.current = 0
+        self.published = predicted  # outstanding as last written to the ledger
+
+    def observe(self, rss):
+        self.current = rss
+
+    @property
+    def outstanding(self):
+        # Memory the process already uses is visible in host_headroom()
+        return max(0, self.predicted - self.current)
+
+
+class MemoryAdmission:
+    def __init__(self):
+        self.profiles = {
+            "javac": _Profile("javac", settings.MEMORY_DEFAULT_JAVAC_MB * MB),
+            "java": _Profile("java", settings.MEMORY_DEFAULT_JAVA_MB * MB),
+            "jfr": _Profile("jfr", settings.MEMORY_DEFAULT_JFR_MB * MB),
+        }
+        self.reservations = set()
+        self.released = set()  # ids whose ledger rows are still to be deleted
+        self.others = 0  # outstanding bytes of the other workers at the last sync
+        self.lock = threading.Lock()
+        # Replaced on every release, so each waiter sees the release after it looked
+        self.wakeup = asyncio.Event()
+        self.admitted = 0
+        self.held = 0
+        self.rejected = 0
+
+    def predict(self, profiles):
+        """Peak footprint of running the given profiles one after another"""
+        return max(self.profiles[p].predict() for p in profiles)
+
+    def record_peak(self, profile, peak_rss):
+        """Feed an observed peak RSS back into the profile's history"""
+        if peak_rss <= 0:
+            return
+        with self.lock:
+            self.profiles[profile].record(peak_rss)
+
+    def outstanding(self):
+        """Outstanding bytes of the node, with the other workers as of the last sync"""
+        with self.lock:
+            return self.others + sum(r.outstanding for r in self.reservations)
+
+    def shortfall(self):
+        """Bytes that must be freed before another JVM would be admitted (<= 0: none)"""
+        if not settings.MEMORY_ADMISSION_ENABLED:
+            return 0
+        free_after = host_headroom() - self.outstanding() - self.predict(("java",))
+        return settings.MEMORY_MIN_FREE_MB * MB - free_after
+
+    def _fits(self, outstanding, predicted):
+        free_after = host_headroom() - outstanding - predicted
+        return free_after >= settings.MEMORY_MIN_FREE_MB * MB
+
+    def _sync_rows(self, conn):
+        """
+        Write this worker's changes to the ledger, drop the rows of dead
+        workers on this host and return the other workers' outstanding bytes
+        """
+        worker = _worker()
+        now = time.time()
+        with self.lock:
+            released = list(self.released)
+            self.released.clear()
+            changed = [r for r in self.reservations if r.outstanding != r.published]
+            for reservation in changed:
+                reservation.published = reservation.outstanding
+        conn.executemany("DELETE FROM memory_reservations WHERE owner = ? AND id = ?",
+                         [(worker, rid) for rid in released])
+        conn.executemany("UPDATE memory_reservations SET outstanding = ?, updated_at = ? "
+                         "WHERE owner = ? AND id = ?",
+                         [(r.published, now, worker, r.id) for r in changed])
+
+        others = {}
+        rows = conn.execute("SELECT owner, SUM(outstanding) AS total FROM memory_reservations "
+                            "WHERE owner LIKE ? AND owner != ? GROUP BY owner",
+                            (socket.gethostname() + ":%", worker))
+        for row in rows:
+            others[row["owner"]] = row["total"]
+        for owner in [o for o in others if not _worker_alive(o)]:
+            conn.execute("DELETE FROM memory_reservations WHERE owner = ?", (owner,))
+            del others[owner]
+        return sum(others.values())
+
+    def sync(self):
+        """Exchange reservations with the other workers through the ledger"""
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            others = self._sync_rows(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        with self.lock:
+            self.others = others
+
+    def _claim(self, reservation):
+        """Admit the reservation if it fits next to every worker's; True once admitted"""
+        conn = _connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            others = self._sync_rows(conn)
+            with self.lock:
+                self.others = others
+                outstanding = others + sum(r.outstanding for r in self.reservations)
+            admitted = self._fits(outstanding, reservation.predicted)
+            if admitted:
+                conn.execute("INSERT INTO memory_reservations (owner, id, outstanding, updated_at) "
+                             "VALUES (?, ?, ?, ?)",
+                             (_worker(), reservation.id, reservation.predicted, time.time()))
+                with self.lock:
+                    self.reservations.add(reservation)
+            conn.commit()
+        finally:
+            conn.close()
+        return admitted
+
+    async def _try_claim(self, reservation):
+        claim = run_in("db", self._claim, reservation)
+        try:
+            return await asyncio.shield(claim)
+        except asyncio.CancelledError:
+            # The claim may still go through; give it back once it has
+            claim.add_done_callback(lambda _: self.release(reservation))
+            raise
+
+    def _wake(self):
+        wakeup, self.wakeup = self.wakeup, asyncio.Event()
+        wakeup.set()
+
+    async def reserve(self, profiles):
+        """
+        Wait until the predicted footprint fits and return a reservation.
+        Raises MemoryPressure after MEMORY_ADMISSION_TIMEOUT seconds.
+        """
+        predicted = self.predict(profiles)
+        if not settings.MEMORY_ADMISSION_ENABLED:
+            return MemoryReservation(0)
+
+        reservation = MemoryReservation(predicted)
+        deadline = time.monotonic() + settings.MEMORY_ADMISSION_TIMEOUT
+        was_held = False
+        while True:
+            wakeup = self.wakeup
+            # The local estimate spares the ledger a transaction while nothing fits
+            if self._fits(self.outstanding(), predicted) and await self._try_claim(reservation):
+                break
+            if not was_held:
+                was_held = True
+                self.held += 1
+                print(f"[MEMORY] Holding launch ({predicted // MB} MB predicted, "
+                      f"{host_headroom() // MB} MB headroom)")
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                await asyncio.wait_for(wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise MemoryPressure(
+                    "Server is low on memory, please try again shortly") from None
+
+        self.admitted += 1
+        return reservation
+
+    def release(self, reservation):
+        with self.lock:
+            if reservation not in self.reservations:
+                return
+            self.reservations.discard(reservation)
+            self.released.add(reservation.id)
+        self._wake()
+
+    def forget(self):
+        """Drop every reservation of this worker from the ledger (shutdown)"""
+        conn = _connect()
+        try:
+            conn.execute("DELETE FROM memory_reservations WHERE owner = ?", (_worker(),))
+            conn.commit()
+        finally:
+            conn.close()
+
+    @asynccontextmanager
+    async def admitted_launch(self, profiles):
+        reservation = await self.reserve(profiles)
+        try:
+            yield reservation
+        finally:
+            self.release(reservation)
+
+    def stats(self):
+        limit, usage = cgroup_memory()
+        return {
+            "enabled": settings.MEMORY_ADMISSION_ENABLED,
+            "host_available_mb": psutil.virtual_memory().available // MB,
+            "cgroup_limit_mb": limit // MB if limit is not None else None,
+            "cgroup_usage_mb": usage // MB if usage is not None else None,
+            "headroom_mb": host_headroom() // MB,
+            "outstanding_mb": self.outstanding() // MB,
+            "min_free_mb": settings.MEMORY_MIN_FREE_MB,
+            "admitted": self.admitted,
+            "held": self.held,
+            "rejected": self.rejected,
+            "predicted_mb": {
+                name: {"predicted": p.predict() // MB, "samples": p.samples}
+                for name, p in self.profiles.items()
+            },
+        }
+
+
+def process_tree_rss(proc):
+    """RSS of a process and all its children (e.g. java under `cmd /c`)"""
+    try:
+        root = psutil.Process(proc.pid)
+        total = root.memory_info().rss
+        for child in root.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    except psutil.Error:
+        return 0
+
+
+# Shared by every router in this process
+memory_admission = MemoryAdmission()
+
+
+async def memory_ledger_task():
+    """Background loop sharing reservations with the other workers and rechecking held launches"""
+    while True:
+        await asyncio.sleep(settings.MEMORY_LEDGER_SYNC_SECONDS)
+        try:
+            await run_in("db", memory_admission.sync)
+        except Exception as e:
+            print(f"[MEMORY] Ledger sync failed: {e}")
+        # Releases by other workers are only seen here
+        memory_admission._wake()
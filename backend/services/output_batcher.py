@@ -0,0 +1,59 @@
+"""
+output_batcher.py — Coalescing a terminal session's output into few messages
+Every emit is a Socket.IO message with its own JSON envelope and
+websocket frame, so sending each pipe read on its own turns a program
+printing 1 MB into a flood of tiny frames. A batcher collects output and
+sends it
+
+    TERMINAL_FLUSH_INTERVAL_MS after the first unsent chunk   (latency bound)
+    or as soon as TERMINAL_FLUSH_CHARS are pending             (size bound)
+
+whichever comes first, so an interactive prompt still shows up within a
+frame while bulk output goes out in large messages.
+"""
+
+import asyncio
+from core.config import settings
+
+
+class OutputBatcher:
+    def __init__(self, send):
+        self._send = send  # async callable taking the text of one message
+        self._parts = []
+        self._pending = 0
+        self._timer = None
+        self._lock = asyncio.Lock()  # keeps messages in order
+        self.messages = 0
+
+    async def write(self, text):
+        self._parts.append(text)
+        self._pending += len(text)
+        if self._pending >= settings.TERMINAL_FLUSH_CHARS:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(settings.TERMINAL_FLUSH_INTERVAL_MS / 1000)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self):
+        """Send whatever is pending now"""
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._parts:
+                return
+            text = "".join(self._parts)
+            self._parts, self._pending = [], 0
+            self.messages += 1
+            await self._send(text)
+
+    def discard(self):
+        """Drop pending output (the session is gone)"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._parts, self._pending = [], 0
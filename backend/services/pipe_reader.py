@@ -0,0 +1,94 @@
+"""
+pipe_reader.py — Reading a terminal program's output pipe on the event loop
+The pipe is registered with the event loop (loop.connect_read_pipe), so
+output arrives in reads of up to the transport's buffer size (256 KB)
+without a thread per session, and is decoded with an incremental UTF-8
+decoder: a character split across two reads is held back until its last
+byte arrives instead of being replaced.
+
+Reading pauses while MAX_QUEUED_READS reads wait for the consumer, so a
+consumer that stops pulling (e.g. waiting on a slow client) makes the
+pipe fill up and the program block on its next write, instead of its
+output piling up in memory here.
+
+Windows' event loops can't watch anonymous pipes; there, blocking reads
+of READ_SIZE bytes run on the pipe I/O executor, with the same decoding.
+"""
+
+import os
+import codecs
+import asyncio
+from services.executors import run_in
+
+READ_SIZE = 64 * 1024
+MAX_QUEUED_READS = 4
+
+
+class _QueueProtocol(asyncio.Protocol):
+    """Hands every read to a queue; None marks the end of the stream"""
+
+    def __init__(self, queue):
+        self.queue = queue
+        self.transport = None
+        self.paused = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.queue.put_nowait(data)
+        if self.queue.qsize() >= MAX_QUEUED_READS and not self.paused:
+            self.paused = True
+            self.transport.pause_reading()
+
+    def consumed(self):
+        """Called by the consumer after each get"""
+        if self.paused and self.queue.empty():
+            self.paused = False
+            self.transport.resume_reading()
+
+    def eof_received(self):
+        return False
+
+    def connection_lost(self, exc):
+        self.queue.put_nowait(None)
+
+
+async def _connect(pipe):
+    """(transport, protocol) for pipe, or None if the event loop can't watch it"""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    try:
+        return await loop.connect_read_pipe(lambda: _QueueProtocol(queue), pipe)
+    except (NotImplementedError, ValueError, OSError):
+        return None
+
+
+async def iter_text(pipe):
+    """Yield the pipe's output as text, chunk by chunk, until EOF"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    connection = await _connect(pipe)
+
+    if connection is None:
+        fd = pipe.fileno()
+        while True:
+            data = await run_in("pipe_io", os.read, fd, READ_SIZE)
+            text = decoder.decode(data, final=not data)
+            if text:
+                yield text
+            if not data:
+                return
+
+    transport, protocol = connection
+    try:
+        while True:
+            data = await protocol.queue.get()
+            if data is not None:
+                protocol.consumed()
+            text = decoder.decode(data or b"", final=data is None)
+            if text:
+                yield text
+            if data is None:
+                return
+    finally:
+        transport.close()
@@ -0,0 +1,247 @@
+"""
+profiler.py — Java Flight Recorder profiles of user programs
+With the profile flag set, the user's JVM is started with a flight
+recording that is dumped into the run's temp directory on exit. Once the
+program finishes, `jfr print --json` turns the recording into events and
+this module reduces them to something small enough to send back:
+
+    hot_methods     →  top methods by self/total execution samples
+    flame_graph     →  collapsed stacks ("a;b;c count"), hottest first
+    gc              →  collection count, total/max pause, slowest pauses
+    allocation      →  bytes allocated and allocation rate
+    heap_histogram  →  live objects per class (jdk.ObjectCount), or
+                       sampled allocations per class on older JDKs
+
+The recording itself is deleted with the temp directory.
+"""
+
+import os
+import re
+import json
+import subprocess
+from functools import lru_cache
+from collections import Counter
+from core.config import settings
+from utils.helpers import get_java_version
+
+RECORDING_FILE = "profile.jfr"
+
+_EVENTS = ",".join((
+    "jdk.ExecutionSample",
+    "jdk.GarbageCollection",
+    "jdk.GCHeapSummary",
+    "jdk.ObjectAllocationSample",
+    "jdk.ObjectAllocationInNewTLAB",
+    "jdk.ObjectAllocationOutsideTLAB",
+    "jdk.ObjectCount",
+))
+
+_TOP_METHODS = 20
+_TOP_STACKS = 300
+_TOP_CLASSES = 20
+_STACK_DEPTH = 64
+
+
+@lru_cache(maxsize=4)
+def java_major_version(java_path):
+    """Major version of the JDK at java_path ("1.8.0_392" → 8, "17.0.9" → 17)"""
+    match = re.search(r'version "(\d+)(?:\.(\d+))?', get_java_version(java_path))
+    if not match:
+        return 0
+    major = int(match.group(1))
+    return int(match.group(2) or 0) if major == 1 else major
+
+
+def jvm_options(java_path, workdir):
+    """JVM flags that record a profile of the run into workdir"""
+    recording = os.path.join(workdir, RECORDING_FILE)
+    options = f"filename={recording},settings=profile,dumponexit=true"
+    flags = [
+        f"-XX:StartFlightRecording={options}",
+        f"-XX:FlightRecorderOptions=stackdepth={_STACK_DEPTH}",
+    ]
+    if java_major_version(java_path) >= 17:
+        # Per-event settings on the command line need JDK 17
+        flags[0] += ",jdk.ObjectCount#enabled=true"
+        # Keep the "Started recording" banner out of the program's output
+        flags.append("-Xlog:jfr+startup=error")
+    return flags
+
+
+def unsupported_reason(java_path):
+    """Why this JDK can't profile, or None if it can"""
+    if java_major_version(java_path) < 11:
+        return "Profiling needs JDK 11 or newer (Java Flight Recorder)"
+    return None
+
+
+def _jfr_tool(java_path):
+    name = "jfr.exe" if settings.IS_WINDOWS else "jfr"
+    return os.path.join(os.path.dirname(java_path), name)
+
+
+def _duration_ms(value):
+    """JFR durations come as nanoseconds or ISO-8601 strings ("PT0.0042S")"""
+    if isinstance(value, (int, float)):
+        return value / 1e6
+    if isinstance(value, str):
+        match = re.fullmatch(r"PT(?:(\d+)M)?([\d.]+)S", value)
+        if match:
+            return (int(match.group(1) or 0) * 60 + float(match.group(2))) * 1000
+    return 0.0
+
+
+def _class_name(klass):
+    if isinstance(klass, dict):
+        return (klass.get("name") or "?").replace("/", ".")
+    return str(klass)
+
+
+def _frame_name(frame):
+    method = frame.get("method") or {}
+    return f"{_class_name(method.get('type'))}.{method.get('name', '?')}"
+
+
+def summarize(events, wall_seconds):
+    """Reduce decoded JFR events to the profile returned to the user"""
+    self_counts = Counter()
+    total_counts = Counter()
+    stacks = Counter()
+    samples = 0
+    gc_pauses = []
+    heap_used_peak = 0
+    allocated = 0
+    allocated_by_class = Counter()
+    live_objects = {}  # GC id → {class: (instances, bytes)}
+
+    for event in events:
+        kind = event.get("type")
+        values = event.get("values") or {}
+
+        if kind == "jdk.ExecutionSample":
+            frames = ((values.get("stackTrace") or {}).get("frames")) or []
+            if not frames:
+                continue
+            samples += 1
+            names = [_frame_name(f) for f in frames]  # innermost first
+            self_counts[names[0]] += 1
+            for name in set(names):
+                total_counts[name] += 1
+            stacks[";".join(reversed(names))] += 1
+
+        elif kind == "jdk.GarbageCollection":
+            gc_pauses.append({
+                "name": values.get("name"),
+                "cause": values.get("cause"),
+                "pause_ms": round(_duration_ms(values.get("sumOfPauses")), 3),
+            })
+
+        elif kind == "jdk.GCHeapSummary":
+            heap_used_peak = max(heap_used_peak, values.get("heapUsed") or 0)
+
+        elif kind in ("jdk.ObjectAllocationSample", "jdk.ObjectAllocationInNewTLAB",
+                      "jdk.ObjectAllocationOutsideTLAB"):
+            size = values.get("weight") or values.get("tlabSize") or values.get("allocationSize") or 0
+            allocated += size
+            allocated_by_class[_class_name(values.get("objectClass"))] += size
+
+        elif kind == "jdk.ObjectCount":
+            # Emitted per class at every GC; only the last GC's counts are reported
+            counts = live_objects.setdefault(values.get("gcId") or 0, {})
+            counts[_class_name(values.get("objectClass"))] = (
+                values.get("count") or 0, values.get("totalSize") or 0)
+
+    if live_objects:
+        last_gc = live_objects[max(live_objects)]
+        histogram = [
+            {"class": name, "instances": count, "bytes": size}
+            for name, (count, size) in sorted(last_gc.items(), key=lambda kv: -kv[1][1])
+        ][:_TOP_CLASSES]
+        histogram_source = "live objects at last GC"
+    else:
+        histogram = [
+            {"class": name, "instances": None, "bytes": size}
+            for name, size in allocated_by_class.most_common(_TOP_CLASSES)
+        ]
+        histogram_source = "sampled allocations"
+
+    pauses = [p["pause_ms"] for p in gc_pauses]
+    return {
+        "samples": samples,
+        "hot_methods": [
+            {
+                "method": name,
+                "self_samples": self_counts[name],
+                "total_samples": total_counts[name],
+                "self_pct": round(100 * self_counts[name] / samples, 1),
+            }
+            for name, _ in self_counts.most_common(_TOP_METHODS)
+        ],
+        "flame_graph": [f"{stack} {count}" for stack, count in stacks.most_common(_TOP_STACKS)],
+        "gc": {
+            "collections": len(gc_pauses),
+            "total_pause_ms": round(sum(pauses), 3),
+            "max_pause_ms": round(max(pauses), 3) if pauses else 0.0,
+            "slowest": sorted(gc_pauses, key=lambda p: -p["pause_ms"])[:10],
+            "heap_used_peak_mb": round(heap_used_peak / (1024 * 1024), 2),
+        },
+        "allocation": {
+            "total_mb": round(allocated / (1024 * 1024), 2),
+            "rate_mb_per_sec": round(allocated / (1024 * 1024) / wall_seconds, 2) if wall_seconds > 0 else None,
+        },
+        "heap_histogram": histogram,
+        "heap_histogram_source": histogram_source,
+    }
+
+
+def analyze_recording(java_path, workdir, wall_seconds, cancel_token=None, reservation=None):
+    """
+    Decode the recording a profiled run left in workdir. Returns the
+    profile summary, or {"error": ...} when there is nothing to analyze
+    (e.g. the JVM was killed before it could dump the recording).
+    `jfr print` is a JVM of its own: callers admit it with the "jfr" profile.
+    """
+    # Imported here: java_compiler imports this module for jvm_options()
+    from services.java_compiler import _run_measured
+
+    recording = os.path.join(workdir, RECORDING_FILE)
+    if not os.path.exists(recording):
+        return {"error": "No flight recording was written (the program was stopped before exiting)"}
+
+    try:
+        result = _run_measured(
+            [_jfr_tool(java_path), "print", "--json", "--stack-depth", str(_STACK_DEPTH),
+             "--events", _EVENTS, recording],
+            "jfr", reservation, timeout=settings.EXEC_TIMEOUT_SECONDS, cwd=workdir,
+            cancel_token=cancel_token)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return {"error": f"Could not read the flight recording: {e}"}
+    finally:
+        try:
+            os.remove(recording)
+        except OSError:
+            pass
+
+    if result.returncode != 0:
+        return {"error": f"Could not read the flight recording: {result.stderr.strip()}"}
+    try:
+        events = json.loads(result.stdout)["recording"]["events"]
+    except (ValueError, KeyError, TypeError) as e:
+        return {"error": f"Unexpected flight recording format: {e}"}
+    return summarize(events, wall_seconds)
+
+
+def format_summary(profile):
+    """Plain-text hot-method/GC summary for the terminal"""
+    if profile.get("error"):
+        return profile["error"]
+    lines = [f"{profile['samples']} samples"]
+    for entry in profile["hot_methods"][:10]:
+        lines.append(f"  {entry['self_pct']:5.1f}%  {entry['method']}")
+    gc = profile["gc"]
+    lines.append(f"GC: {gc['collections']} collections, {gc['total_pause_ms']:.1f} ms total pause, "
+                 f"max {gc['max_pause_ms']:.1f} ms")
+    alloc = profile["allocation"]
+    if alloc["rate_mb_per_sec"] is not None:
+        lines.append(f"Allocation: {alloc['total_mb']} MB ({alloc['rate_mb_per_sec']} MB/s)")
+    return "\n".join(lines)
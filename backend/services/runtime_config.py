@@ -0,0 +1,277 @@
+"""
+runtime_config.py — Execution limits that can be changed without a redeploy
+Overrides for a whitelisted set of Settings fields live in the SQLite
+`runtime_config` table, shared by every worker on the node. Each worker
+re-reads the table every RUNTIME_CONFIG_REFRESH_SECONDS and writes the
+values onto `settings`, which the scheduler, memory admission and
+compiler read at decision time. Every change is recorded in
+`config_audit` and can be rolled back.
+
+The functions here are synchronous sqlite calls: from the event loop they
+run on the "db" executor, and refresh() applies the stored overrides with
+only the read off the loop.
+"""
+
+import json
+import time
+import sqlite3
+import asyncio
+from nanoid import generate
+from core.config import settings
+from services.executors import apply_executor_settings, run_in
+
+# Settings that may be changed live → (type, minimum)
+TUNABLES = {
+    "EXEC_MAX_CONCURRENCY": (int, 1),
+    "EXEC_RESERVED_INTERACTIVE": (int, 0),
+    "EXEC_RESERVED_REST": (int, 0),
+    "EXEC_RESERVED_BATCH": (int, 0),
+    "EXEC_AGING_SECONDS": (float, 0.1),
+    "EXEC_TIMEOUT_SECONDS": (float, 1),
+    "EXEC_MAX_OUTPUT_CHARS": (int, 1000),
+    "FAIR_CLIENT_MAX_CONCURRENCY": (int, 0),
+    "FAIR_CLIENT_RATE": (float, 0.01),
+    "FAIR_CLIENT_BURST": (int, 1),
+    "FAIR_MAX_THROTTLE_SECONDS": (float, 0),
+    "FAIR_CLIENT_WEIGHTS": (dict, None),
+    "CHECK_CLIENT_RATE": (float, 0.01),
+    "CHECK_CLIENT_BURST": (int, 1),
+    "MEMORY_ADMISSION_ENABLED": (bool, None),
+    "MEMORY_MIN_FREE_MB": (int, 0),
+    "MEMORY_ADMISSION_TIMEOUT": (float, 0),
+    "TERMINAL_OUTPUT_RATE_BYTES": (int, 1024),
+    "TERMINAL_OUTPUT_BURST_BYTES": (int, 1024),
+    "TERMINAL_OUTPUT_MAX_BYTES": (int, 1024),
+    "TERMINAL_FLOOD_KILL": (bool, None),
+    "TERMINAL_MAX_SESSIONS": (int, 0),
+    "TERMINAL_MAX_SESSIONS_PER_CLIENT": (int, 0),
+    "TERMINAL_IDLE_TIMEOUT_SECONDS": (float, 0),
+    "TERMINAL_MAX_LIFETIME_SECONDS": (float, 0),
+    "TERMINAL_SLOT_WAIT_SECONDS": (float, 1),
+    "TERMINAL_RECONNECT_GRACE_SECONDS": (float, 0),
+    "HIBERNATE_ENABLED": (bool, None),
+    "HIBERNATE_IDLE_SECONDS": (float, 10),
+    "HIBERNATE_UNVERIFIED_SECONDS": (float, 1),
+    "EXECUTOR_PIPE_IO_WORKERS": (int, 1),
+    "EXECUTOR_COMPILE_WORKERS": (int, 1),
+    "EXECUTOR_AI_WORKERS": (int, 1),
+    "EXECUTOR_AI_MAX_QUEUE": (int, 0),
+    "EXECUTOR_REAPER_WORKERS": (int, 1),
+    "EXECUTOR_FORWARD_WORKERS": (int, 1),
+    "CLUSTER_PEER_COOLDOWN": (float, 0),
+    "WORKER_MAX_RSS_MB": (int, 0),
+    "WORKER_MAX_FDS": (int, 0),
+    "WORKER_MAX_THREADS": (int, 0),
+    "WORKER_MAX_REQUESTS": (int, 0),
+}
+
+# Values from the environment/.env, used when an override is removed
+_defaults = {key: getattr(settings, key) for key in TUNABLES}
+
+
+class InvalidConfig(ValueError):
+    """Raised for unknown keys or values of the wrong type/range"""
+
+
+def _connect():
+    conn = sqlite3.connect(settings.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def validate(key, value):
+    """Coerce an override to the setting's type, or raise InvalidConfig"""
+    if key not in TUNABLES:
+        raise InvalidConfig(f"{key} is not a runtime-tunable setting")
+    kind, minimum = TUNABLES[key]
+
+    if kind is bool:
+        if not isinstance(value, bool):
+            raise InvalidConfig(f"{key} must be true or false")
+        return value
+    if kind is dict:
+        if not isinstance(value, dict) or not all(
+                isinstance(v, (int, float)) and not isinstance(v, bool) for v in value.values()):
+            raise InvalidConfig(f"{key} must map client IPs to numeric weights")
+        return {str(k): float(v) for k, v in value.items()}
+
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise InvalidConfig(f"{key} must be a number")
+    if kind is int and value != int(value):
+        raise InvalidConfig(f"{key} must be a whole number")
+    value = kind(value)
+    if minimum is not None and value < minimum:
+        raise InvalidConfig(f"{key} must be at least {minimum}")
+    return value
+
+
+def _overrides(conn):
+    return {
+        row["key"]: json.loads(row["value"])
+        for row in conn.execute("SELECT key, value FROM runtime_config")
+        if row["key"] in TUNABLES
+    }
+
+
+def load_overrides():
+    conn = _connect()
+    try:
+        return _overrides(conn)
+    finally:
+        conn.close()
+
+
+def apply_overrides(overrides=None):
+    """Write stored overrides (or defaults, for keys without one) onto settings"""
+    if overrides is None:
+        overrides = load_overrides()
+
+    changed = []
+    for key, default in _defaults.items():
+        value = overrides.get(key, default)
+        if getattr(settings, key) != value:
+            setattr(settings, key, value)
+            changed.append(key)
+
+    if any(key.startswith("EXECUTOR_") for key in changed):
+        apply_executor_settings()
+    if changed:
+        print(f"[CONFIG] Applied runtime config: {', '.join(changed)}")
+    return overrides
+
+
+async def refresh():
+    """apply_overrides() from the event loop: read on the db executor, apply here"""
+    return apply_overrides(await run_in("db", load_overrides))
+
+
+def _write(conn, change_id, action, values, actor):
+    """Store new override values (None removes one) and audit each change"""
+    now = time.time()
+    current = _overrides(conn)
+    for key, value in values.items():
+        old = current.get(key)
+        if value is None:
+            conn.execute("DELETE FROM runtime_config WHERE key = ?", (key,))
+        else:
+            conn.execute("""
+                INSERT INTO runtime_config (key, value, updated_at, updated_by)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value,
+                    updated_at = excluded.updated_at,
+                    updated_by = excluded.updated_by
+            """, (key, json.dumps(value), now, actor))
+        conn.execute("""
+            INSERT INTO config_audit
+                (change_id, action, key, old_value, new_value, actor, changed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (change_id, action, key,
+              json.dumps(old) if old is not None else None,
+              json.dumps(value) if value is not None else None,
+              actor, now))
+
+
+def update(values, actor):
+    """
+    Override settings ({key: value}; None resets a key to its default).
+    Returns the change ID to roll back with. The change is stored only;
+    refresh() applies it.
+    """
+    for key in values:
+        if key not in TUNABLES:
+            raise InvalidConfig(f"{key} is not a runtime-tunable setting")
+    cleaned = {
+        key: None if value is None else validate(key, value)
+        for key, value in values.items()
+    }
+
+    change_id = generate(size=10)
+    conn = _connect()
+    try:
+        _write(conn, change_id, "set", cleaned, actor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"[CONFIG] {actor} changed {', '.join(cleaned)} (change {change_id})")
+    return change_id
+
+
+def rollback(change_id=None, actor=None):
+    """
+    Restore the values from before a change (the most recent one by
+    default). The rollback is itself audited and, like update(), applied by
+    refresh(). Returns its change ID, or None if there is nothing to roll back.
+    """
+    conn = _connect()
+    try:
+        if change_id is None:
+            row = conn.execute(
+                "SELECT change_id FROM config_audit ORDER BY id DESC LIMIT 1").fetchone()
+            if not row:
+                return None
+            change_id = row["change_id"]
+
+        rows = conn.execute(
+            "SELECT key, old_value FROM config_audit WHERE change_id = ? ORDER BY id",
+            (change_id,)).fetchall()
+        if not rows:
+            return None
+
+        previous = {
+            row["key"]: json.loads(row["old_value"]) if row["old_value"] is not None else None
+            for row in rows
+        }
+        rollback_id = generate(size=10)
+        _write(conn, rollback_id, f"rollback:{change_id}", previous, actor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    print(f"[CONFIG] {actor} rolled back change {change_id} (change {rollback_id})")
+    return rollback_id
+
+
+def audit_log(limit=50):
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT * FROM config_audit ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [
+        {
+            **dict(row),
+            "old_value": json.loads(row["old_value"]) if row["old_value"] is not None else None,
+            "new_value": json.loads(row["new_value"]) if row["new_value"] is not None else None,
+        }
+        for row in rows
+    ]
+
+
+def snapshot():
+    """Effective value, default and override state of every tunable setting"""
+    conn = _connect()
+    try:
+        overrides = _overrides(conn)
+    finally:
+        conn.close()
+    return {
+        key: {
+            "value": getattr(settings, key),
+            "default": _defaults[key],
+            "overridden": key in overrides,
+        }
+        for key in TUNABLES
+    }
+
+
+async def runtime_config_task():
+    """Background loop picking up changes made through any worker"""
+    while True:
+        await asyncio.sleep(settings.RUNTIME_CONFIG_REFRESH_SECONDS)
+        try:
+            await refresh()
+        except Exception as e:
+            print(f"[CONFIG] Error refreshing runtime config: {e}")
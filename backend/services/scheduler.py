@@ -0,0 +1,323 @@
+"""
+scheduler.py — Execution scheduler with priority lanes and per-client fairness
+Every JVM launch (compile or run) takes a slot from the scheduler first.
+Waiting work is split into lanes served in priority order:
+
+    interactive  →  terminal runs over Socket.IO (the slot is kept while the program runs)
+    rest         →  one-off /api/compile calls
+    batch        →  queued jobs and other bulk/speculative work
+
+Each lane has a reserved minimum number of slots that other lanes can't
+use, and waiting work ages: every EXEC_AGING_SECONDS spent in the queue
+raises it one priority level, so batch work can't starve forever.
+
+Within a lane, clients (by IP) are served by weighted fair queuing, each
+client may hold at most FAIR_CLIENT_MAX_CONCURRENCY slots, and a token
+bucket throttles how fast a single client can submit work at all.
+"""
+
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from core.config import settings
+
+LANES = ("interactive", "rest", "batch")  # highest priority first
+
+# Number of recent wait times kept per lane for percentile metrics
+_WAIT_SAMPLES = 500
+
+# Idle client records are dropped once this many are being tracked
+_MAX_TRACKED_CLIENTS = 2048
+_CLIENT_IDLE_SECONDS = 600
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a client would have to be throttled for too long"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Too many runs, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class _Client:
+    def __init__(self, key):
+        self.key = key
+        self.running = 0
+        self.waiting = 0
+        self.last_tag = 0.0
+        self.tokens = float(settings.FAIR_CLIENT_BURST)
+        self.refilled_at = time.monotonic()
+        self.last_seen = self.refilled_at
+        self.throttled = 0
+
+    @property
+    def weight(self):
+        return max(settings.FAIR_CLIENT_WEIGHTS.get(self.key, 1.0), 0.01)
+
+    def reserve_token(self):
+        """
+        Take one token from the bucket, going into debt if it's empty.
+        Returns how long the caller must wait for the token to exist.
+        """
+        now = time.monotonic()
+        rate = max(settings.FAIR_CLIENT_RATE, 0.001)
+        self.tokens = min(
+            float(settings.FAIR_CLIENT_BURST),
+            self.tokens + (now - self.refilled_at) * rate,
+        )
+        self.refilled_at = now
+        self.last_seen = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / rate)
+
+    def refund_token(self):
+        self.tokens += 1
+
+    def idle(self, now):
+        return (
+            self.running == 0 and self.waiting == 0
+            and now - self.last_seen > _CLIENT_IDLE_SECONDS
+        )
+
+
+class _Waiter:
+    __slots__ = ("future", "client", "enqueued_at", "tag", "capped")
+
+    def __init__(self, future, client, enqueued_at, tag, capped=True):
+        self.future = future
+        self.client = client
+        self.enqueued_at = enqueued_at
+        self.tag = tag
+        self.capped = capped
+
+
+class _Lane:
+    def __init__(self, name, rank):
+        self.name = name
+        self.rank = rank
+        self.waiters = []
+        self.running = 0
+        self.virtual_time = 0.0
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=_WAIT_SAMPLES)
+
+    def next_waiter(self):
+        """Waiter with the smallest fair-queuing tag whose client is under its cap"""
+        cap = settings.FAIR_CLIENT_MAX_CONCURRENCY
+        best = None
+        for waiter in self.waiters:
+            if cap > 0 and waiter.capped and waiter.client.running >= cap:
+                continue
+            if best is None or waiter.tag < best.tag:
+                best = waiter
+        return best
+
+    def record_wait(self, waited):
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.recent_waits.append(waited)
+
+    def stats(self, reserved):
+        waits = sorted(self.recent_waits)
+        return {
+            "queued": len(self.waiters),
+            "running": self.running,
+            "reserved": reserved,
+            "admitted": self.admitted,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 2) if self.admitted else 0.0,
+            "p95_wait_ms": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+class ExecutionScheduler:
+    def __init__(self):
+        self.lanes = {name: _Lane(name, rank) for rank, name in enumerate(LANES)}
+        self.clients = {}
+        self.throttled = 0
+        self.rejected = 0
+
+    # Limits are read on every decision so they can be changed at runtime
+    @property
+    def capacity(self):
+        return max(1, settings.EXEC_MAX_CONCURRENCY)
+
+    def reserved(self, lane):
+        return {
+            "interactive": settings.EXEC_RESERVED_INTERACTIVE,
+            "rest": settings.EXEC_RESERVED_REST,
+            "batch": settings.EXEC_RESERVED_BATCH,
+        }[lane]
+
+    @property
+    def running(self):
+        return sum(lane.running for lane in self.lanes.values())
+
+    def _client(self, key):
+        client = self.clients.get(key)
+        if client is None:
+            if len(self.clients) >= _MAX_TRACKED_CLIENTS:
+                now = time.monotonic()
+                for stale in [k for k, c in self.clients.items() if c.idle(now)]:
+                    del self.clients[stale]
+            client = self.clients[key] = _Client(key)
+        return client
+
+    def _can_start(self, lane):
+        free = self.capacity - self.running
+        if free <= 0:
+            return False
+        if lane.running < self.reserved(lane.name):
+            return True
+        # Slots still owed to lanes below their reservation are off limits
+        owed = sum(
+            max(0, self.reserved(other.name) - other.running)
+            for other in self.lanes.values()
+        )
+        return free > owed
+
+    def _effective_priority(self, lane, waiter, now):
+        aging = max(settings.EXEC_AGING_SECONDS, 0.001)
+        return lane.rank - (now - waiter.enqueued_at) / aging
+
+    def _dispatch(self):
+        """Hand free slots to waiting work, best effective priority first"""
+        while True:
+            now = time.monotonic()
+            best = None
+            for lane in self.lanes.values():
+                if not lane.waiters or not self._can_start(lane):
+                    continue
+                waiter = lane.next_waiter()
+                if waiter is None:
+                    continue
+                priority = self._effective_priority(lane, waiter, now)
+                if best is None or priority < best[0]:
+                    best = (priority, lane, waiter)
+            if best is None:
+                return
+
+            _, lane, waiter = best
+            lane.waiters.remove(waiter)
+            waiter.client.waiting -= 1
+            if waiter.future.done():
+                continue
+            lane.virtual_time = max(lane.virtual_time, waiter.tag)
+            lane.running += 1
+            waiter.client.running += 1
+            lane.record_wait(now - waiter.enqueued_at)
+            waiter.future.set_result(now - waiter.enqueued_at)
+
+    async def acquire(self, lane_name, client_key="anonymous", admitted=False):
+        """
+        Wait for a slot in the given lane on behalf of a client. Returns
+        seconds spent waiting; raises RateLimitExceeded if the client is
+        submitting faster than its token bucket allows for too long.
+        admitted marks follow-up launches of work the client was already
+        charged for (e.g. the test cases of one submission): they take no
+        token and aren't held to the per-client cap.
+        """
+        lane = self.lanes[lane_name]
+        client = self._client(client_key)
+
+        delay = 0.0 if admitted else client.reserve_token()
+        if delay > settings.FAIR_MAX_THROTTLE_SECONDS:
+            client.refund_token()
+            self.rejected += 1
+            raise RateLimitExceeded(delay)
+        if delay > 0:
+            client.throttled += 1
+            self.throttled += 1
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # Nothing ran (e.g. wait_for timed out): don't charge the client
+                client.refund_token()
+                raise
+
+        # Weighted fair queuing: a client's work is tagged after both the
+        # lane's current virtual time and that client's previous work.
+        tag = max(lane.virtual_time, client.last_tag) + 1.0 / client.weight
+        client.last_tag = tag
+
+        future = asyncio.get_event_loop().create_future()
+        waiter = _Waiter(future, client, time.monotonic(), tag, capped=not admitted)
+        lane.waiters.append(waiter)
+        client.waiting += 1
+        self._dispatch()
+
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just before we were cancelled: give it back
+                self.release(lane_name, client_key)
+            elif waiter in lane.waiters:
+                lane.waiters.remove(waiter)
+                client.waiting -= 1
+            raise
+
+    def release(self, lane_name, client_key="anonymous"):
+        lane = self.lanes[lane_name]
+        lane.running = max(0, lane.running - 1)
+        client = self.clients.get(client_key)
+        if client:
+            client.running = max(0, client.running - 1)
+            client.last_seen = time.monotonic()
+        self._dispatch()
+
+    def detach_client(self, client_key):
+        """
+        Stop counting a granted slot against its client, which keeps it in
+        the lane until release(lane, None) (long-lived terminal programs)
+        """
+        client = self.clients.get(client_key)
+        if client:
+            client.running = max(0, client.running - 1)
+            client.last_seen = time.monotonic()
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane_name, client_key="anonymous", admitted=False):
+        await self.acquire(lane_name, client_key, admitted)
+        try:
+            yield
+        finally:
+            self.release(lane_name, client_key)
+
+    def stats(self):
+        """Totals for /api/metrics, which is public: no client keys (see busiest())"""
+        return {
+            "capacity": self.capacity,
+            "running": self.running,
+            "lanes": {
+                name: lane.stats(self.reserved(name))
+                for name, lane in self.lanes.items()
+            },
+            "clients": {
+                "tracked": len(self.clients),
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+            },
+        }
+
+    def busiest(self, limit=10):
+        """Clients with the most running and waiting runs (client IPs; admin only)"""
+        clients = sorted(
+            self.clients.values(),
+            key=lambda c: (c.running + c.waiting, c.throttled),
+            reverse=True,
+        )[:limit]
+        return [
+            {"client": c.key, "running": c.running,
+             "waiting": c.waiting, "throttled": c.throttled}
+            for c in clients if c.running or c.waiting
+        ]
+
+
+# Shared by every router in this process
+scheduler = ExecutionScheduler()
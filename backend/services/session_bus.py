@@ -0,0 +1,286 @@
+"""
+session_bus.py — Message bus between the API workers of one host
+gunicorn runs several workers, each holding its own terminal sessions
+and its own Socket.IO clients. They talk over a Unix socket
+(SESSION_BUS_PATH): one worker runs the broker, every worker (the
+broker's own too) connects to it as a client.
+
+    worker A ─┐                 ┌→ worker B
+    worker B ─┼→ broker (in A) ─┼→ worker C    frame: [length u32 BE][JSON object]
+    worker C ─┘                 └→ ...
+
+Frames are JSON (bytes travel base64-encoded), never pickles, and the
+socket lives in a directory only this user can enter (mode 0700): the
+bus is refused if its directory is anyone else's or open to others.
+
+A message with "to" goes to that worker only, any other to every worker
+but its sender. The broker is whichever worker holds the lock file next
+to the socket; it keeps the lock as long as it lives. When it exits the
+kernel drops the lock, the others lose their connection, and the first
+to take the lock on reconnecting becomes the new broker. Messages
+published while no broker is up are dropped.
+
+Two channels travel the bus:
+
+    socketio  — BusManager: sio.emit(room=...) reaches clients connected to any worker;
+                rooms whose members are all on this worker skip the bus
+    terminal  — input/kill/resize/attach/detach for a session, sent to the worker holding it
+
+Unix sockets are POSIX only; on Windows (one worker in development) the
+bus stays off and Socket.IO keeps its in-process manager.
+"""
+
+import os
+import json
+import base64
+import struct
+import asyncio
+import tempfile
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from core.config import settings
+from core import metrics
+from services.job_queue import WORKER_ID
+from utils.helpers import ensure_private_dir
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_HEADER = struct.Struct(">I")
+_RECONNECT_DELAY = 0.5  # seconds between attempts to reach (or become) the broker
+# A worker this far behind on reading the bus loses messages instead of growing our buffers
+_MAX_WRITE_BUFFER = 16 * 1024 * 1024
+
+
+def bus_path():
+    if settings.SESSION_BUS_PATH:
+        return settings.SESSION_BUS_PATH
+    private = os.path.join(tempfile.gettempdir(), f"jyvra-session-bus-{os.getuid()}")
+    return os.path.join(private, "bus.sock")
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"{type(value).__name__} can't travel the session bus")
+
+
+def _decode(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def _frame(message):
+    data = json.dumps(message, default=_encode, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(data)) + data
+
+
+async def _read_frame(reader):
+    """(message, raw frame) of the next frame on the connection"""
+    header = await reader.readexactly(_HEADER.size)
+    data = await reader.readexactly(_HEADER.unpack(header)[0])
+    message = json.loads(data, object_hook=_decode)
+    if not isinstance(message, dict):
+        raise ValueError("bus frame is not an object")
+    return message, header + data
+
+
+def _send(writer, frame):
+    if writer.is_closing() or writer.transport.get_write_buffer_size() > _MAX_WRITE_BUFFER:
+        metrics.incr("bus.dropped")
+        return False
+    writer.write(frame)
+    return True
+
+
+class _Broker:
+    """Relays frames between the workers' connections"""
+
+    def __init__(self, lock_fd):
+        self.lock_fd = lock_fd  # held for as long as this worker is the broker
+        self.clients = {}  # worker id → StreamWriter
+        self.server = None
+
+    async def start(self, path):
+        if os.path.exists(path):
+            os.unlink(path)  # left behind by a broker that died
+        self.server = await asyncio.start_unix_server(self._serve, path=path)
+        os.chmod(path, 0o600)
+
+    async def _serve(self, reader, writer):
+        worker = None
+        try:
+            hello, _ = await _read_frame(reader)
+            worker = hello["hello"]
+            self.clients[worker] = writer
+            while True:
+                message, frame = await _read_frame(reader)
+                to = message.get("to")
+                if to:
+                    target = self.clients.get(to)
+                    if target is None:
+                        metrics.incr("bus.undeliverable")
+                    else:
+                        _send(target, frame)
+                    continue
+                for other, target in list(self.clients.items()):
+                    if other != worker:
+                        _send(target, frame)
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError, TypeError, ValueError):
+            pass
+        finally:
+            if worker and self.clients.get(worker) is writer:
+                del self.clients[worker]
+            writer.close()
+
+
+class SessionBus:
+    def __init__(self):
+        self.broker = None
+        self._writer = None
+        self._channels = {}  # channel → asyncio.Queue of received messages
+
+    @property
+    def enabled(self):
+        return settings.SESSION_BUS_ENABLED and fcntl is not None
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    def subscribe(self, channel):
+        """Queue receiving the data of every message on the channel"""
+        if channel not in self._channels:
+            self._channels[channel] = asyncio.Queue()
+        return self._channels[channel]
+
+    def publish(self, channel, data, to=None):
+        """
+        Send data to every other worker, or only to worker `to`.
+        False if it could not be sent (no broker at the moment).
+        """
+        if not self.connected:
+            metrics.incr("bus.dropped")
+            return False
+        message = {"channel": channel, "data": data}
+        if to:
+            message["to"] = to
+        return _send(self._writer, _frame(message))
+
+    async def _start_broker_if_free(self, path):
+        """Become the broker if no other worker is (non-blocking lock on the lock file)"""
+        if self.broker is not None:
+            return
+        fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return
+        broker = _Broker(fd)
+        try:
+            await broker.start(path)
+        except OSError:
+            os.close(fd)
+            raise
+        self.broker = broker
+        print(f"[BUS] This worker ({WORKER_ID}) is the session bus broker at {path}")
+
+    async def run(self):
+        """Keep this worker connected to the bus, taking over as broker when there is none"""
+        if not self.enabled:
+            return
+        path = bus_path()
+        try:
+            ensure_private_dir(os.path.dirname(os.path.abspath(path)))
+        except OSError as e:
+            print(f"[BUS] Session bus disabled: {e}")
+            return
+        while True:
+            writer = None
+            try:
+                await self._start_broker_if_free(path)
+                reader, writer = await asyncio.open_unix_connection(path)
+                writer.write(_frame({"hello": WORKER_ID}))
+                self._writer = writer
+                while True:
+                    message, _ = await _read_frame(reader)
+                    queue = self._channels.get(message.get("channel"))
+                    if queue is not None:
+                        queue.put_nowait(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+                if writer is not None:
+                    print(f"[BUS] Lost the session bus ({e or type(e).__name__}), reconnecting")
+            finally:
+                self._writer = None
+                if writer is not None:
+                    writer.close()
+            await asyncio.sleep(_RECONNECT_DELAY)
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "broker": self.broker is not None,
+            "workers": len(self.broker.clients) if self.broker else None,
+            "dropped": metrics.get("bus.dropped"),
+        }
+
+
+class BusManager(AsyncPubSubManager):
+    """Socket.IO client manager sharing emits, disconnects and rooms over the session bus"""
+
+    name = "sessionbus"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.remote_members = {}  # room → sids on other workers taking part (see note_remote)
+
+    def note_remote(self, room, sid, joined=True):
+        """Record that a client of another worker follows this room (or stopped)"""
+        members = self.remote_members.setdefault(room, set())
+        if joined:
+            members.add(sid)
+        else:
+            members.discard(sid)
+            if not members:
+                del self.remote_members[room]
+
+    def _local_only(self, room, namespace):
+        """Whether room has members and all of them are connected to this worker"""
+        if not isinstance(room, str) or self.remote_members.get(room):
+            return False
+        return any(self.is_connected(sid, namespace)
+                   for sid, _ in self.get_participants(namespace, room))
+
+    async def emit(self, event, data, namespace=None, room=None, skip_sid=None,
+                   callback=None, to=None, **kwargs):
+        room = to or room
+        if room is not None and not kwargs.get("ignore_queue") \
+                and self._local_only(room, namespace or "/"):
+            # Every client in the room is connected to this worker: no trip through the bus
+            return await super().emit(event, data, namespace=namespace, room=room,
+                                      skip_sid=skip_sid, callback=callback, ignore_queue=True)
+        return await super().emit(event, data, namespace=namespace, room=room,
+                                  skip_sid=skip_sid, callback=callback, **kwargs)
+
+    async def _publish(self, data):
+        bus.publish("socketio", data)
+
+    async def _listen(self):
+        queue = bus.subscribe("socketio")
+        while True:
+            yield await queue.get()
+
+
+def client_manager():
+    """Manager for the Socket.IO server: the bus-backed one when the bus is available"""
+    return BusManager() if bus.enabled else None
+
+
+# Shared by every module in this process
+bus = SessionBus()
@@ -0,0 +1,162 @@
+"""
+session_registry.py — Which worker runs which terminal session
+Every terminal session that has run something has a row in the
+terminal_sessions table naming the worker (WORKER_ID) holding its JVM
+and scrollback, so any worker can find the owner of a session and send
+it the session's events over the session bus (services/session_bus.py),
+and the admin API can list the sessions of the whole node. The row stays
+while the session waits for its client to reconnect.
+
+run_id is set from the moment a run claims its place in the terminal
+quota (reserve(), before compiling) until its program is gone; the
+quota counts those rows. pid is set only while the program is running.
+
+A worker that crashes can't remove its rows; they are dropped when the
+next worker boots, and whenever a lookup finds the owning process gone.
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import psutil
+from core.config import settings
+from services.job_queue import WORKER_ID
+
+
+def _connect():
+    conn = sqlite3.connect(settings.DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _worker_alive(worker):
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname():
+        return True  # another host's worker; assume it is
+    try:
+        return int(pid) == os.getpid() or psutil.pid_exists(int(pid))
+    except ValueError:
+        return False
+
+
+def _count(conn, client_ip, exclude):
+    query = "SELECT COUNT(*) FROM terminal_sessions WHERE run_id IS NOT NULL AND session_id != ?"
+    args = [exclude or ""]
+    if client_ip is not None:
+        query += " AND client_ip = ?"
+        args.append(client_ip)
+    return conn.execute(query, args).fetchone()[0]
+
+
+def reserve(session_id, client_ip, run_id, per_client=0, total=0):
+    """
+    Register the session to this worker and claim a place in the terminal
+    quota for its new run. The counts are checked and the claim written in
+    one transaction, so runs starting at once on any worker can't overshoot.
+    Returns None once claimed, or which limit is full ("client" or "total").
+    """
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if per_client and client_ip is not None and _count(conn, client_ip, session_id) >= per_client:
+            conn.rollback()
+            return "client"
+        if total and _count(conn, None, session_id) >= total:
+            conn.rollback()
+            return "total"
+        conn.execute("""
+            INSERT OR REPLACE INTO terminal_sessions (session_id, owner, client_ip, pid, run_id, started_at)
+            VALUES (?, ?, ?, NULL, ?, ?)
+        """, (session_id, WORKER_ID, client_ip, run_id, time.time()))
+        conn.commit()
+    finally:
+        conn.close()
+    return None
+
+
+def release(session_id, run_id):
+    """Give back the quota claim of a run that ended without starting its program"""
+    conn = _connect()
+    try:
+        conn.execute("UPDATE terminal_sessions SET run_id = NULL WHERE session_id = ? AND run_id = ?",
+                     (session_id, run_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def unregister(session_id):
+    """Drop the session if this worker owns it"""
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM terminal_sessions WHERE session_id = ? AND owner = ?",
+                     (session_id, WORKER_ID))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def set_pid(session_id, pid):
+    """Record the program the session runs now (None once it is gone, ending its quota claim)"""
+    conn = _connect()
+    try:
+        if pid is None:
+            conn.execute("UPDATE terminal_sessions SET pid = NULL, run_id = NULL "
+                         "WHERE session_id = ? AND owner = ?", (session_id, WORKER_ID))
+        else:
+            conn.execute("UPDATE terminal_sessions SET pid = ? WHERE session_id = ? AND owner = ?",
+                         (pid, session_id, WORKER_ID))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def forget_worker():
+    """Drop every session of this worker (shutdown)"""
+    conn = _connect()
+    try:
+        conn.execute("DELETE FROM terminal_sessions WHERE owner = ?", (WORKER_ID,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def owner(session_id):
+    """Worker ID running the session, or None if no live worker does"""
+    conn = _connect()
+    try:
+        row = conn.execute("SELECT owner FROM terminal_sessions WHERE session_id = ?",
+                           (session_id,)).fetchone()
+        if row and not _worker_alive(row["owner"]):
+            conn.execute("DELETE FROM terminal_sessions WHERE owner = ?", (row["owner"],))
+            conn.commit()
+            return None
+    finally:
+        conn.close()
+    return row["owner"] if row else None
+
+
+def sessions():
+    """Every registered session, oldest first"""
+    conn = _connect()
+    try:
+        rows = conn.execute("SELECT * FROM terminal_sessions ORDER BY started_at").fetchall()
+    finally:
+        conn.close()
+    return [dict(row) for row in rows]
+
+
+def prune_dead_workers():
+    """Drop the sessions of workers on this host that no longer exist; returns how many"""
+    conn = _connect()
+    try:
+        owners = [row["owner"] for row in conn.execute("SELECT DISTINCT owner FROM terminal_sessions")]
+        dead = [worker for worker in owners if not _worker_alive(worker)]
+        removed = 0
+        for worker in dead:
+            removed += conn.execute("DELETE FROM terminal_sessions WHERE owner = ?", (worker,)).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return removed
@@ -5,6 +5,7 @@ from datetime import datetime
 from nanoid import generate
 from core.config import settings
 from fastapi import Request
+from utils.helpers import get_client_ip
 
 # Rate limit storage
 rate_limit_storage = {}
@@ -19,11 +20,7 @@ def sanitize_code(code):
 
 def check_rate_limit(request: Request):
     """Check if client has exceeded rate limit"""
-    # Get client IP from FastAPI request
-    client_ip = request.client.host
-    if request.headers.get('X-Forwarded-For'):
-        client_ip = request.headers.get('X-Forwarded-For').split(',')[0]
-    
+    client_ip = get_client_ip(request)
     current_time = time.time()
 
     if client_ip not in rate_limit_storage:
@@ -40,6 +37,15 @@ def check_rate_limit(request: Request):
     rate_limit_storage[client_ip].append(current_time)
     return True
 
+def prune_rate_limit_storage():
+    """Forget clients with no shares inside the current window"""
+    cutoff = time.time() - settings.RATE_LIMIT_WINDOW
+    stale = [ip for ip, stamps in rate_limit_storage.items()
+             if not stamps or stamps[-1] < cutoff]
+    for ip in stale:
+        del rate_limit_storage[ip]
+    return len(stale)
+
 async def cleanup_expired_shares_task():
     """Background task to cleanup expired shares and images"""
     while True:
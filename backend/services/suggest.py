@@ -0,0 +1,197 @@
+"""
+suggest.py — "Did you mean ...?" for names javac can't resolve
+Most beginner compile errors are typos: `Sytem.out`, `lenght()`,
+`Stirng`, a variable declared as `count` and used as `cout`. Candidates
+come from two places:
+
+    the user's source  →  every name it declares (classes, methods,
+                          fields, variables, parameters)
+    the JDK            →  public class and member names from the
+                          symbol index (see symbol_index.py)
+
+The user's names are few and scanned directly. The JDK's tens of
+thousands are kept in a symmetric-delete index (NameIndex), where a
+lookup is a few dozen binary searches instead of a distance computation
+per name. Distances are case-insensitive Damerau-Levenshtein (optimal
+string alignment). The JDK indexes are built once per process, in the
+background after the symbol index is loaded.
+"""
+
+import bisect
+import threading
+from array import array
+import javalang
+from services import symbol_index
+
+# Class names are looked up among classes only, other symbols among members
+_CLASS_KINDS = ("class", "interface", "enum", "annotation")
+
+_jdk_indexes = {}  # "class" / "member" → NameIndex
+_jdk_lock = threading.Lock()
+
+
+def distance(a, b):
+    """Optimal string alignment distance (a transposition counts as one edit)"""
+    a, b = a.lower(), b.lower()
+    if a == b:
+        return 0
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class NameIndex:
+    """
+    Symmetric-delete index over a set of names. Each name is stored under
+    itself and every variant with one letter deleted; a query looks up its
+    own variants with up to max_distance letters deleted, so any name one
+    edit away (and most two edits away: all but those dropping two letters
+    from the intended name) shares a variant with it. Candidates are then
+    confirmed with distance().
+
+    Variants are kept as truncated hashes packed with the name's id into
+    one sorted array of 64-bit ints: about 8 bytes per variant, no per-entry
+    objects, and a lookup is a handful of binary searches.
+    """
+
+    _ID_BITS = 20
+    _HASH_MASK = (1 << (63 - _ID_BITS)) - 1
+
+    def __init__(self, names):
+        self.names = list(dict.fromkeys(names))
+        if len(self.names) >= 1 << self._ID_BITS:
+            raise ValueError(f"too many names for a NameIndex ({len(self.names)})")
+        entries = set()
+        for name_id, name in enumerate(self.names):
+            for variant in _deletes(name.lower(), 1):
+                entries.add(((hash(variant) & self._HASH_MASK) << self._ID_BITS) | name_id)
+        self._entries = array("q", sorted(entries))
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, word, max_distance):
+        """[(distance, name)] for every name found within max_distance, closest first"""
+        id_mask = (1 << self._ID_BITS) - 1
+        ids = set()
+        for variant in _deletes(word.lower(), max_distance):
+            key = (hash(variant) & self._HASH_MASK) << self._ID_BITS
+            i = bisect.bisect_left(self._entries, key)
+            while i < len(self._entries) and self._entries[i] >> self._ID_BITS == key >> self._ID_BITS:
+                ids.add(self._entries[i] & id_mask)
+                i += 1
+        found = []
+        for name_id in ids:
+            name = self.names[name_id]
+            if abs(len(name) - len(word)) <= max_distance:
+                d = distance(word, name)
+                if d <= max_distance:
+                    found.append((d, name))
+        return sorted(found)
+
+
+def _deletes(word, depth):
+    """word and every string made by deleting up to depth of its letters"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def max_distance_for(name):
+    """Edits tolerated for a name of this length (short names match too much otherwise)"""
+    return 1 if len(name) <= 4 else 2
+
+
+def declared_names(source_code):
+    """Names the source declares; falls back to every identifier if it doesn't parse"""
+    try:
+        tree = javalang.parse.parse(source_code)
+    except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError, TypeError, IndexError):
+        try:
+            return {t.value for t in javalang.tokenizer.tokenize(source_code)
+                    if isinstance(t, javalang.tokenizer.Identifier)}
+        except javalang.tokenizer.LexerError:
+            return set()
+
+    names = set()
+    for _, node in tree:
+        if isinstance(node, (javalang.tree.TypeDeclaration, javalang.tree.MethodDeclaration,
+                             javalang.tree.FormalParameter)):
+            names.add(node.name)
+        elif isinstance(node, javalang.tree.VariableDeclarator):
+            names.add(node.name)
+    return names
+
+
+def _build_jdk_indexes():
+    classes, members = set(), set()
+    for kind, name in symbol_index.index.names():
+        (classes if kind in _CLASS_KINDS else members).add(name)
+    indexes = {"class": NameIndex(sorted(classes)), "member": NameIndex(sorted(members))}
+    with _jdk_lock:
+        _jdk_indexes.update(indexes)
+    print(f"[SUGGEST] Indexed {len(classes)} JDK class and {len(members)} member names")
+
+
+def warm():
+    """Build the JDK name indexes in the background (once the symbol index is loaded)"""
+    if symbol_index.index is None or _jdk_indexes:
+        return
+    threading.Thread(target=_build_jdk_indexes, name="suggest-warmup", daemon=True).start()
+
+
+def did_you_mean(name, kind, source_code="", owner=None, limit=3):
+    """
+    Likeliest intended names for an unresolved symbol, best first:
+    [{"name", "distance", "origin"}] where origin is "source" or "jdk".
+    kind is javac's symbol kind: "class", "variable" or "method"; owner is
+    the type javac searched (its "location"), which narrows JDK members.
+    """
+    max_distance = max_distance_for(name)
+    candidates = {}
+
+    def consider(matches, origin):
+        for d, candidate in matches:
+            if candidate == name or d > max_distance:
+                continue
+            best = candidates.get(candidate)
+            if best is None or d < best["distance"]:
+                candidates[candidate] = {"name": candidate, "distance": d, "origin": origin}
+
+    if source_code:
+        consider(((distance(name, declared), declared) for declared in declared_names(source_code)
+                  if abs(len(declared) - len(name)) <= max_distance), "source")
+
+    with _jdk_lock:
+        class_index = _jdk_indexes.get("class")
+        member_index = _jdk_indexes.get("member")
+    # A "variable" that starts uppercase is usually a class used statically (Sytem.out)
+    if class_index and (kind == "class" or name[:1].isupper()):
+        consider(class_index.search(name, max_distance), "jdk")
+    if member_index and kind in ("method", "variable"):
+        matches = member_index.search(name, max_distance)
+        if owner:
+            # e.g. `s.lenght()` on a String: only String's members make sense
+            matches = [(d, m) for d, m in matches if symbol_index.index.has_member(owner, m)]
+        consider(matches, "jdk")
+
+    # Closest first; then the user's own names; then names that only differ in case
+    ranked = sorted(candidates.values(), key=lambda c: (
+        c["distance"], c["origin"] != "source", c["name"].lower() != name.lower(), c["name"]))
+    return ranked[:limit]
+
+
+def stats():
+    with _jdk_lock:
+        return {name: len(index) for name, index in _jdk_indexes.items()}
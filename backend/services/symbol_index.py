@@ -0,0 +1,399 @@
+"""
+symbol_index.py — Index of the JDK's public API for completions and import fixes
+Built once per JDK by reading the class files of every public class in
+the java.* and javax.* packages, from the first source the JDK has:
+
+    <java.home>/jmods/*.jmod    →  JDK 9+ with jmods installed
+    <java.home>/lib/ct.sym      →  JDK 9+ without them (e.g. Debian's default-jdk)
+    <java.home>/jre/lib/rt.jar  →  JDK 8
+
+The result is one file under SYMBOL_INDEX_DIR, memory-mapped by every
+worker on the node:
+
+    magic | count (u32) | offsets (u32 × count) | records
+
+    record: key \\t kind \\t name \\t owner \\t detail \\n
+
+key is the lowercased name and records are sorted by it, so a prefix
+search is a binary search over the offsets plus a short scan.
+"""
+
+import os
+import mmap
+import time
+import glob
+import struct
+import hashlib
+import zipfile
+import tempfile
+from core.config import settings
+from utils.helpers import get_java_version
+from services.profiler import java_major_version
+
+MAGIC = b"JYSYM1\n\0"
+_HEADER = len(MAGIC) + 4
+
+_ACC_PUBLIC = 0x0001
+_ACC_STATIC = 0x0008
+_ACC_BRIDGE = 0x0040
+_ACC_INTERFACE = 0x0200
+_ACC_SYNTHETIC = 0x1000
+_ACC_ANNOTATION = 0x2000
+_ACC_ENUM = 0x4000
+_ACC_MODULE = 0x8000
+
+_CLASS_KINDS = ("class", "interface", "enum", "annotation")
+
+# Where a beginner most likely meant a class to come from, e.g. java.util.List over java.awt.List
+_PREFERRED_PACKAGES = (
+    "java.util", "java.io", "java.math", "java.time", "java.util.function",
+    "java.util.stream", "java.nio.file", "java.text", "java.util.concurrent",
+    "java.util.regex", "java.lang",
+)
+
+_PRIMITIVES = {
+    "B": "byte", "C": "char", "D": "double", "F": "float", "I": "int",
+    "J": "long", "S": "short", "Z": "boolean", "V": "void",
+}
+
+# Constant pool entry sizes after the tag byte (Utf8 is variable-length)
+_CP_SIZES = {3: 4, 4: 4, 5: 8, 6: 8, 7: 2, 8: 2, 9: 4, 10: 4, 11: 4, 12: 4,
+             15: 3, 16: 2, 17: 4, 18: 4, 19: 2, 20: 2}
+
+index = None  # the loaded SymbolIndex, if any
+_info = {}
+
+
+# ── Reading class files ──
+
+def _descriptor_types(descriptor):
+    """Readable simple type names in a field/method descriptor, in order"""
+    types = []
+    i = 0
+    while i < len(descriptor):
+        dims = 0
+        while descriptor[i] == "[":
+            dims += 1
+            i += 1
+        if descriptor[i] == "L":
+            end = descriptor.index(";", i)
+            name = descriptor[i + 1:end].rsplit("/", 1)[-1].replace("$", ".")
+            i = end + 1
+        elif descriptor[i] in _PRIMITIVES:
+            name = _PRIMITIVES[descriptor[i]]
+            i += 1
+        else:  # "(" / ")"
+            types.append(descriptor[i])
+            i += 1
+            continue
+        types.append(name + "[]" * dims)
+    return types
+
+
+def _member_detail(name, descriptor, access, is_method):
+    types = _descriptor_types(descriptor)
+    prefix = "static " if access & _ACC_STATIC else ""
+    if not is_method:
+        return f"{prefix}{types[0]} {name}"
+    close = types.index(")")
+    return f"{prefix}{types[close + 1]} {name}({', '.join(types[1:close])})"
+
+
+def parse_class(data):
+    """
+    (fully qualified name, kind, [(kind, name, detail)]) for a public class
+    file, or None for anything that isn't public API.
+    """
+    if data[:4] != b"\xca\xfe\xba\xbe":
+        return None
+    count = struct.unpack_from(">H", data, 8)[0]
+    utf8 = {}
+    classes = {}
+    pos = 10
+    i = 1
+    while i < count:
+        tag = data[pos]
+        if tag == 1:
+            length = struct.unpack_from(">H", data, pos + 1)[0]
+            utf8[i] = data[pos + 3:pos + 3 + length].decode("utf-8", errors="replace")
+            pos += 3 + length
+        else:
+            if tag == 7:
+                classes[i] = struct.unpack_from(">H", data, pos + 1)[0]
+            pos += 1 + _CP_SIZES[tag]
+        # Long and Double take two constant pool slots
+        i += 2 if tag in (5, 6) else 1
+
+    access, this_class = struct.unpack_from(">HH", data, pos)
+    if not access & _ACC_PUBLIC or access & _ACC_MODULE:
+        return None
+    internal = utf8[classes[this_class]]
+    simple = internal.rsplit("/", 1)[-1]
+    # Nested and anonymous classes are left out: their file flags don't tell
+    # whether the member class itself is public
+    if "$" in simple:
+        return None
+    if access & _ACC_ANNOTATION:
+        kind = "annotation"
+    elif access & _ACC_INTERFACE:
+        kind = "interface"
+    elif access & _ACC_ENUM:
+        kind = "enum"
+    else:
+        kind = "class"
+
+    pos += 6  # access, this, super
+    interfaces = struct.unpack_from(">H", data, pos)[0]
+    pos += 2 + 2 * interfaces
+
+    members = []
+    for is_method in (False, True):
+        member_count = struct.unpack_from(">H", data, pos)[0]
+        pos += 2
+        for _ in range(member_count):
+            flags, name_index, desc_index, attributes = struct.unpack_from(">HHHH", data, pos)
+            pos += 8
+            for _ in range(attributes):
+                pos += 6 + struct.unpack_from(">I", data, pos + 2)[0]
+            name = utf8[name_index]
+            if not flags & _ACC_PUBLIC or flags & (_ACC_SYNTHETIC | _ACC_BRIDGE) or name.startswith("<"):
+                continue
+            members.append((
+                "method" if is_method else "field", name,
+                _member_detail(name, utf8[desc_index], flags, is_method)))
+    return internal.replace("/", "."), kind, members
+
+
+def _release_letter(major):
+    """ct.sym names releases 7-9 by digit and 10+ by letter (10 → A)"""
+    return str(major) if major < 10 else chr(ord("A") + major - 10)
+
+
+def _ct_sym_entries(archive, major):
+    """Entries of ct.sym describing the API of the given release"""
+    names = [n for n in archive.namelist() if n.endswith(".sig")]
+    letter = _release_letter(major)
+    releases = {n.split("/", 1)[0] for n in names}
+    if not any(letter in r for r in releases):
+        # ct.sym only covers earlier releases: take the newest one it has
+        letter = max("".join(releases) or "0")
+    return [n for n in names if letter in n.split("/", 1)[0]]
+
+
+def _class_files(java_home, major):
+    """Yield (source description, class file bytes) for java.*/javax.* classes"""
+    jmods = sorted(glob.glob(os.path.join(java_home, "jmods", "*.jmod")))
+    ct_sym = os.path.join(java_home, "lib", "ct.sym")
+    rt_jars = [os.path.join(java_home, "jre", "lib", "rt.jar"),
+               os.path.join(java_home, "lib", "rt.jar")]
+
+    def wanted(path):
+        return path.startswith(("java/", "javax/"))
+
+    if jmods:
+        for jmod in jmods:
+            # A jmod is a zip behind a 4-byte header, which zipfile skips over
+            with zipfile.ZipFile(jmod) as archive:
+                for name in archive.namelist():
+                    path = name[len("classes/"):]
+                    if name.startswith("classes/") and name.endswith(".class") and wanted(path):
+                        yield "jmods", archive.read(name)
+        return
+
+    if os.path.exists(ct_sym):
+        with zipfile.ZipFile(ct_sym) as archive:
+            for name in _ct_sym_entries(archive, major):
+                parts = name.split("/")[1:]
+                if parts and "." in parts[0]:
+                    parts = parts[1:]  # module directory, e.g. java.base
+                if wanted("/".join(parts)):
+                    yield "ct.sym", archive.read(name)
+        return
+
+    for rt_jar in rt_jars:
+        if os.path.exists(rt_jar):
+            with zipfile.ZipFile(rt_jar) as archive:
+                for name in archive.namelist():
+                    if name.endswith(".class") and wanted(name):
+                        yield "rt.jar", archive.read(name)
+            return
+
+
+# ── Index file ──
+
+def build(java_home, major, path):
+    """Write the index for the JDK at java_home to path. Returns (symbols, source)"""
+    records = set()
+    source = None
+    for source, data in _class_files(java_home, major):
+        try:
+            parsed = parse_class(data)
+        except (struct.error, KeyError, IndexError, ValueError):
+            continue
+        if not parsed:
+            continue
+        qualified, kind, members = parsed
+        package, _, simple = qualified.rpartition(".")
+        records.add((simple.lower(), kind, simple, package, qualified))
+        for member_kind, name, detail in members:
+            records.add((name.lower(), member_kind, name, qualified, detail))
+    if not records:
+        raise FileNotFoundError(f"No jmods, ct.sym or rt.jar found under {java_home}")
+
+    blob = bytearray()
+    offsets = []
+    for record in sorted(records):
+        offsets.append(len(blob))
+        blob += ("\t".join(record) + "\n").encode("utf-8")
+    base = _HEADER + 4 * len(offsets)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, staging = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".staging-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(offsets)))
+        f.write(struct.pack(f"<{len(offsets)}I", *(base + o for o in offsets)))
+        f.write(blob)
+    # Workers booting together may all build; the last rename wins harmlessly
+    os.replace(staging, path)
+    return len(offsets), source
+
+
+class SymbolIndex:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a symbol index")
+        self.count = struct.unpack_from("<I", self._map, len(MAGIC))[0]
+
+    @property
+    def size(self):
+        return len(self._map)
+
+    def _offset(self, i):
+        return struct.unpack_from("<I", self._map, _HEADER + 4 * i)[0]
+
+    def _key(self, i):
+        start = self._offset(i)
+        return self._map[start:self._map.find(b"\t", start)]
+
+    def _record(self, i):
+        start = self._offset(i)
+        line = self._map[start:self._map.find(b"\n", start)].decode("utf-8")
+        _, kind, name, owner, detail = line.split("\t")
+        return {"kind": kind, "name": name, "owner": owner, "detail": detail}
+
+    def _first_at_least(self, key):
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            if self._key(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def prefix(self, text, limit=50, kinds=None, owner=None):
+        """Symbols whose name starts with text (case-insensitive)"""
+        key = text.lower().encode("utf-8")
+        results = []
+        i = self._first_at_least(key)
+        while i < self.count and len(results) < limit and self._key(i).startswith(key):
+            record = self._record(i)
+            i += 1
+            if kinds and record["kind"] not in kinds:
+                continue
+            if owner and record["owner"] != owner and not record["owner"].endswith("." + owner):
+                continue
+            results.append(record)
+        return results
+
+    def names(self):
+        """Yield (kind, name) of every record, in key order"""
+        for i in range(self.count):
+            start = self._offset(i)
+            fields = self._map[start:self._map.find(b"\n", start)].split(b"\t", 3)
+            yield fields[1].decode("utf-8"), fields[2].decode("utf-8")
+
+    def has_member(self, owner, name):
+        """Whether the class owner (simple or qualified name) has a member called name"""
+        key = name.lower().encode("utf-8")
+        i = self._first_at_least(key)
+        while i < self.count and self._key(i) == key:
+            record = self._record(i)
+            i += 1
+            if record["kind"] not in _CLASS_KINDS and record["name"] == name and (
+                    record["owner"] == owner or record["owner"].endswith("." + owner)):
+                return True
+        return False
+
+    def classes_named(self, name):
+        """Fully qualified names of the public classes with this exact simple name"""
+        key = name.lower().encode("utf-8")
+        found = []
+        i = self._first_at_least(key)
+        while i < self.count and self._key(i) == key:
+            record = self._record(i)
+            if record["kind"] in _CLASS_KINDS and record["name"] == name:
+                found.append(record["detail"])
+            i += 1
+        return found
+
+
+def _package_rank(qualified):
+    package = qualified.rpartition(".")[0]
+    if package in _PREFERRED_PACKAGES:
+        return (_PREFERRED_PACKAGES.index(package), qualified)
+    return (len(_PREFERRED_PACKAGES) + package.startswith("javax."), qualified)
+
+
+def import_candidates(simple_name):
+    """Classes an unresolved simple name could refer to, likeliest first"""
+    if index is None:
+        return []
+    # java.lang needs no import, so a match there means the problem is elsewhere
+    return sorted(
+        (q for q in index.classes_named(simple_name) if q.rpartition(".")[0] != "java.lang"),
+        key=_package_rank)
+
+
+def _index_path(java_path, java_home, major):
+    identity = f"{java_home}\0{get_java_version(java_path)}"
+    digest = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:10]
+    return os.path.join(settings.SYMBOL_INDEX_DIR, f"jdk{major}-{digest}.idx")
+
+
+def load(java_path):
+    """
+    Map the index for the JDK behind java_path, building it first if this
+    JDK hasn't been indexed yet. Returns stats() for the boot banner.
+    """
+    global index
+    java_home = os.path.dirname(os.path.dirname(os.path.realpath(java_path)))
+    major = java_major_version(java_path)
+    path = _index_path(java_path, java_home, major)
+    built_in = None
+    if not os.path.exists(path):
+        started = time.monotonic()
+        _, source = build(java_home, major, path)
+        built_in = time.monotonic() - started
+        _info["source"] = source
+        print(f"[SYMBOLS] Indexed {java_home} from {source} in {built_in:.1f}s")
+    index = SymbolIndex(path)
+    _info.update({"path": path, "build_seconds": built_in})
+    return stats()
+
+
+def stats():
+    if index is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "symbols": index.count,
+        "size_mb": round(index.size / (1024 * 1024), 2),
+        **_info,
+    }
+
@@ -0,0 +1,212 @@
+"""
+syntax_check.py — Fast diagnostics for the editor while the user types
+Two tiers, cheapest first:
+
+    parse      →  javalang parse in-process, syntax errors in milliseconds
+    typecheck  →  javac through the compile cache (nothing is executed),
+                  only when the parse is clean
+
+Results are cached by source hash. Each editor document has at most one
+check in flight: a newer buffer for the same document cancels the older
+check, killing its javac.
+
+Typechecks don't spend the client's run tokens or concurrency slots: they
+are admitted launches charged to a bucket of their own (CHECK_CLIENT_RATE),
+and a client out of check tokens just gets the parse tier.
+"""
+
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+import javalang
+from services import java_compiler
+from services.scheduler import scheduler
+from services.memory_admission import memory_admission, MemoryPressure
+from services.executors import run_in, ExecutorSaturated
+from services.cancellation import CancelToken
+from core.config import settings
+
+_CACHE_SIZE = 512
+
+# javac: "Main.java:3: error: ';' expected"
+_JAVAC_DIAGNOSTIC = re.compile(r'^.*?\.java:(\d+): (error|warning): (.*)$')
+
+_results = OrderedDict()
+_results_lock = threading.Lock()
+_in_flight = {}  # document key → CancelToken of its running check
+_in_flight_lock = threading.Lock()
+_budgets = {}  # client → (tokens, refilled_at) of its typecheck bucket
+_budgets_lock = threading.Lock()
+_BUDGETS_MAX = 4096  # full buckets are forgotten past this many clients
+
+
+def source_hash(source_code):
+    return hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+
+
+def _cached(key):
+    with _results_lock:
+        result = _results.get(key)
+        if result is not None:
+            _results.move_to_end(key)
+        return result
+
+
+def _remember(key, result):
+    with _results_lock:
+        _results[key] = result
+        _results.move_to_end(key)
+        while len(_results) > _CACHE_SIZE:
+            _results.popitem(last=False)
+
+
+def _diagnostic(line, column, message, source, severity="error"):
+    return {"line": line, "column": column, "severity": severity,
+            "message": message, "source": source}
+
+
+def parse_diagnostics(source_code):
+    """Syntax errors found by javalang (at most one: it stops at the first)"""
+    try:
+        javalang.parse.parse(source_code)
+    except javalang.parser.JavaSyntaxError as e:
+        position = getattr(e.at, "position", None)
+        if position:
+            return [_diagnostic(position.line, position.column, e.description, "parser")]
+        # Ran out of input (e.g. a missing closing brace): point at the end
+        lines = source_code.rstrip().split("\n")
+        return [_diagnostic(len(lines), len(lines[-1]) + 1, e.description, "parser")]
+    except javalang.tokenizer.LexerError as e:
+        message = str(e)
+        match = re.search(r'line (\d+)', message)
+        return [_diagnostic(int(match.group(1)) if match else 1, None,
+                            message.split(" at ")[0], "lexer")]
+    return []
+
+
+def javac_diagnostics(stderr):
+    """Diagnostics from javac's output, with columns taken from its caret lines"""
+    diagnostics = []
+    lines = stderr.splitlines()
+    for index, line in enumerate(lines):
+        match = _JAVAC_DIAGNOSTIC.match(line)
+        if not match:
+            continue
+        column = None
+        # The source line is echoed next, then a caret under the offending column
+        for follow in lines[index + 1:index + 3]:
+            if follow.strip() == "^":
+                column = follow.index("^") + 1
+                break
+        diagnostics.append(_diagnostic(
+            int(match.group(1)), column, match.group(3), "javac", match.group(2)))
+    return diagnostics
+
+
+def typecheck(source_code, reservation=None, cancel_token=None):
+    """Compile without running; returns javac's diagnostics"""
+    if not java_compiler.find_java():
+        raise RuntimeError("Java compiler (javac) not found on this system")
+    match = re.search(r'public\s+class\s+(\w+)', source_code)
+    class_name = match.group(1) if match else "Main"
+    workdir = tempfile.mkdtemp()
+    try:
+        source_file = Path(workdir) / f"{class_name}.java"
+        source_file.write_text(source_code, encoding='utf-8')
+        result = java_compiler._compile_source(
+            source_code, source_file, workdir, reservation, cancel_token)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if result.returncode == 0:
+        return javac_diagnostics(result.stderr or "")
+    return javac_diagnostics(result.stderr or "") or [
+        _diagnostic(1, None, (result.stderr or "Compilation failed").strip(), "javac")]
+
+
+def _take_check_token(client):
+    """Charge one typecheck to the client's check bucket; False if it's empty"""
+    rate = max(settings.CHECK_CLIENT_RATE, 0.001)
+    burst = float(settings.CHECK_CLIENT_BURST)
+    now = time.monotonic()
+    with _budgets_lock:
+        tokens, refilled_at = _budgets.get(client, (burst, now))
+        tokens = min(burst, tokens + (now - refilled_at) * rate)
+        allowed = tokens >= 1
+        _budgets[client] = (tokens - 1 if allowed else tokens, now)
+        if len(_budgets) > _BUDGETS_MAX:
+            for key, (left, at) in list(_budgets.items()):
+                if left + (now - at) * rate >= burst:
+                    del _budgets[key]
+        return allowed
+
+
+def start_check(document_key):
+    """Token for a new check of document_key; cancels the check it supersedes"""
+    token = CancelToken("check")
+    if document_key:
+        with _in_flight_lock:
+            previous = _in_flight.get(document_key)
+            _in_flight[document_key] = token
+        if previous:
+            previous.cancel("superseded by a newer buffer")
+    return token
+
+
+def finish_check(document_key, token):
+    if document_key:
+        with _in_flight_lock:
+            if _in_flight.get(document_key) is token:
+                del _in_flight[document_key]
+
+
+def stats():
+    with _results_lock:
+        cached = len(_results)
+    with _in_flight_lock:
+        in_flight = len(_in_flight)
+    return {"cached": cached, "in_flight": in_flight}
+
+
+async def check(source_code, cancel_token, want_typecheck=True, client="anonymous"):
+    """
+    Diagnostics for source_code: {"tier", "diagnostics", "cached", "elapsed_ms"}.
+    Raises ExecutionCancelled if cancel_token is cancelled (see start_check).
+    """
+    digest = source_hash(source_code)
+    started = time.perf_counter()
+
+    def result(tier, diagnostics, cached, **extra):
+        return {"tier": tier, "diagnostics": diagnostics, "cached": cached,
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 2), **extra}
+
+    parsed = _cached((digest, "parse"))
+    cached = parsed is not None
+    if not cached:
+        parsed = await run_in("compile", parse_diagnostics, source_code)
+        _remember((digest, "parse"), parsed)
+    if parsed or not want_typecheck:
+        return result("parse", parsed, cached)
+
+    checked = _cached((digest, "typecheck"))
+    if checked is not None:
+        return result("typecheck", checked, True)
+
+    if not _take_check_token(client):
+        return result("parse", parsed, cached,
+                      typecheck_skipped="Too many type-checks, try again in a moment")
+    try:
+        async with scheduler.slot("rest", client, admitted=True):
+            cancel_token.raise_if_cancelled()
+            async with memory_admission.admitted_launch(("javac",)) as reservation:
+                checked = await run_in(
+                    "compile", typecheck, source_code, reservation, cancel_token)
+    except (MemoryPressure, ExecutorSaturated) as e:
+        # The parse tier already answered; a typecheck can wait for the next keystroke
+        return result("parse", parsed, cached, typecheck_skipped=str(e))
+    _remember((digest, "typecheck"), checked)
+    return result("typecheck", checked, False)
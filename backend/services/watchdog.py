@@ -0,0 +1,137 @@
+"""
+watchdog.py — Worker self-monitoring and recycling
+Gunicorn workers otherwise live forever, and per-process state (leaked
+pipes, threads, caches) only grows. Every WATCHDOG_INTERVAL seconds each
+worker checks its own RSS, open file descriptors and thread count, and
+counts the HTTP requests and terminal runs it has served. Once any limit
+is crossed the worker drains its sessions (see lifecycle.py) and exits,
+and gunicorn starts a fresh one in its place.
+
+Recycling is only done under gunicorn: a lone uvicorn process has nobody
+to replace it, so it just logs the breach.
+"""
+
+import sys
+import random
+import asyncio
+import psutil
+from core.config import settings
+from core import metrics
+from services import lifecycle
+from services.share_service import prune_rate_limit_storage
+
+MB = 1024 * 1024
+
+_process = psutil.Process()
+_requests = 0
+# Fixed per worker so that siblings started together recycle at different times
+_request_jitter = random.randint(0, max(0, settings.WORKER_MAX_REQUESTS_JITTER))
+_last_sample = {}
+_recycle_reason = None
+
+
+def count_request():
+    global _requests
+    _requests += 1
+
+
+class RequestCounterMiddleware:
+    """Plain ASGI middleware, so streaming and disconnect detection are untouched"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            count_request()
+        await self.app(scope, receive, send)
+
+
+def _open_fds():
+    try:
+        if settings.IS_WINDOWS:
+            return _process.num_handles()
+        return _process.num_fds()
+    except psutil.Error:
+        return 0
+
+
+def sample():
+    return {
+        "rss_mb": _process.memory_info().rss // MB,
+        "open_fds": _open_fds(),
+        "threads": _process.num_threads(),
+        "requests": _requests,
+    }
+
+
+def _breach(current):
+    """Name of the first limit this worker is over, or None"""
+    if settings.WORKER_MAX_RSS_MB and current["rss_mb"] >= settings.WORKER_MAX_RSS_MB:
+        return "rss"
+    if settings.WORKER_MAX_FDS and current["open_fds"] >= settings.WORKER_MAX_FDS:
+        return "fds"
+    if settings.WORKER_MAX_THREADS and current["threads"] >= settings.WORKER_MAX_THREADS:
+        return "threads"
+    if settings.WORKER_MAX_REQUESTS and \
+            current["requests"] >= settings.WORKER_MAX_REQUESTS + _request_jitter:
+        return "requests"
+    return None
+
+
+def _under_process_manager():
+    return "gunicorn" in sys.modules
+
+
+def check():
+    """Take one sample and start recycling this worker if it's over a limit"""
+    global _recycle_reason
+    current = sample()
+    _last_sample.update(current)
+
+    pruned = prune_rate_limit_storage()
+    if pruned:
+        metrics.incr("watchdog.rate_limit_pruned", pruned)
+
+    reason = _breach(current)
+    if not reason or _recycle_reason or lifecycle.is_draining():
+        return
+
+    print(f"[WATCHDOG] Worker over its {reason} limit "
+          f"(rss={current['rss_mb']}MB fds={current['open_fds']} "
+          f"threads={current['threads']} requests={current['requests']})")
+    if not _under_process_manager():
+        metrics.incr(f"watchdog.breaches.{reason}")
+        return
+
+    _recycle_reason = reason
+    metrics.incr(f"worker_recycles.{reason}")
+    print(f"[WATCHDOG] Recycling worker (reason: {reason})")
+    lifecycle.start_drain(f"recycle:{reason}", exit_when_done=True)
+
+
+def stats():
+    return {
+        "enabled": settings.WATCHDOG_ENABLED,
+        "sample": dict(_last_sample),
+        "limits": {
+            "rss_mb": settings.WORKER_MAX_RSS_MB,
+            "open_fds": settings.WORKER_MAX_FDS,
+            "threads": settings.WORKER_MAX_THREADS,
+            "requests": settings.WORKER_MAX_REQUESTS + _request_jitter
+            if settings.WORKER_MAX_REQUESTS else 0,
+        },
+        "recycling": _recycle_reason,
+    }
+
+
+async def watchdog_task():
+    """Background loop running the worker self-checks"""
+    while True:
+        await asyncio.sleep(settings.WATCHDOG_INTERVAL)
+        if not settings.WATCHDOG_ENABLED:
+            continue
+        try:
+            check()
+        except Exception as e:
+            print(f"[WATCHDOG] Self-check failed: {e}")
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import unittest
+
+from services.executors import BoundedExecutor, ExecutorSaturated
+
+
+class BoundedExecutorTest(unittest.TestCase):
+    def test_cancelled_queued_work_leaves_the_queue(self):
+        async def scenario():
+            executor = BoundedExecutor("test", max_workers=1, max_queue=3)
+            release = threading.Event()
+            blocker = executor.run(release.wait)
+            try:
+                queued = [executor.run(lambda: None) for _ in range(2)]
+                await asyncio.sleep(0.05)  # blocker is running, the rest wait for its thread
+
+                for future in queued:
+                    future.cancel()
+                await asyncio.sleep(0)
+
+                self.assertEqual(executor.stats()["queued"], 0)
+            finally:
+                release.set()
+                await blocker
+            # The whole queue is available again
+            await asyncio.gather(*(executor.run(lambda: None) for _ in range(3)))
+            executor.shutdown()
+
+        asyncio.run(scenario())
+
+    def test_shutdown_cancels_queued_work(self):
+        async def scenario():
+            executor = BoundedExecutor("test", max_workers=1)
+            release = threading.Event()
+            blocker = executor.run(release.wait)
+            queued = [executor.run(lambda: None) for _ in range(3)]
+            await asyncio.sleep(0.05)
+
+            executor.shutdown()
+            release.set()
+            await blocker
+            await asyncio.gather(*queued, return_exceptions=True)
+
+            self.assertEqual(executor.stats()["queued"], 0)
+
+        asyncio.run(scenario())
+
+    def test_full_queue_is_rejected(self):
+        async def scenario():
+            executor = BoundedExecutor("test", max_workers=1, max_queue=1)
+            release = threading.Event()
+            running = executor.run(release.wait)
+            await asyncio.sleep(0.05)
+            waiting = executor.run(lambda: None)
+            with self.assertRaises(ExecutorSaturated):
+                executor.run(lambda: None)
+            release.set()
+            await asyncio.gather(running, waiting)
+            executor.shutdown()
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,79 @@
+import os
 import sys
+import stat
 import time
+import ipaddress
 import subprocess
+from urllib.parse import urlsplit
+from core.config import settings
 
 def _ansi_escape(text: str) -> str:
     """Convert plain text to xterm-safe string (escape < and > but keep newlines as \r\n)."""
     return text.replace('\r\n', '\n').replace('\r', '\n').replace('\n', '\r\n')
 
+def ensure_private_dir(directory):
+    """
+    Create directory (mode 0700) if needed. Raises PermissionError if it
+    belongs to another user or others may enter it (POSIX; elsewhere it is
+    only created).
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{directory} must be a directory of this user with mode 0700")
+
+def _trusted_proxy(addr):
+    """True if addr is a proxy (or cluster peer) whose X-Forwarded-For we believe."""
+    try:
+        ip = ipaddress.ip_address(addr)
+    except ValueError:
+        return False
+    for entry in settings.TRUSTED_PROXIES:
+        try:
+            if ip in ipaddress.ip_network(entry, strict=False):
+                return True
+        except ValueError:
+            continue
+    return ip in _cluster_peer_ips()
+
+def _cluster_peer_ips():
+    ips = set()
+    for url in settings.CLUSTER_PEERS:
+        try:
+            ips.add(ipaddress.ip_address(urlsplit(url).hostname or ""))
+        except ValueError:
+            pass  # peers named by hostname have to be listed in TRUSTED_PROXIES
+    return ips
+
+def _resolve_client_ip(peer, forwarded):
+    """
+    Walk X-Forwarded-For back from the connecting peer, through trusted
+    proxies only; the first hop we can't vouch for is the client.
+    """
+    if not peer:
+        return "unknown"
+    if not forwarded:
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+    client = peer
+    while hops and _trusted_proxy(client):
+        client = hops.pop()
+    return client
+
+def get_client_ip(request):
+    """Client IP of a FastAPI request, honouring X-Forwarded-For only from TRUSTED_PROXIES."""
+    peer = request.client.host if request.client else None
+    return _resolve_client_ip(peer, request.headers.get('X-Forwarded-For'))
+
+def get_environ_client_ip(environ):
+    """Client IP from a Socket.IO connect environ (ASGI scope translated to WSGI keys)."""
+    # REMOTE_ADDR is a placeholder under ASGI; the real peer is in the scope
+    client = (environ.get('asgi.scope') or {}).get('client')
+    peer = client[0] if client else environ.get('REMOTE_ADDR')
+    return _resolve_client_ip(peer, environ.get('HTTP_X_FORWARDED_FOR'))
+
 def _boot_step(label, value, delay=0.15):
     GREEN = "\033[92m"
     CYAN = "\033[96m"
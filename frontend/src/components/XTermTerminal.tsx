@@ -20,6 +20,10 @@ import "@xterm/xterm/css/xterm.css";
 import { Theme, TerminalStatus } from "../types";
 import { getBaseUrl } from "../lib/api-client";
 
+// The server keeps a session's program running for a while after the
+// connection drops; reconnecting with its token resumes it
+const SESSION_KEY = "jyvra.terminal.session";
+
 // ──────────────────────────────────────────────────────────
 //  Types
 // ──────────────────────────────────────────────────────────
@@ -103,6 +107,8 @@ export const XTermTerminal = forwardRef<XTermTerminalRef, XTermTerminalProps>(
     const socketRef = useRef<Socket | null>(null);
     const statusRef = useRef<TerminalStatus>("idle");
     const sidRef = useRef<string>("");
+    // The program runs under a pty: it echoes and edits input itself
+    const ptyRef = useRef(false);
 
     const setStatus = useCallback(
       (s: TerminalStatus) => {
@@ -176,29 +182,25 @@ export const XTermTerminal = forwardRef<XTermTerminalRef, XTermTerminalProps>(
       // If baseUrl is empty string (production), connect to the current origin
       // Otherwise connect to the specified backend URL
       const socket = io(baseUrl || window.location.origin, {
-        transports: ["polling", "websocket"],
+        // One websocket stays on one server worker; polling requests may hit any of them
+        transports: ["websocket"],
+        auth: (cb) => cb({ session: sessionStorage.getItem(SESSION_KEY) }),
         reconnection: true,
-        reconnectionAttempts: 5,
+        reconnectionAttempts: 20,
         reconnectionDelay: 1000,
+        reconnectionDelayMax: 5000,
       });
 
       socketRef.current = socket;
 
-      socket.on("connected", (data: { sid: string }) => {
-        sidRef.current = data.sid;
-        onSidReady?.(data.sid);
-      });
-
-      socket.on("terminal:output", (data: { data: string }) => {
-        termRef.current?.write(data.data);
-      });
-
-      socket.on("terminal:exit", (data: { code: number; reason: string }) => {
+      const showExit = (data: { code: number; reason: string }) => {
         const term = termRef.current;
         if (!term) return;
 
         if (data.reason === "killed") {
           term.writeln("\r\n\x1b[33m⚡ Process terminated\x1b[0m");
+        } else if (data.reason === "server_restart") {
+          // The server already explained why the program was stopped
         } else if (data.code === 0) {
           term.writeln(
             "\r\n\x1b[2m─────────────────────────────────────\x1b[0m",
@@ -213,6 +215,51 @@ export const XTermTerminal = forwardRef<XTermTerminalRef, XTermTerminalProps>(
           );
         }
         setStatus("exited");
+      };
+
+      socket.on(
+        "connected",
+        (data: { sid: string; session: string; resumed: boolean }) => {
+          sessionStorage.setItem(SESSION_KEY, data.session);
+          sidRef.current = data.sid;
+          onSidReady?.(data.sid);
+        },
+      );
+
+      // Reconnected to a session: redraw what the program printed meanwhile
+      socket.on(
+        "terminal:replay",
+        (data: {
+          data: string;
+          running: boolean;
+          pty: boolean;
+          exit: { code: number; reason: string } | null;
+        }) => {
+          const term = termRef.current;
+          if (!term) return;
+          term.reset();
+          term.write(data.data);
+          ptyRef.current = data.pty;
+          if (data.running) {
+            setStatus("running");
+          } else if (data.exit) {
+            showExit(data.exit);
+          }
+        },
+      );
+
+      socket.on("terminal:started", (data: { pty: boolean }) => {
+        ptyRef.current = data.pty;
+      });
+
+      socket.on("terminal:output", (data: { data: string }) => {
+        termRef.current?.write(data.data);
+      });
+
+      socket.on("terminal:exit", showExit);
+
+      socket.on("server:draining", (data: { message: string }) => {
+        termRef.current?.writeln(`\r\n\x1b[33m⚠ ${data.message}\x1b[0m`);
       });
 
       socket.on("terminal:error", (data: { message: string }) => {
@@ -235,7 +282,9 @@ export const XTermTerminal = forwardRef<XTermTerminalRef, XTermTerminalProps>(
         if (statusRef.current !== "running" || !socketRef.current?.connected)
           return;
 
-        if (data === "\r") {
+        if (ptyRef.current) {
+          socketRef.current.emit("terminal:input", { data });
+        } else if (data === "\r") {
           term.write("\r\n");
           socketRef.current.emit("terminal:input", { data: "\n" });
         } else if (data === "\u007f") {
@@ -247,7 +296,15 @@ export const XTermTerminal = forwardRef<XTermTerminalRef, XTermTerminalProps>(
         }
       });
 
-      return () => disposable.dispose();
+      // Propagate the terminal size to the program's pty
+      const resizeDisposable = term.onResize(({ cols, rows }) => {
+        socketRef.current?.emit("terminal:resize", { cols, rows });
+      });
+
+      return () => {
+        disposable.dispose();
+        resizeDisposable.dispose();
+      };
     }, []);
 
     // ── Expose imperative API via ref ─────────────────────
@@ -261,7 +318,8 @@ export const XTermTerminal = forwardRef<XTermTerminalRef, XTermTerminalProps>(
           term.reset();
           term.clear();
           setStatus("compiling");
-          socket.emit("terminal:run", { code });
+          ptyRef.current = false;
+          socket.emit("terminal:run", { code, cols: term.cols, rows: term.rows });
           setStatus("running");
         },
         kill() {